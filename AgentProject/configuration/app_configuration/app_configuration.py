@@ -1,4 +1,5 @@
 from pydantic_settings import BaseSettings, SettingsConfigDict
+from typing import List
 
 class AppConfiguration(BaseSettings):
     model_config = SettingsConfigDict(env_file='.env', env_file_encoding='utf-8')
@@ -19,11 +20,100 @@ class AppConfiguration(BaseSettings):
 
     #Provider
     LLM_PROVIDER: str = 'novita'
-    EMBEDDING_PROVIDER: str = 'hf-inference'
+    EMBEDDING_PROVIDER: str = 'hf-inference' # 'local' ejecuta el modelo en CPU con ONNX int8
     STT_MODEL_PROVIDER: str = 'fal-ai'
 
+    #Local embeddings
+    EMBEDDING_LOCAL_MODELS_DIR: str = '.embedding_models'
+    EMBEDDING_LOCAL_BATCH_SIZE: int = 32
+    EMBEDDING_LOCAL_MAX_WORKERS: int = 2
+    EMBEDDING_LOCAL_QUANTIZE_INT8: bool = True
+
+    #STT engine
+    STT_ENGINE: str = 'deepgram' # 'faster-whisper' transcribe localmente en CPU
+    WHISPER_MODEL_SIZE: str = 'small'
+    WHISPER_COMPUTE_TYPE: str = 'int8'
+    WHISPER_CPU_THREADS: int = 4
+    WHISPER_BEAM_SIZE: int = 1
+    WHISPER_PARTIAL_INTERVAL_MS: float = 800.0
+    WHISPER_PARTIAL_WINDOW_S: float = 6.0 # los parciales solo decodifican los ultimos segundos del segmento
+    WHISPER_NUM_WORKERS: int = 1 # decodificaciones en paralelo del modelo compartido entre sesiones
+
+    #End of turn
+    STT_ENDPOINTING_MS: int = 400
+    STT_UTTERANCE_END_MS: int = 1000
+    TURN_USE_SPEECH_FINAL: bool = True
+    TURN_USE_UTTERANCE_END: bool = True
+    TURN_SILENCE_TIMEOUT_MS: float = 1200.0
+    TURN_PUNCTUATION_GRACE_MS: float = 250.0
+
+    #Audio capture
+    STT_BLOCK_MS: float = 20.0
+    STT_RING_BUFFER_MS: int = 2000
+    STT_BACKPRESSURE_POLICY: str = 'drop_oldest' # 'drop_oldest' o 'drop_newest'
+    STT_AUDIO_SOURCE: str = 'microphone' # 'replay' reproduce STT_REPLAY_PATH (WAV o PCM crudo int16)
+    STT_REPLAY_PATH: str = ''
+    STT_REPLAY_SPEED: float = 1.0 # 1.0 tiempo real, N acelerado, 0 sin espera
+
+    #Voice activity detection
+    STT_VAD_ENABLED: bool = True
+    STT_VAD_ENERGY_MARGIN_DB: float = 10.0
+    STT_VAD_MIN_SPEECH_MS: float = 60.0
+    STT_VAD_HANGOVER_MS: float = 300.0
+    STT_VAD_SILENCE_SUPPRESS_MS: float = 1500.0
+    STT_VAD_PREROLL_MS: float = 300.0
+
     #Elevelabs
     ELEVELABS_VOICE_ID: str ='86V9x9hrQds83qf7zaGn'
+    TTS_KEEPALIVE_INTERVAL_S: float = 10.0
+    TTS_BASE_URL: str = 'wss://api.elevenlabs.io' # p. ej. ws://127.0.0.1:8765 con benchmarks/tts_stand_in_server.py
+    TTS_OUTPUT_FORMAT: str = 'auto' # 'auto' elige el pcm segun el dispositivo de salida, o p. ej. 'pcm_24000'
+    TTS_MAX_SAMPLE_RATE: int = 24000
+
+    #TTS chunk schedule
+    TTS_CHUNK_SCHEDULE_ADAPTIVE: bool = True
+    TTS_FIRST_CHUNK_CHARS: int = 50
+    TTS_FIRST_CHUNK_MIN_CHARS: int = 50
+    TTS_FIRST_CHUNK_MAX_CHARS: int = 120
+    TTS_CHUNK_SCHEDULE_TAIL: List[int] = [120, 160, 250]
+    TTS_TARGET_FIRST_AUDIO_MS: float = 350.0
+    TTS_LATENCY_EMA_ALPHA: float = 0.3
+
+    #Barge-in
+    BARGE_IN_ENABLED: bool = True # mantiene el microfono abierto mientras el agente habla
+    BARGE_IN_MAX_REACTION_MS: float = 150.0
+    ECHO_OUTPUT_LATENCY_MS: float = 60.0
+
+    #Audio playback
+    TTS_PLAYBACK_PERIOD_MS: float = 20.0
+    TTS_PLAYBACK_BUFFER_MS: float = 3000.0
+    TTS_PLAYBACK_PREBUFFER_MS: float = 60.0
+    TTS_AUDIO_SINK: str = 'pyaudio' # 'wav' escribe TTS_AUDIO_SINK_PATH, 'null' descarta el audio
+    TTS_AUDIO_SINK_PATH: str = ''
+
+    #TTS phrase cache
+    TTS_PHRASE_CACHE_ENABLED: bool = True
+    TTS_PHRASE_CACHE_DIR: str = '.tts_cache'
+    TTS_PHRASE_CACHE_MAX_BYTES: int = 50_000_000
+    TTS_PHRASE_CACHE_MAX_CHARS: int = 60
+
+    #Backchannel
+    BACKCHANNEL_ENABLED: bool = False # acuse corto ('Mmm...') si la respuesta tarda en sonar
+    BACKCHANNEL_DELAY_MS: float = 700.0 # desde el fin de la voz del usuario
+
+    #Sessions
+    SESSION_MAX_SESSIONS: int = 8 # con STT_AUDIO_SOURCE='microphone' solo tiene sentido una sesion por proceso
+    SESSION_IDLE_TIMEOUT_S: float = 900.0
+    SESSION_AUDIO_POOL_SIZE: int = 2
+    SESSION_DEFAULT_ID: str = 'mi_chat_1' # se usa cuando la invocacion no trae thread_id
+    WARM_UP_ON_START: bool = True # precarga recursos compartidos y audio antes del primer turno
+    SESSION_WARM_AUDIO: int = 1 # audio (STT + TTS con websocket abierto) que se deja listo en el pool
+
+    #Telemetry
+    TELEMETRY_EXPORT: str = 'none' # 'prometheus', 'jsonl' o ambos separados por coma
+    TELEMETRY_JSONL_PATH: str = 'telemetry/turns.jsonl'
+    TELEMETRY_PROMETHEUS_HOST: str = '127.0.0.1'
+    TELEMETRY_PROMETHEUS_PORT: int = 9464
 
     #parameters of models
     SYSTEM_PROMPT: str = ''' 
@@ -48,6 +138,11 @@ class AppConfiguration(BaseSettings):
     DEFAULT_MAX_TOKENS_MEMORIE_CONTEXT: int = 8000
     RAG_TOP_K: int = 5
     RAG_SCORE_THRESHOLD: float = 0.68
+    RAG_CACHE_MAX_ENTRIES: int = 256
+    RAG_CACHE_MAX_BYTES: int = 4_000_000
+    RAG_CONTEXT_TOKEN_BUDGET: int = 1200
+    RAG_MMR_LAMBDA: float = 0.7
+    RAG_DUPLICATE_THRESHOLD: float = 0.8
 
     #mcp path config
     MCP_CONFIGURATION_JSON_PATH: str = 'AgentProject\\configuration\\mcp_configuration\\mcp_configuration.json' 
@@ -0,0 +1,59 @@
+from AgentProject.core.audio_orchestrator.audio_ring_buffer import PCMRingBuffer
+from typing import Optional, Tuple
+import numpy as np
+import asyncio
+import time
+
+class AsyncAudioBridge:
+    #el hilo de audio escribe en el ring buffer y despierta al loop con call_soon_threadsafe
+    def __init__(self, ring_buffer: PCMRingBuffer):
+        self.ring_buffer = ring_buffer
+        self.out = np.zeros(ring_buffer.capacity, dtype= np.int16)
+        self.oldest_capture_time = 0.0
+        self.newest_capture_time = 0.0
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._queue: Optional[asyncio.Queue] = None
+
+    def bind(self, loop: asyncio.AbstractEventLoop) -> None:
+        self._loop = loop
+        self._queue = asyncio.Queue()
+
+    def push(self, indata: np.ndarray) -> None:
+        if not self.ring_buffer.write_float32(indata):
+            return
+        loop = self._loop
+        if loop is None:
+            return
+        try:
+            loop.call_soon_threadsafe(self._queue.put_nowait, time.perf_counter())
+        except RuntimeError:
+            #el loop ya se cerro
+            pass
+
+    def close(self) -> None:
+        loop = self._loop
+        if loop is None:
+            return
+        try:
+            loop.call_soon_threadsafe(self._queue.put_nowait, None)
+        except RuntimeError:
+            pass
+
+    async def drain(self, timeout: float) -> Tuple[int, bool]:
+        #espera el primer bloque y agrupa todos los pendientes en un solo envio
+        try:
+            async with asyncio.timeout(timeout):
+                item = await self._queue.get()
+        except TimeoutError:
+            return 0, False
+
+        closed = item is None
+        self.oldest_capture_time = self.newest_capture_time = item or time.perf_counter()
+        while not self._queue.empty():
+            item = self._queue.get_nowait()
+            if item is None:
+                closed = True
+            else:
+                self.newest_capture_time = item
+
+        return self.ring_buffer.read_into(self.out), closed
@@ -0,0 +1,277 @@
+from dataclasses import dataclass
+from typing import Awaitable, Optional
+from AgentProject.core.audio_orchestrator.echo_suppression import EchoReference
+from AgentProject.core.audio_orchestrator.audio_sink import AudioSink, PyAudioSink
+import numpy as np
+import threading
+import asyncio
+import logging
+import time
+
+logging.basicConfig(
+            level= logging.INFO,
+            format= '%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+        )
+
+logger = logging.getLogger(__name__)
+
+#sin evento asincrono de interrupcion la bandera de hilos solo puede sondearse
+INTERRUPT_POLL_S = 0.1
+
+async def wait_interruptible(awaitable: Awaitable,
+                             interrupt_event: threading.Event,
+                             interruption: Optional[asyncio.Event] = None,
+                             timeout: Optional[float] = None,
+                             wake: Optional[asyncio.Event] = None) -> Optional[asyncio.Future]:
+    #espera a awaitable hasta que termine, se despierte interruption o wake, o venza timeout
+    #devuelve la tarea si termino; si no, la cancela y devuelve None
+    task = asyncio.ensure_future(awaitable)
+    waiters = []
+    if interruption is not None:
+        if not interrupt_event.is_set():
+            #el evento solo sirve para despertar: la bandera de hilos es la fuente de verdad
+            interruption.clear()
+        waiters.append(asyncio.ensure_future(interruption.wait()))
+    elif timeout is None or timeout > INTERRUPT_POLL_S:
+        timeout = INTERRUPT_POLL_S
+    if wake is not None:
+        waiters.append(asyncio.ensure_future(wake.wait()))
+    try:
+        await asyncio.wait([task, *waiters], timeout= timeout, return_when= asyncio.FIRST_COMPLETED)
+    finally:
+        for waiter in waiters:
+            waiter.cancel()
+        if not task.done():
+            task.cancel()
+    return task if task.done() and not task.cancelled() else None
+
+@dataclass
+class PlaybackStats:
+    bytes_written: int
+    bytes_played: int
+    bytes_flushed: int
+    underruns: int
+    overruns: int
+    fill_bytes: int
+    capacity_bytes: int
+
+class PCMJitterBuffer:
+    #buffer acotado entre el bucle de eventos (productor) y el hilo de reproduccion (consumidor)
+    def __init__(self,
+                 capacity_bytes: int,
+                 prebuffer_bytes: int,
+                 frame_bytes: int = 2):
+
+        self.capacity = capacity_bytes
+        self.prebuffer = min(prebuffer_bytes, capacity_bytes)
+        self.frame_bytes = frame_bytes
+        self._buffer = np.zeros(capacity_bytes, dtype= np.uint8)
+        self._write_index = 0
+        self._read_index = 0
+        self._ended = False
+        self._playing = False
+        self._condition = threading.Condition()
+        self.underruns = 0
+        self.overruns = 0
+        self.bytes_flushed = 0
+
+    @property
+    def fill(self) -> int:
+        return self._write_index - self._read_index
+
+    @property
+    def playing(self) -> bool:
+        return self._playing
+
+    @property
+    def drained(self) -> bool:
+        return self.fill < self.frame_bytes and not self._playing
+
+    def write(self, pcm) -> int:
+        #np.frombuffer es una vista: la unica copia es la del audio al buffer
+        data = np.frombuffer(pcm, dtype= np.uint8)
+        with self._condition:
+            count = min(len(data), self.capacity - self.fill)
+            if count < len(data):
+                self.overruns += 1
+            if count <= 0:
+                return 0
+
+            start = self._write_index % self.capacity
+            first = min(count, self.capacity - start)
+            self._buffer[start:start + first] = data[:first]
+            if first < count:
+                self._buffer[:count - first] = data[first:count]
+
+            self._write_index += count
+            self._ended = False
+            self._condition.notify()
+        return count
+
+    def end_of_stream(self) -> None:
+        #lo que quede por debajo del pre-buffer se reproduce igualmente
+        with self._condition:
+            self._ended = True
+            self._condition.notify()
+
+    def flush(self) -> None:
+        with self._condition:
+            self.bytes_flushed += self.fill
+            self._read_index = self._write_index
+            self._playing = False
+            self._ended = False
+            self._condition.notify()
+
+    def read(self, size: int, timeout: float) -> Optional[bytes]:
+        with self._condition:
+            while True:
+                fill = self.fill
+                if self._playing:
+                    if fill >= size or (self._ended and fill >= self.frame_bytes):
+                        break
+                    if not self._ended:
+                        #la red no llego a tiempo: se vuelve a acumular antes de seguir
+                        self.underruns += 1
+                    self._playing = False
+                elif fill >= self.prebuffer or (self._ended and fill >= self.frame_bytes):
+                    self._playing = True
+                    continue
+                if not self._condition.wait(timeout):
+                    return None
+
+            count = min(size, fill)
+            count -= count % self.frame_bytes
+            start = self._read_index % self.capacity
+            first = min(count, self.capacity - start)
+            if first == count:
+                chunk = self._buffer[start:start + count].tobytes()
+            else:
+                chunk = self._buffer[start:].tobytes() + self._buffer[:count - first].tobytes()
+            self._read_index += count
+            return chunk
+
+class AudioPlaybackThread:
+    #la escritura bloqueante en el sumidero ocurre en este hilo; el bucle de eventos nunca espera al dispositivo
+    def __init__(self,
+                 sample_rate: int = 24000,
+                 channels: int = 1,
+                 period_ms: float = 20.0,
+                 buffer_ms: float = 3000.0,
+                 prebuffer_ms: float = 60.0,
+                 reference: Optional[EchoReference] = None,
+                 sink: Optional[AudioSink] = None):
+
+        frame_bytes = 2 * channels
+        self.sample_rate = sample_rate
+        self.period_frames = max(1, int(sample_rate * period_ms / 1000))
+        self.period_bytes = self.period_frames * frame_bytes
+        self.jitter_buffer = PCMJitterBuffer(capacity_bytes= max(int(sample_rate * buffer_ms / 1000), self.period_frames) * frame_bytes,
+                                             prebuffer_bytes= int(sample_rate * prebuffer_ms / 1000) * frame_bytes,
+                                             frame_bytes= frame_bytes)
+        self.reference = reference
+        self.bytes_written = 0
+        self.bytes_played = 0
+
+        self.sink = sink or PyAudioSink(sample_rate= sample_rate, channels= channels)
+        self.sink.open(self.period_frames)
+
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._space_available: Optional[asyncio.Event] = None
+        self._drained: Optional[asyncio.Event] = None
+        self._running = True
+        self._thread = threading.Thread(target= self._run, daemon= True)
+        self._thread.start()
+
+    def bind(self, loop: asyncio.AbstractEventLoop) -> None:
+        if self._loop is not loop:
+            self._loop = loop
+            self._space_available = asyncio.Event()
+            self._drained = asyncio.Event()
+
+    def _wake(self) -> None:
+        #se ejecuta en el bucle de eventos
+        self._space_available.set()
+        if self.jitter_buffer.drained:
+            self._drained.set()
+
+    def _notify(self) -> None:
+        loop = self._loop
+        if loop is not None and not loop.is_closed():
+            try:
+                loop.call_soon_threadsafe(self._wake)
+            except RuntimeError:
+                pass
+
+    def _run(self) -> None:
+        was_playing = False
+        while self._running:
+            chunk = self.jitter_buffer.read(self.period_bytes, timeout= 0.1)
+            if chunk is None:
+                if was_playing:
+                    was_playing = False
+                    self._notify()
+                continue
+            try:
+                self.sink.write(chunk)
+                self.bytes_played += len(chunk)
+                if self.reference:
+                    #el cancelador de eco necesita saber que sono y cuando
+                    self.reference.push(chunk, time.perf_counter())
+            except Exception as e:
+                logger.error(f'Error en la reproduccion de audio: {str(e)}')
+            was_playing = True
+            self._notify()
+
+    async def write(self, pcm: bytes, interrupt_event: threading.Event, interruption: Optional[asyncio.Event] = None) -> bool:
+        #si el buffer esta lleno se espera de forma asincrona a que el hilo libere espacio o a la interrupcion
+        self.bind(asyncio.get_running_loop())
+        view = memoryview(pcm)
+        offset = 0
+        while offset < len(view):
+            if interrupt_event.is_set():
+                return False
+            self._space_available.clear()
+            written = self.jitter_buffer.write(view[offset:])
+            offset += written
+            self.bytes_written += written
+            if offset < len(view):
+                await wait_interruptible(self._space_available.wait(), interrupt_event, interruption)
+        return True
+
+    async def wait_until_drained(self, interrupt_event: threading.Event, interruption: Optional[asyncio.Event] = None) -> bool:
+        self.bind(asyncio.get_running_loop())
+        self.jitter_buffer.end_of_stream()
+        while not self.jitter_buffer.drained:
+            if interrupt_event.is_set():
+                return False
+            self._drained.clear()
+            await wait_interruptible(self._drained.wait(), interrupt_event, interruption)
+        return True
+
+    @property
+    def active(self) -> bool:
+        return self.jitter_buffer.playing or not self.jitter_buffer.drained
+
+    def flush(self) -> None:
+        #es seguro llamarlo desde cualquier hilo
+        self.jitter_buffer.flush()
+
+    def stats(self) -> PlaybackStats:
+        return PlaybackStats(
+            bytes_written= self.bytes_written,
+            bytes_played= self.bytes_played,
+            bytes_flushed= self.jitter_buffer.bytes_flushed,
+            underruns= self.jitter_buffer.underruns,
+            overruns= self.jitter_buffer.overruns,
+            fill_bytes= self.jitter_buffer.fill,
+            capacity_bytes= self.jitter_buffer.capacity
+        )
+
+    def close(self) -> None:
+        self._running = False
+        self.jitter_buffer.flush()
+        self._thread.join(timeout= 2.0)
+
+        stats = self.stats()
+        logger.info(f'Reproduccion: {stats.bytes_played} bytes, {stats.underruns} underruns, {stats.overruns} overruns')
+        self.sink.close()
@@ -0,0 +1,109 @@
+from dataclasses import dataclass
+import numpy as np
+import time
+
+@dataclass
+class RingBufferStats:
+    samples_written: int
+    samples_read: int
+    overruns: int
+    dropped_samples: int
+    fill_samples: int
+    capacity_samples: int
+
+class PCMRingBuffer:
+    #buffer circular SPSC: el callback de audio es el unico productor y el emisor el unico consumidor
+    POLICIES = ('drop_oldest', 'drop_newest')
+
+    def __init__(self,
+                 capacity_samples: int,
+                 overflow_policy: str = 'drop_oldest'):
+
+        if overflow_policy not in self.POLICIES:
+            raise ValueError(f'Politica de desbordamiento no soportada: {overflow_policy}')
+
+        self.capacity = capacity_samples
+        self.overflow_policy = overflow_policy
+        self._buffer = np.zeros(capacity_samples, dtype= np.int16)
+        self._write_index = 0
+        self._read_index = 0
+        self.last_write_time = 0.0
+        self.overruns = 0
+        self.dropped_samples = 0
+        #recorte previo a la conversion; crece hasta el tamaño de bloque del callback y se reutiliza
+        self._scratch = np.zeros(0, dtype= np.float32)
+
+    def write_float32(self, indata: np.ndarray) -> bool:
+        samples = indata.reshape(-1)
+        count = samples.shape[0]
+        if count > self.capacity:
+            samples = samples[count - self.capacity:]
+            count = self.capacity
+
+        if self.overflow_policy == 'drop_newest' and self._write_index - self._read_index + count > self.capacity:
+            self.overruns += 1
+            self.dropped_samples += count
+            return False
+
+        #sin recorte un |x| > 1.0 da la vuelta al pasar a int16 y suena como un chasquido
+        if self._scratch.shape[0] < count:
+            self._scratch = np.zeros(count, dtype= np.float32)
+        clipped = np.clip(samples, -1.0, 1.0, out= self._scratch[:count])
+
+        #convierte float32 -> int16 directamente sobre la memoria del buffer, sin arrays intermedios
+        start = self._write_index % self.capacity
+        first = min(count, self.capacity - start)
+        np.multiply(clipped[:first], 32767, out= self._buffer[start:start + first], casting= 'unsafe')
+        if first < count:
+            np.multiply(clipped[first:], 32767, out= self._buffer[:count - first], casting= 'unsafe')
+
+        self._write_index += count
+        self.last_write_time = time.monotonic()
+        return True
+
+    def available(self) -> int:
+        return min(self._write_index - self._read_index, self.capacity)
+
+    def read_into(self, out: np.ndarray) -> int:
+        write_index = self._write_index
+        read_index = self._read_index
+
+        if write_index - read_index > self.capacity:
+            #el productor dio la vuelta: se descarta lo mas antiguo
+            lost = write_index - read_index - self.capacity
+            self.overruns += 1
+            self.dropped_samples += lost
+            read_index = write_index - self.capacity
+
+        count = min(write_index - read_index, out.shape[0])
+        if count <= 0:
+            return 0
+
+        start = read_index % self.capacity
+        first = min(count, self.capacity - start)
+        out[:first] = self._buffer[start:start + first]
+        if first < count:
+            out[first:count] = self._buffer[:count - first]
+
+        if self._write_index - read_index > self.capacity:
+            #se sobrescribio la region mientras se copiaba; el bloque no es valido
+            self.overruns += 1
+            self.dropped_samples += count
+            self._read_index = self._write_index - self.capacity
+            return 0
+
+        self._read_index = read_index + count
+        return count
+
+    def clear(self) -> None:
+        self._read_index = self._write_index
+
+    def stats(self) -> RingBufferStats:
+        return RingBufferStats(
+            samples_written= self._write_index,
+            samples_read= self._read_index,
+            overruns= self.overruns,
+            dropped_samples= self.dropped_samples,
+            fill_samples= self.available(),
+            capacity_samples= self.capacity
+        )
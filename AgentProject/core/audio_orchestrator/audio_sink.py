@@ -0,0 +1,171 @@
+from abc import ABC, abstractmethod
+from typing import List, Optional, Tuple
+import logging
+import time
+import wave
+import os
+
+logging.basicConfig(
+            level= logging.INFO,
+            format= '%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+        )
+
+logger = logging.getLogger(__name__)
+
+class AudioSink(ABC):
+    #destino del audio reproducido; write se llama desde el hilo de reproduccion y puede bloquear
+    def __init__(self, sample_rate: int = 24000, channels: int = 1):
+        self.sample_rate = sample_rate
+        self.channels = channels
+
+    @abstractmethod
+    def open(self, frames_per_buffer: int) -> None:
+        ...
+
+    @abstractmethod
+    def write(self, pcm: bytes) -> None:
+        ...
+
+    @abstractmethod
+    def close(self) -> None:
+        ...
+
+    def output_latency(self) -> float:
+        return 0.0
+
+    def preferred_sample_rate(self) -> Optional[int]:
+        #None = cualquier frecuencia sirve; se elige la de menor ancho de banda
+        return self.sample_rate
+
+class PyAudioSink(AudioSink):
+    def __init__(self, sample_rate: int = 24000, channels: int = 1):
+        super().__init__(sample_rate, channels)
+        self.p = None
+        self.stream = None
+
+    def open(self, frames_per_buffer: int) -> None:
+        #se importa aqui para que los sumideros sin dispositivo funcionen en servidores sin PortAudio
+        import pyaudio
+        self.p = pyaudio.PyAudio()
+        self.stream = self.p.open(
+            format= pyaudio.paInt16,
+            channels= self.channels,
+            rate= self.sample_rate,
+            output= True,
+            frames_per_buffer= frames_per_buffer,
+            stream_callback= None
+        )
+
+    def write(self, pcm: bytes) -> None:
+        self.stream.write(pcm)
+
+    def preferred_sample_rate(self) -> Optional[int]:
+        import pyaudio
+        p = pyaudio.PyAudio()
+        try:
+            return int(p.get_default_output_device_info()['defaultSampleRate'])
+        except Exception:
+            return self.sample_rate
+        finally:
+            p.terminate()
+
+    def output_latency(self) -> float:
+        return self.stream.get_output_latency() if self.stream else 0.0
+
+    def close(self) -> None:
+        try:
+            if self.stream:
+                if self.stream.is_active():
+                    self.stream.stop_stream()
+                    logger.info('Se cerro conexion stream')
+                self.stream.close()
+        except Exception as e:
+            logger.error(f'Error al cerrar el stream de salida: {str(e)}')
+        if self.p:
+            self.p.terminate()
+        self.stream = None
+        self.p = None
+
+class PacedSink(AudioSink):
+    #imita el ritmo de un dispositivo real: speed 1.0 = tiempo real, N = N veces mas rapido, 0 = sin espera
+    def __init__(self, sample_rate: int = 24000, channels: int = 1, speed: float = 1.0):
+        super().__init__(sample_rate, channels)
+        self.speed = speed
+        self._deadline = 0.0
+
+    def _pace(self, pcm: bytes) -> None:
+        if self.speed <= 0:
+            return
+        now = time.perf_counter()
+        #tras un silencio el reloj del dispositivo vuelve a arrancar
+        self._deadline = max(self._deadline, now) + len(pcm) / (2 * self.channels * self.sample_rate) / self.speed
+        remaining = self._deadline - now
+        if remaining > 0:
+            time.sleep(remaining)
+
+class NullSink(PacedSink):
+    #descarta el audio y guarda (instante, bytes) de cada escritura para medir tiempos
+    def __init__(self, sample_rate: int = 24000, channels: int = 1, speed: float = 1.0):
+        super().__init__(sample_rate, channels, speed)
+        self.writes: List[Tuple[float, int]] = []
+        self.bytes_written = 0
+
+    def open(self, frames_per_buffer: int) -> None:
+        pass
+
+    def preferred_sample_rate(self) -> Optional[int]:
+        return None
+
+    def write(self, pcm: bytes) -> None:
+        self._pace(pcm)
+        self.writes.append((time.perf_counter(), len(pcm)))
+        self.bytes_written += len(pcm)
+
+    def first_write_after(self, instant: float) -> Optional[float]:
+        for write_time, _ in self.writes:
+            if write_time >= instant:
+                return write_time
+        return None
+
+    def bytes_after(self, instant: float) -> int:
+        return sum(size for write_time, size in self.writes if write_time > instant)
+
+    def reset(self) -> None:
+        self.writes = []
+        self.bytes_written = 0
+
+    def close(self) -> None:
+        pass
+
+class WavFileSink(PacedSink):
+    def __init__(self, path: str, sample_rate: int = 24000, channels: int = 1, speed: float = 0.0):
+        super().__init__(sample_rate, channels, speed)
+        self.path = path
+        self._wav: Optional[wave.Wave_write] = None
+
+    def open(self, frames_per_buffer: int) -> None:
+        os.makedirs(os.path.dirname(self.path) or '.', exist_ok= True)
+        self._wav = wave.open(self.path, 'wb')
+        self._wav.setnchannels(self.channels)
+        self._wav.setsampwidth(2)
+        self._wav.setframerate(self.sample_rate)
+
+    def write(self, pcm: bytes) -> None:
+        self._pace(pcm)
+        self._wav.writeframes(pcm)
+
+    def close(self) -> None:
+        if self._wav:
+            self._wav.close()
+            self._wav = None
+
+def build_audio_sink(kind: str,
+                     sample_rate: int = 24000,
+                     channels: int = 1,
+                     path: str = '',
+                     speed: float = 1.0) -> AudioSink:
+    if kind == 'wav':
+        return WavFileSink(path= path, sample_rate= sample_rate, channels= channels, speed= speed)
+    if kind == 'null':
+        return NullSink(sample_rate= sample_rate, channels= channels, speed= speed)
+    return PyAudioSink(sample_rate= sample_rate, channels= channels)
@@ -0,0 +1,189 @@
+from abc import ABC, abstractmethod
+from dataclasses import dataclass
+from typing import Callable, Optional
+import numpy as np
+import threading
+import logging
+import time
+import wave
+import os
+
+logging.basicConfig(
+            level= logging.INFO,
+            format= '%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+        )
+
+logger = logging.getLogger(__name__)
+
+#mismo contrato que el callback de sounddevice: (indata float32 [frames, channels], frames, time_info, status)
+AudioCallback = Callable[[np.ndarray, int, object, object], None]
+
+@dataclass
+class ReplayTimeInfo:
+    inputBufferAdcTime: float
+    currentTime: float
+    streamTime: float
+
+class AudioSource(ABC):
+    def __init__(self, sample_rate: int, channels: int, blocksize: int):
+        self.sample_rate = sample_rate
+        self.channels = channels
+        self.blocksize = blocksize
+
+    @property
+    @abstractmethod
+    def active(self) -> bool:
+        ...
+
+    @abstractmethod
+    def start(self, callback: AudioCallback) -> None:
+        ...
+
+    @abstractmethod
+    def stop(self) -> None:
+        ...
+
+class MicrophoneAudioSource(AudioSource):
+    def __init__(self, sample_rate: int = 16000, channels: int = 1, blocksize: int = 320):
+        super().__init__(sample_rate, channels, blocksize)
+        self.stream = None
+
+    @property
+    def active(self) -> bool:
+        return self.stream is not None
+
+    def start(self, callback: AudioCallback) -> None:
+        if self.stream is not None:
+            return
+        #se importa aqui para que las fuentes de replay funcionen en servidores sin PortAudio
+        import sounddevice as sd
+        self.stream = sd.InputStream(
+            blocksize= self.blocksize,
+            callback= callback,
+            channels= self.channels,
+            samplerate= self.sample_rate,
+            dtype= 'float32'
+        )
+        self.stream.start()
+
+    def stop(self) -> None:
+        if self.stream is None:
+            return
+        try:
+            self.stream.stop()
+            self.stream.close()
+            logger.info('Se cerro el Stream')
+        except Exception as e:
+            logger.error(f'Error al Cerrar el Stream: {str(e)}')
+        self.stream = None
+
+class WavReplayAudioSource(AudioSource):
+    def __init__(self,
+                 path: str,
+                 sample_rate: int = 16000,
+                 channels: int = 1,
+                 blocksize: int = 320,
+                 speed: float = 1.0,
+                 loop: bool = False,
+                 trailing_silence_ms: float = 1500.0,
+                 on_finished: Optional[Callable[[], None]] = None):
+
+        super().__init__(sample_rate, channels, blocksize)
+        self.path = path
+        self.speed = speed
+        self.loop = loop
+        self.on_finished = on_finished
+        self.finished = threading.Event()
+        self.blocks_delivered = 0
+        self.max_lateness_ms = 0.0
+        self._thread: Optional[threading.Thread] = None
+        self._running = False
+
+        audio = self._load(path)
+        silence = np.zeros((int(sample_rate * trailing_silence_ms / 1000), channels), dtype= np.float32)
+        self.audio = np.ascontiguousarray(np.concatenate((audio, silence)))
+
+    def _load(self, path: str) -> np.ndarray:
+        if os.path.splitext(path)[1].lower() == '.wav':
+            with wave.open(path, 'rb') as wav_file:
+                if wav_file.getsampwidth() != 2:
+                    raise ValueError(f'Solo se soporta PCM de 16 bits: {path}')
+                source_rate = wav_file.getframerate()
+                source_channels = wav_file.getnchannels()
+                pcm = np.frombuffer(wav_file.readframes(wav_file.getnframes()), dtype= np.int16)
+        else:
+            #PCM crudo: int16 little-endian con la frecuencia y canales de la fuente
+            source_rate = self.sample_rate
+            source_channels = self.channels
+            pcm = np.fromfile(path, dtype= '<i2')
+
+        audio = pcm.reshape(-1, source_channels).astype(np.float32) / 32768
+        if source_channels != self.channels:
+            audio = np.repeat(audio.mean(axis= 1, keepdims= True), self.channels, axis= 1)
+        if source_rate != self.sample_rate:
+            positions = np.arange(0, len(audio), source_rate / self.sample_rate)
+            audio = np.stack([np.interp(positions, np.arange(len(audio)), audio[:, c])
+                              for c in range(self.channels)], axis= 1).astype(np.float32)
+        return audio
+
+    @property
+    def active(self) -> bool:
+        return self._running
+
+    @property
+    def duration(self) -> float:
+        return len(self.audio) / self.sample_rate
+
+    def start(self, callback: AudioCallback) -> None:
+        if self._running:
+            return
+        self._running = True
+        self.finished.clear()
+        self._thread = threading.Thread(target= self._run, args= (callback,), daemon= True)
+        self._thread.start()
+
+    def _run(self, callback: AudioCallback) -> None:
+        #speed 1.0 = tiempo real, N = N veces mas rapido, 0 = tan rapido como sea posible
+        block_seconds = self.blocksize / self.sample_rate
+        started = time.perf_counter()
+        index = 0
+        while self._running:
+            offset = (index * self.blocksize) % len(self.audio) if self.loop else index * self.blocksize
+            if offset >= len(self.audio):
+                break
+
+            stream_time = index * block_seconds
+            deadline = started + (stream_time + block_seconds) / self.speed if self.speed > 0 else time.perf_counter()
+            remaining = deadline - time.perf_counter()
+            if remaining > 0:
+                time.sleep(remaining)
+            else:
+                self.max_lateness_ms = max(self.max_lateness_ms, -remaining * 1000)
+
+            block = self.audio[offset:offset + self.blocksize]
+            callback(block, len(block), ReplayTimeInfo(deadline, time.perf_counter(), stream_time), None)
+            self.blocks_delivered += 1
+            index += 1
+
+        self._running = False
+        self.finished.set()
+        if self.on_finished:
+            self.on_finished()
+
+    def stop(self) -> None:
+        self._running = False
+        if self._thread and self._thread is not threading.current_thread():
+            self._thread.join(timeout= 2.0)
+        self._thread = None
+
+def build_audio_source(kind: str,
+                       sample_rate: int = 16000,
+                       channels: int = 1,
+                       block_ms: float = 20.0,
+                       replay_path: str = '',
+                       replay_speed: float = 1.0) -> AudioSource:
+    blocksize = max(1, int(sample_rate * block_ms / 1000))
+    if kind == 'replay':
+        return WavReplayAudioSource(path= replay_path, sample_rate= sample_rate, channels= channels,
+                                    blocksize= blocksize, speed= replay_speed)
+    return MicrophoneAudioSource(sample_rate= sample_rate, channels= channels, blocksize= blocksize)
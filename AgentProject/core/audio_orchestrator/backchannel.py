@@ -0,0 +1,41 @@
+from typing import Dict, List, Optional
+from AgentProject.core.humanizer.emotion_analisys import EmotionLabel
+from AgentProject.core.humanizer.personality_manager import ConversationTopic
+import random
+
+#acuses cortos (< 1 s de audio) que cubren el silencio mientras se prepara la respuesta
+DEFAULT_BACKCHANNELS = ['Mmm...', 'A ver...']
+
+#la emocion manda sobre el topico: ante un usuario molesto un 'A ver...' suena distante
+EMOTION_BACKCHANNELS: Dict[EmotionLabel, List[str]] = {
+    EmotionLabel.SAD: ['Ya...', 'Entiendo...'],
+    EmotionLabel.ANXIOUS: ['Tranquilo...', 'Entiendo...'],
+    EmotionLabel.ANGRY: ['Vale...', 'Entiendo...'],
+    EmotionLabel.FRUSTRATED: ['Vale...', 'Entiendo...'],
+    EmotionLabel.CONFUSED: ['A ver...', 'Vale...'],
+    EmotionLabel.HAPPY: ['¡Oh!', 'Mmm...'],
+    EmotionLabel.EXCITED: ['¡Oh!', '¡Vaya!']
+}
+
+TOPIC_BACKCHANNELS: Dict[ConversationTopic, List[str]] = {
+    ConversationTopic.PROFESSIONAL: ['A ver...', 'Vale...'],
+    ConversationTopic.PROBLEM_SOLVING: ['A ver...', 'Mmm...'],
+    ConversationTopic.EMOTIONAL_SUPPORT: ['Ya...', 'Entiendo...'],
+    ConversationTopic.PERSONAL: ['Mmm...', 'Ya...'],
+    ConversationTopic.CASUAL: ['Mmm...', '¡Ah!']
+}
+
+def backchannel_phrases() -> List[str]:
+    #todas las frases que hay que tener sintetizadas antes del primer turno
+    phrases = list(DEFAULT_BACKCHANNELS)
+    for options in list(EMOTION_BACKCHANNELS.values()) + list(TOPIC_BACKCHANNELS.values()):
+        phrases += [phrase for phrase in options if phrase not in phrases]
+    return phrases
+
+def select_backchannel(emotion: Optional[EmotionLabel],
+                       topic: Optional[ConversationTopic],
+                       last: Optional[str] = None) -> str:
+    options = EMOTION_BACKCHANNELS.get(emotion) or TOPIC_BACKCHANNELS.get(topic) or DEFAULT_BACKCHANNELS
+    #no repetir el mismo acuse en turnos seguidos
+    candidates = [phrase for phrase in options if phrase != last] or options
+    return random.choice(candidates)
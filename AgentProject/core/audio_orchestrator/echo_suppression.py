@@ -0,0 +1,163 @@
+from dataclasses import dataclass
+import numpy as np
+import threading
+import time
+
+@dataclass
+class EchoStats:
+    frames_processed: int = 0
+    echo_frames: int = 0
+    energy_in: float = 0.0
+    energy_out: float = 0.0
+
+    @property
+    def suppression_db(self) -> float:
+        #atenuacion media en las tramas con eco
+        if not self.energy_out:
+            return 0.0
+        return 10 * np.log10(self.energy_in / self.energy_out)
+
+class EchoReference:
+    #copia de lo que el altavoz ya reprodujo, remuestreada a la frecuencia de captura
+    def __init__(self,
+                 playback_rate: int = 24000,
+                 capture_rate: int = 16000,
+                 history_ms: float = 2000.0,
+                 output_latency_ms: float = 60.0,
+                 active_hangover_ms: float = 300.0):
+
+        self.capture_rate = capture_rate
+        self.step = playback_rate / capture_rate
+        self.output_latency = output_latency_ms / 1000
+        self.active_hangover = active_hangover_ms / 1000
+        self._buffer = np.zeros(int(capture_rate * history_ms / 1000), dtype= np.float32)
+        self._write_index = 0
+        self._end_time = 0.0
+        self._phase = 0.0
+        self._lock = threading.Lock()
+
+    def set_playback_rate(self, playback_rate: int) -> None:
+        with self._lock:
+            self.step = playback_rate / self.capture_rate
+            self._phase = 0.0
+
+    def _append(self, samples: np.ndarray) -> None:
+        capacity = len(self._buffer)
+        if len(samples) > capacity:
+            samples = samples[-capacity:]
+        start = self._write_index % capacity
+        first = min(len(samples), capacity - start)
+        self._buffer[start:start + first] = samples[:first]
+        if first < len(samples):
+            self._buffer[:len(samples) - first] = samples[first:]
+        self._write_index += len(samples)
+
+    def push(self, pcm: bytes, write_time: float) -> None:
+        #se llama desde el hilo de reproduccion justo despues de entregar el bloque al dispositivo
+        samples = np.frombuffer(pcm, dtype= '<i2').astype(np.float32) / 32768
+        if not len(samples):
+            return
+        end_time = write_time + self.output_latency
+        with self._lock:
+            #step y _phase cambian con set_playback_rate desde otro hilo: se leen y avanzan bajo el mismo lock
+            positions = np.arange(self._phase, len(samples), self.step)
+            self._phase = positions[-1] + self.step - len(samples) if len(positions) else self._phase - len(samples)
+            resampled = np.interp(positions, np.arange(len(samples)), samples).astype(np.float32)
+
+            #un hueco entre respuestas es silencio: mantiene alineado el tiempo con las muestras
+            gap = int((end_time - len(resampled) / self.capture_rate - self._end_time) * self.capture_rate)
+            if self._end_time and gap > 0:
+                self._append(np.zeros(min(gap, len(self._buffer)), dtype= np.float32))
+            self._append(resampled)
+            self._end_time = end_time
+
+    def active(self, now: float) -> bool:
+        return now <= self._end_time + self.active_hangover
+
+    def segment(self, capture_end_time: float, out: np.ndarray) -> None:
+        #rellena out con la referencia que sonaba durante las ultimas len(out) muestras capturadas
+        out[:] = 0
+        count = len(out)
+        capacity = len(self._buffer)
+        with self._lock:
+            end = self._write_index - int(round((self._end_time - capture_end_time) * self.capture_rate))
+            start = end - count
+            valid_start = max(start, self._write_index - capacity, 0)
+            valid_end = min(end, self._write_index)
+            if valid_end <= valid_start:
+                return
+            valid = valid_end - valid_start
+            offset = valid_start % capacity
+            first = min(valid, capacity - offset)
+            out[valid_start - start:valid_start - start + first] = self._buffer[offset:offset + first]
+            if first < valid:
+                out[valid_start - start + first:valid_end - start] = self._buffer[:valid - first]
+
+class EchoSuppressor:
+    #resta espectral del eco del altavoz usando la senal reproducida como referencia
+    def __init__(self,
+                 reference: EchoReference,
+                 frame_length: int = 320,
+                 over_subtraction: float = 1.5,
+                 gain_floor: float = 0.1,
+                 initial_coupling: float = 0.5,
+                 max_coupling: float = 4.0,
+                 adapt_down: float = 0.3,
+                 adapt_up: float = 0.01,
+                 reference_threshold_db: float = -55.0):
+
+        self.reference = reference
+        self.frame_length = frame_length
+        self.over_subtraction = over_subtraction
+        self.gain_floor = gain_floor
+        self.max_coupling = max_coupling
+        self.adapt_down = adapt_down
+        self.adapt_up = adapt_up
+        self.reference_threshold_db = reference_threshold_db
+        self.coupling = np.full(frame_length // 2 + 1, initial_coupling, dtype= np.float32)
+        self.stats = EchoStats()
+        self._reference = np.zeros(frame_length * 8, dtype= np.float32)
+
+    def process(self, samples: np.ndarray, capture_end_time: float) -> np.ndarray:
+        frame_count = len(samples) // self.frame_length
+        if not frame_count or not self.reference.active(time.perf_counter()):
+            return samples
+
+        if len(self._reference) < len(samples):
+            self._reference = np.zeros(len(samples), dtype= np.float32)
+        reference = self._reference[:len(samples)]
+        self.reference.segment(capture_end_time, reference)
+
+        used = frame_count * self.frame_length
+        capture_frames = samples[:used].reshape(frame_count, self.frame_length).astype(np.float32) / 32768
+        reference_frames = reference[:used].reshape(frame_count, self.frame_length)
+        reference_db = 10 * np.log10(np.mean(reference_frames * reference_frames, axis= 1) + 1e-10)
+        echo = reference_db > self.reference_threshold_db
+        self.stats.frames_processed += frame_count
+        if not echo.any():
+            return samples
+
+        spectrum = np.fft.rfft(capture_frames, axis= 1)
+        capture_magnitude = np.abs(spectrum) + 1e-9
+        reference_magnitude = np.abs(np.fft.rfft(reference_frames, axis= 1))
+
+        for i in np.flatnonzero(echo):
+            #envolvente inferior del acoplamiento: baja rapido hacia el eco puro y sube despacio
+            #para no aprender la voz del usuario durante la doble conversacion
+            ratio = capture_magnitude[i] / (reference_magnitude[i] + 1e-9)
+            self.coupling = np.where(ratio < self.coupling,
+                                     self.coupling + self.adapt_down * (ratio - self.coupling),
+                                     np.minimum(self.coupling * (1 + self.adapt_up), self.max_coupling)).astype(np.float32)
+
+        gains = np.clip(1 - self.over_subtraction * self.coupling * reference_magnitude / capture_magnitude,
+                        self.gain_floor, 1.0)
+        gains[~echo] = 1.0
+        cleaned = np.fft.irfft(spectrum * gains, n= self.frame_length, axis= 1)
+
+        self.stats.echo_frames += int(echo.sum())
+        self.stats.energy_in += float(np.sum(capture_frames[echo] ** 2))
+        self.stats.energy_out += float(np.sum(cleaned[echo] ** 2))
+
+        output = samples.copy()
+        output[:used] = np.clip(cleaned * 32768, -32768, 32767).astype(np.int16).reshape(-1)
+        return output
@@ -1,9 +1,15 @@
 import logging
 from AgentProject.core.audio_orchestrator.stt_streaming import DeepgramStreamingSTT
+from AgentProject.core.audio_orchestrator.vad import SpectralEnergyVAD, VoiceActivityGate, VADStats
+from AgentProject.core.audio_orchestrator.audio_source import AudioSource
+from AgentProject.core.audio_orchestrator.turn_detector import TurnDetector, EndOfTurnPolicy, TurnStats
+from AgentProject.core.audio_orchestrator.echo_suppression import EchoReference, EchoSuppressor, EchoStats
 from deepgram.extensions.types.sockets import ListenV1SocketClientResponse
 import threading
+import asyncio
 import queue
-from typing import Optional, Tuple
+import time
+from typing import Any, AsyncGenerator, Callable, List, Optional, Tuple
 
 logging.basicConfig(
             level= logging.INFO,
@@ -12,41 +18,152 @@ logging.basicConfig(
 
 logger = logging.getLogger(__name__)
 
+#a partir de aqui los parciales acumulados se colapsan en el mas reciente
+MAX_PENDING_TRANSCRIPTS = 32
+
 class STTManager:
-    def __init__(self, deepgram_api_key: str) -> None:
-        self.transcription_queue = queue.Queue(maxsize=1)
+    def __init__(self,
+                 deepgram_api_key: str,
+                 engine: str = 'deepgram',
+                 block_ms: float = 20.0,
+                 ring_buffer_ms: int = 2000,
+                 backpressure_policy: str = 'drop_oldest',
+                 vad_enabled: bool = True,
+                 vad_energy_margin_db: float = 10.0,
+                 vad_min_speech_ms: float = 60.0,
+                 vad_hangover_ms: float = 300.0,
+                 vad_silence_suppress_ms: float = 1500.0,
+                 vad_preroll_ms: float = 300.0,
+                 whisper_model_size: str = 'small',
+                 whisper_compute_type: str = 'int8',
+                 whisper_cpu_threads: int = 4,
+                 whisper_beam_size: int = 1,
+                 whisper_partial_interval_ms: float = 800.0,
+                 whisper_partial_window_s: float = 6.0,
+                 whisper_model: Any = None,
+                 audio_source: Optional[AudioSource] = None,
+                 turn_policy: Optional[EndOfTurnPolicy] = None,
+                 endpointing_ms: int = 400,
+                 utterance_end_ms: int = 1000,
+                 echo_reference: Optional[EchoReference] = None) -> None:
+        #los parciales pueden descartarse; el turno completo es uno solo por enunciado
+        self.transcription_queue = queue.Queue()
         self.is_listening = False
         self.lock = threading.Lock()
         self.interruption_flag = threading.Event()
         self.microphone_flag = False
+        self.last_speech_start_time = 0.0
+        #instantes (perf_counter) del ultimo turno completo, para la telemetria
+        self.last_end_of_speech_time: Optional[float] = None
+        self.last_turn_time: Optional[float] = None
+        self.barge_in_listeners: List[Callable[[float], None]] = []
+        self.echo_reference = echo_reference
+        self.echo_suppressor = EchoSuppressor(echo_reference) if echo_reference else None
+        self.vad: Optional[SpectralEnergyVAD] = None
+        self.echo_transcripts_dropped = 0
+        #contrapartes asincronas de la cola y la bandera; se crean al enlazar el bucle de eventos del grafo
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._transcripts: Optional[asyncio.Queue] = None
+        self.interruption_event: Optional[asyncio.Event] = None
 
         def _put_in_queue(transcription_queue: queue.Queue, item: Tuple):
             try:
-                transcription_queue.put_nowait(item)
-            except queue.Full:
-                try:
-                    transcription_queue.get_nowait()
-                except queue.Empty:
-                    pass
-                transcription_queue.put_nowait(item)
+                if not self._deliver_async(item):
+                    self._put_nowait(transcription_queue, item)
             finally:
                 self._signal_interruption()
                 logger.info('Se levanto la bandera')
 
+        def _on_turn(text: str):
+            self.last_end_of_speech_time = self.turn_detector.last_speech_end_time
+            self.last_turn_time = time.perf_counter()
+            _put_in_queue(self.transcription_queue, (True, text))
+
+        self.turn_detector = TurnDetector(
+            policy= turn_policy or EndOfTurnPolicy(),
+            on_turn= _on_turn)
+
         def transcription_callback(msg: ListenV1SocketClientResponse):
             try:
-                if hasattr(msg, 'channel') and hasattr(msg.channel, 'alternatives') and len(msg.channel.alternatives) > 0:
+                message_type = getattr(msg, 'type', None)
+                if message_type == 'Results' and self._echo_only():
+                    return
+                if message_type == 'UtteranceEnd':
+                    self.turn_detector.on_utterance_end()
+                elif message_type == 'SpeechStarted':
+                    self.turn_detector.on_speech_start()
+                elif hasattr(msg, 'channel') and hasattr(msg.channel, 'alternatives') and len(msg.channel.alternatives) > 0:
                     sentence = msg.channel.alternatives[0].transcript
+                    is_final = getattr(msg, 'is_final', False)
+                    speech_final = getattr(msg, 'speech_final', False)
                     if len(sentence.strip()) > 0:
-                        is_final = getattr(msg, 'is_final', False)
-                        new_item = (is_final, sentence)
-                        _put_in_queue(self.transcription_queue, new_item)
+                        if not is_final:
+                            _put_in_queue(self.transcription_queue, (False, sentence))
+                        self.turn_detector.on_segment(sentence, is_final, speech_final)
+                    elif speech_final:
+                        #un speech_final vacio cierra lo acumulado hasta ahora
+                        self.turn_detector.on_segment('', True, True)
             except Exception as e:
                 logger.error(f'Error en callback de transcription: {str(e)}')
 
+        def tuple_callback(item: Tuple[bool, str]):
+            is_final, sentence = item
+            if self._echo_only():
+                return
+            if len(sentence.strip()) > 0:
+                if not is_final:
+                    _put_in_queue(self.transcription_queue, item)
+                #los segmentos finales de whisper ya terminan en un fin de voz detectado por el VAD
+                self.turn_detector.on_segment(sentence, is_final, speech_final= is_final)
+
+        if engine == 'faster-whisper':
+            #motor local sin red: misma interfaz y las mismas tuplas (is_final, sentence)
+            from AgentProject.core.audio_orchestrator.stt_whisper import FasterWhisperStreamingSTT
+            self.vad = SpectralEnergyVAD(energy_margin_db= vad_energy_margin_db,
+                                         min_speech_ms= vad_min_speech_ms,
+                                         hangover_ms= vad_hangover_ms)
+            self.stt_engine = FasterWhisperStreamingSTT(
+                callback= tuple_callback,
+                vad= self.vad,
+                model_size= whisper_model_size,
+                compute_type= whisper_compute_type,
+                cpu_threads= whisper_cpu_threads,
+                beam_size= whisper_beam_size,
+                block_ms= block_ms,
+                ring_buffer_ms= ring_buffer_ms,
+                backpressure_policy= backpressure_policy,
+                partial_interval_ms= whisper_partial_interval_ms,
+                partial_window_s= whisper_partial_window_s,
+                preroll_ms= vad_preroll_ms,
+                on_speech_start= self._on_speech_start,
+                audio_source= audio_source,
+                echo_suppressor= self.echo_suppressor,
+                model= whisper_model)
+            return
+
+        vad_gate = None
+        if vad_enabled:
+            self.vad = SpectralEnergyVAD(energy_margin_db= vad_energy_margin_db,
+                                         min_speech_ms= vad_min_speech_ms,
+                                         hangover_ms= vad_hangover_ms)
+            vad_gate = VoiceActivityGate(
+                vad= self.vad,
+                silence_suppress_ms= vad_silence_suppress_ms,
+                preroll_ms= vad_preroll_ms,
+                on_speech_start= self._on_speech_start,
+                on_speech_end= self.turn_detector.on_speech_end)
+
         self.stt_engine = DeepgramStreamingSTT(
             deepgram_api_key= deepgram_api_key,
-            callback= transcription_callback)
+            callback= transcription_callback,
+            block_ms= block_ms,
+            ring_buffer_ms= ring_buffer_ms,
+            backpressure_policy= backpressure_policy,
+            vad_gate= vad_gate,
+            audio_source= audio_source,
+            endpointing_ms= endpointing_ms,
+            utterance_end_ms= utterance_end_ms,
+            echo_suppressor= self.echo_suppressor)
 
     def start_listening(self):
         with self.lock:
@@ -57,12 +174,108 @@ class STTManager:
                 logger.info('Servicio de escucha iniciado')
         
     def stop_listening(self):
+        #solo cierra el microfono; la conexion con Deepgram se mantiene entre turnos
         with self.lock:
             if self.is_listening:
-                self.stt_engine.stop_recording()
+                self.stt_engine.stop_microphone()
                 self.is_listening = False
                 self.microphone_flag = False
-                logger.info('Servicio de escucha detenido')
+                logger.info('Servicio de escucha pausado')
+
+    def shutdown(self):
+        with self.lock:
+            self.stt_engine.stop_recording()
+            self.is_listening = False
+            self.microphone_flag = False
+            logger.info('Servicio de escucha detenido')
+
+        vad_stats = self.vad_stats()
+        if vad_stats:
+            logger.info(f'VAD: {vad_stats.bandwidth_saved:.0%} de ancho de banda ahorrado, '
+                        f'deteccion de voz media {vad_stats.mean_detection_latency_ms:.0f} ms')
+        turn_stats = self.turn_stats()
+        logger.info(f'Turnos: {turn_stats.turns}, deteccion de fin de turno media {turn_stats.mean_latency_ms:.0f} ms')
+        echo_stats = self.echo_stats()
+        if echo_stats:
+            logger.info(f'Eco: {echo_stats.suppression_db:.1f} dB de atenuacion, '
+                        f'{self.echo_transcripts_dropped} transcripciones de eco descartadas')
+
+    @staticmethod
+    def _put_nowait(transcription_queue, item: Tuple):
+        #sirve para queue.Queue y asyncio.Queue; un final (True, texto) es un turno del usuario y nunca se descarta
+        if transcription_queue.qsize() >= MAX_PENDING_TRANSCRIPTS:
+            pending = []
+            while True:
+                try:
+                    pending.append(transcription_queue.get_nowait())
+                    transcription_queue.task_done()
+                except (queue.Empty, asyncio.QueueEmpty):
+                    break
+            #los parciales pendientes quedan obsoletos: el nuevo elemento es mas reciente que todos ellos
+            for pending_item in pending:
+                if pending_item[0]:
+                    transcription_queue.put_nowait(pending_item)
+        transcription_queue.put_nowait(item)
+
+    def bind(self, loop: asyncio.AbstractEventLoop):
+        if self._loop is loop:
+            return
+        self._transcripts = asyncio.Queue()
+        self.interruption_event = asyncio.Event()
+        self._loop = loop
+        #lo que llego antes de enlazar el bucle pasa a la cola asincrona en el mismo orden
+        while True:
+            try:
+                self._put_nowait(self._transcripts, self.transcription_queue.get_nowait())
+            except queue.Empty:
+                break
+        if self.interruption_flag.is_set():
+            self.interruption_event.set()
+
+    def _call_in_loop(self, callback: Callable, *args) -> bool:
+        loop = self._loop
+        if loop is None or loop.is_closed():
+            return False
+        try:
+            loop.call_soon_threadsafe(callback, *args)
+            return True
+        except RuntimeError:
+            return False
+
+    def _deliver_async(self, item: Tuple) -> bool:
+        return self._call_in_loop(lambda: self._put_nowait(self._transcripts, item))
+
+    def _wake_interruption(self):
+        #se ejecuta en el bucle de eventos
+        if self.interruption_event is not None:
+            self.interruption_event.set()
+
+    async def next_transcription(self) -> Tuple[bool, str]:
+        #despierta solo cuando llega una transcripcion; no ocupa ningun hilo mientras el usuario calla
+        self.bind(asyncio.get_running_loop())
+        return await self._transcripts.get()
+
+    async def transcriptions(self) -> AsyncGenerator[Tuple[bool, str], None]:
+        while True:
+            yield await self.next_transcription()
+
+    def async_interruption(self) -> asyncio.Event:
+        #evento que despierta al levantarse la bandera, para esperar sin sondearla (p. ej. en el TTS)
+        self.bind(asyncio.get_running_loop())
+        return self.interruption_event
+
+    async def wait_for_interruption(self):
+        #la bandera de hilos es la fuente de verdad; el evento solo sirve para despertar
+        self.bind(asyncio.get_running_loop())
+        while not self.interruption_flag.is_set():
+            self.interruption_event.clear()
+            await self.interruption_event.wait()
+
+    def clear_transcriptions(self):
+        #descarta lo pendiente, p. ej. al reutilizar el gestor en otra conversacion
+        for pending in (self.transcription_queue, self._transcripts):
+            while pending is not None and not pending.empty():
+                pending.get_nowait()
 
     def get_transcription(self, timeout: float = 0.1) -> Optional[Tuple[bool, str]]:
         try:
@@ -74,9 +287,45 @@ class STTManager:
         except Exception as e:
             logger.error(f'Error en la obtencion de la transcripcion {str(e)}')
         
+    def _on_speech_start(self, speech_start_time: float):
+        #la voz local levanta la bandera sin esperar la transcripcion de Deepgram
+        self.last_speech_start_time = speech_start_time
+        self.turn_detector.on_speech_start()
+        self._signal_interruption()
+        #los oyentes (p. ej. el TTS) vacian la reproduccion desde este mismo hilo, sin pasar por el grafo
+        for listener in self.barge_in_listeners:
+            try:
+                listener(speech_start_time)
+            except Exception as e:
+                logger.error(f'Error en el oyente de interrupcion: {str(e)}')
+        logger.info(f'Inicio de voz detectado localmente ({(time.perf_counter() - speech_start_time) * 1000:.0f} ms)')
+
+    def add_barge_in_listener(self, listener: Callable[[float], None]):
+        self.barge_in_listeners.append(listener)
+
+    def agent_speaking(self) -> bool:
+        return bool(self.echo_reference and self.echo_reference.active(time.perf_counter()))
+
+    def _echo_only(self) -> bool:
+        #mientras el agente habla, una transcripcion sin voz local detectada es eco residual
+        if self.agent_speaking() and self.vad is not None and not self.vad.in_speech:
+            self.echo_transcripts_dropped += 1
+            return True
+        return False
+
+    def echo_stats(self) -> Optional[EchoStats]:
+        return self.echo_suppressor.stats if self.echo_suppressor else None
+
+    def vad_stats(self) -> Optional[VADStats]:
+        return self.stt_engine.vad_stats()
+
+    def turn_stats(self) -> TurnStats:
+        return self.turn_detector.stats
+
     def _signal_interruption(self):
         if not self.interruption_flag.is_set():
             self.interruption_flag.set()
+            self._call_in_loop(self._wake_interruption)
     
     def check_interruption(self) -> bool:
         return self.interruption_flag.is_set()
@@ -123,7 +372,7 @@ if __name__ == '__main__':
         except KeyboardInterrupt:
             pass
         finally:
-            stt_manager.stop_listening()
+            stt_manager.shutdown()
 
     main(deepgram_key= app_config.DEEPGRAM_API_KEY)
 
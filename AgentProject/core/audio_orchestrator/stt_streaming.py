@@ -1,10 +1,14 @@
-import numpy as np
 from typing import Callable, Optional
-import queue
 import threading
-import sounddevice as sd
+import time
 from deepgram import AsyncDeepgramClient
 from deepgram.core.events import EventType
+from deepgram.extensions.types.sockets import ListenV1ControlMessage
+from AgentProject.core.audio_orchestrator.audio_ring_buffer import PCMRingBuffer, RingBufferStats
+from AgentProject.core.audio_orchestrator.audio_source import AudioSource, MicrophoneAudioSource
+from AgentProject.core.audio_orchestrator.audio_bridge import AsyncAudioBridge
+from AgentProject.core.audio_orchestrator.vad import VoiceActivityGate, VADStats
+from AgentProject.core.audio_orchestrator.echo_suppression import EchoSuppressor
 import logging
 import asyncio
 
@@ -22,101 +26,169 @@ class DeepgramStreamingSTT:
                 callback: Callable,
                 sample_rate: int = 16000,
                 channels: int = 1,
-                blocksize: int = 4096,
+                block_ms: float = 20.0,
+                ring_buffer_ms: int = 2000,
+                backpressure_policy: str = 'drop_oldest',
                 model_name: str = 'nova-3',
-                language: str = 'es'):
-        
+                language: str = 'es',
+                keepalive_interval: float = 5.0,
+                reconnect_delay: float = 0.5,
+                max_reconnect_delay: float = 8.0,
+                close_timeout: float = 1.5,
+                vad_gate: Optional[VoiceActivityGate] = None,
+                audio_source: Optional[AudioSource] = None,
+                endpointing_ms: int = 400,
+                utterance_end_ms: int = 1000,
+                echo_suppressor: Optional[EchoSuppressor] = None):
+
         self.deepgram_api_key = deepgram_api_key
-        self.blocksize = blocksize
+        self.blocksize = max(1, int(sample_rate * block_ms / 1000))
         self.callback = callback
         self.is_recording = False
+        self.session_active = False
         self.channels = channels
         self.sample_rate = sample_rate
         self.model_name = model_name
         self.language = language
+        self.keepalive_interval = keepalive_interval
+        self.reconnect_delay = reconnect_delay
+        self.max_reconnect_delay = max_reconnect_delay
+        self.close_timeout = close_timeout
+        self.vad_gate = vad_gate
+        self.echo_suppressor = echo_suppressor
+        self.endpointing_ms = endpointing_ms
+        self.utterance_end_ms = utterance_end_ms
+        self.reconnections = 0
+        self.audio_source = audio_source or MicrophoneAudioSource(sample_rate= sample_rate,
+                                                                  channels= channels,
+                                                                  blocksize= self.blocksize)
         self._listen_task: Optional[asyncio.Task] = None
-        self.audio_queue = queue.Queue()
+        self._session_task: Optional[asyncio.Task] = None
+        self.ring_buffer = PCMRingBuffer(capacity_samples= int(sample_rate * ring_buffer_ms / 1000) * channels,
+                                         overflow_policy= backpressure_policy)
+        self.audio_bridge = AsyncAudioBridge(self.ring_buffer)
+        self._stop_event: Optional[asyncio.Event] = None
         self._loop: Optional[asyncio.AbstractEventLoop] = None
         self._thread: Optional[threading.Thread] = None
 
     def _audio_callback(self, indata, frames, time, status) -> None:
         if not self.is_recording:
             return
-        audio_data_16 = (indata * 32767).astype(np.int16)
-        try:
-            self.audio_queue.put(audio_data_16.tobytes())
-        except Exception as e:
-            logger.error(f'Error al colocar audio en cola: {str(e)}')
+        self.audio_bridge.push(indata)
+
+    def capture_stats(self) -> RingBufferStats:
+        return self.ring_buffer.stats()
+
+    def vad_stats(self) -> Optional[VADStats]:
+        return self.vad_gate.stats if self.vad_gate else None
 
     def start_recording(self) -> None:
+        #la sesion (hilo, loop y websocket) se crea una sola vez; luego solo se abre el microfono
         if self.is_recording:
             return
-        
+
         try:
-            self.stream = sd.InputStream(
-                blocksize= self.blocksize,
-                callback= self._audio_callback,
-                channels= self.channels,
-                samplerate= self.sample_rate,
-                dtype= 'float32'
-            )
-            self._loop = asyncio.new_event_loop()
-            self._thread = threading.Thread(target=self._run_async_loop, daemon=True)
-            self._thread.start()
-            self.stream.start()
+            if not self.session_active:
+                self._start_session()
+            if not self.audio_source.active:
+                self.audio_source.start(self._audio_callback)
             self.is_recording = True
             logger.info('Streaming de audio iniciado')
         except Exception as e:
             logger.error(f'Error al Inicializar el Streaming: {str(e)} ')
 
+    def _start_session(self) -> None:
+        self.session_active = True
+        self._loop = asyncio.new_event_loop()
+        self.audio_bridge.bind(self._loop)
+        self._thread = threading.Thread(target=self._run_async_loop, daemon=True)
+        self._thread.start()
+        logger.info('Sesion STT persistente iniciada')
+
     def stop_recording(self) -> None:
-        if not self.is_recording:
+        if not self.session_active and not self.audio_source.active:
             return
-        
+
         self.is_recording = False
-        if hasattr(self, 'stream') and self.stream:
-            try:
-                logger.info('Se cerro el Stream')
-                self.stream.stop()
-                self.stream.close()
-            except:
-                logger.error('Error al Cerrar el Stream')
+        self.session_active = False
+        self.audio_source.stop()
 
+        #cierre ordenado: el emisor vacia el buffer, envia CloseStream y espera las ultimas transcripciones
+        self.audio_bridge.close()
         if self._loop and self._loop.is_running():
             try:
-                self._loop.call_soon_threadsafe(self._cancel_listening)
-                logger.info('Loop de evento STT cerrado')
-            except:
-                logger.error('Error al cerrar loop de eventos')
+                self._loop.call_soon_threadsafe(self._request_stop)
+            except RuntimeError:
+                pass
         if self._thread:
-            self._thread.join(timeout=2.0)
+            self._thread.join(timeout= self.close_timeout + 0.5)
+            if self._thread.is_alive() and self._loop and self._loop.is_running():
+                logger.warning('Cierre ordenado agotado, cancelando la sesion STT')
+                try:
+                    self._loop.call_soon_threadsafe(self._cancel_listening)
+                except RuntimeError:
+                    pass
+                self._thread.join(timeout=1.0)
+            self._thread = None
             logger.info('Deepgram streaming detenido')
-    
+
+    def _request_stop(self):
+        if self._stop_event:
+            self._stop_event.set()
+
     def _cancel_listening(self):
-        if hasattr(self, '_listen_task') and self._listen_task:
+        if self._session_task:
+            self._session_task.cancel()
+        if self._listen_task:
             self._listen_task.cancel()
 
     def _run_async_loop(self):
         asyncio.set_event_loop(self._loop)
         try:
-            self._loop.run_until_complete(self._stream_audio_to_deepgram())
+            self._session_task = self._loop.create_task(self._run_session())
+            self._loop.run_until_complete(self._session_task)
+        except asyncio.CancelledError:
+            pass
         except Exception as e:
             logger.error(f'Error en loop asincrono: {str(e)}')
-    
+        finally:
+            self._loop.close()
+
+    async def _run_session(self):
+        #reconecta solo cuando la conexion falla, con espera exponencial
+        self._stop_event = asyncio.Event()
+        delay = self.reconnect_delay
+        while self.session_active:
+            started = time.monotonic()
+            await self._stream_audio_to_deepgram()
+            if not self.session_active:
+                break
+
+            if time.monotonic() - started > self.max_reconnect_delay:
+                delay = self.reconnect_delay
+            self.reconnections += 1
+            logger.warning(f'Conexion Deepgram perdida, reconectando en {delay:.1f}s')
+            try:
+                await asyncio.wait_for(self._stop_event.wait(), timeout= delay)
+            except TimeoutError:
+                pass
+            delay = min(delay * 2, self.max_reconnect_delay)
+
     async def _stream_audio_to_deepgram(self):
         client = AsyncDeepgramClient(api_key=self.deepgram_api_key)
 
         try:
             async with client.listen.v1.connect(
-                model=self.model_name, 
+                model=self.model_name,
                 language=self.language,
-                encoding='linear16', 
+                encoding='linear16',
                 channels=self.channels,
                 sample_rate=str(self.sample_rate),
                 interim_results=True,
                 vad_events=True,
                 smart_format=True,
-                endpointing=400
+                endpointing=self.endpointing_ms,
+                utterance_end_ms=str(self.utterance_end_ms)
             ) as connection:
 
                 connection.on(EventType.OPEN, lambda _: logger.info("Conexión abierta con Deepgram"))
@@ -126,36 +198,50 @@ class DeepgramStreamingSTT:
 
                 self._listen_task = asyncio.create_task(connection.start_listening())
 
-                loop = asyncio.get_event_loop()
-                while self.is_recording:
-                    try:
-                        chunk = await loop.run_in_executor(None, self.audio_queue.get, True, 0.1)
-                        await connection._send(chunk)
-                    except queue.Empty:
-                        continue
-                
-                if self._listen_task:
+                last_sent = time.monotonic()
+                closed = False
+                while not closed and not self._listen_task.done():
+                    samples, closed = await self.audio_bridge.drain(timeout= self.keepalive_interval)
+                    payload = self.audio_bridge.out[:samples] if samples else None
+                    if payload is not None and self.echo_suppressor:
+                        #la voz del propio agente se atenua antes del VAD y del envio
+                        payload = self.echo_suppressor.process(payload, self.audio_bridge.newest_capture_time)
+                    if payload is not None and self.vad_gate:
+                        payload = self.vad_gate.process(payload, self.audio_bridge.newest_capture_time)
+
+                    if payload is not None:
+                        await connection.send_media(payload.tobytes())
+                        last_sent = time.monotonic()
+                    #mantiene vivo el websocket con el microfono cerrado o durante silencios suprimidos
+                    elif not closed and time.monotonic() - last_sent >= self.keepalive_interval:
+                        await connection.send_control(ListenV1ControlMessage(type='KeepAlive'))
+                        last_sent = time.monotonic()
+
+                if closed and not self._listen_task.done():
+                    await connection.send_control(ListenV1ControlMessage(type='CloseStream'))
                     try:
-                        await self._listen_task
-                    except asyncio.CancelledError:
+                        await asyncio.wait_for(asyncio.shield(self._listen_task), timeout= self.close_timeout)
+                    except TimeoutError:
                         pass
-        
+
+                if not self._listen_task.done():
+                    self._listen_task.cancel()
+                try:
+                    await self._listen_task
+                except asyncio.CancelledError:
+                    pass
+
+        except asyncio.CancelledError:
+            raise
         except Exception as e:
             logger.error(f'Error en conexion Deepgram: {str(e)}')
 
     def stop_microphone(self):
-        if hasattr(self, 'stream') and self.stream:
-            try:
-                logger.info('Se pauso el microfono')
-                self.stream.stop()
-            except Exception as e:
-                logger.error(f'Error al pausar el microfono: {str(e)}')
-    
+        if self.is_recording:
+            self.is_recording = False
+            logger.info('Se pauso el microfono')
+
     def start_microphone(self):
-        if hasattr(self, 'stream') and self.stream:
-            try:
-                logger.info('Se inicio el microfono')
-                self.stream.start()
-            except Exception as e:
-                logger.error(f'Error al inicial el microfono: {str(e)}')
-            
\ No newline at end of file
+        if self.audio_source.active and not self.is_recording:
+            self.is_recording = True
+            logger.info('Se inicio el microfono')
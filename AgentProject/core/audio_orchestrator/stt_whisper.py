@@ -0,0 +1,226 @@
+from AgentProject.core.audio_orchestrator.audio_ring_buffer import PCMRingBuffer, RingBufferStats
+from AgentProject.core.audio_orchestrator.audio_source import AudioSource, MicrophoneAudioSource
+from AgentProject.core.audio_orchestrator.vad import SpectralEnergyVAD
+from AgentProject.core.audio_orchestrator.echo_suppression import EchoSuppressor
+from faster_whisper import WhisperModel
+from typing import Callable, Optional, Tuple
+import numpy as np
+import threading
+import logging
+import time
+
+logging.basicConfig(
+            level= logging.INFO,
+            format= '%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+        )
+
+logger = logging.getLogger(__name__)
+
+def load_whisper_model(model_size: str = 'small',
+                       compute_type: str = 'int8',
+                       cpu_threads: int = 4,
+                       num_workers: int = 1,
+                       models_dir: Optional[str] = None,
+                       sample_rate: int = 16000) -> WhisperModel:
+    #el modelo se carga y se calienta una sola vez; num_workers permite decodificar varias sesiones a la vez
+    started = time.perf_counter()
+    model = WhisperModel(model_size,
+                         device= 'cpu',
+                         compute_type= compute_type,
+                         cpu_threads= cpu_threads,
+                         num_workers= num_workers,
+                         download_root= models_dir)
+    segments, _ = model.transcribe(np.zeros(sample_rate, dtype= np.float32), beam_size= 1, without_timestamps= True)
+    list(segments)
+    logger.info(f'Modelo faster-whisper {model_size} ({compute_type}) listo en {time.perf_counter() - started:.1f}s')
+    return model
+
+class FasterWhisperStreamingSTT:
+    def __init__(self,
+                 callback: Callable[[Tuple[bool, str]], None],
+                 vad: SpectralEnergyVAD,
+                 model_size: str = 'small',
+                 compute_type: str = 'int8',
+                 cpu_threads: int = 4,
+                 beam_size: int = 1,
+                 language: str = 'es',
+                 sample_rate: int = 16000,
+                 channels: int = 1,
+                 block_ms: float = 20.0,
+                 ring_buffer_ms: int = 2000,
+                 backpressure_policy: str = 'drop_oldest',
+                 partial_interval_ms: float = 800.0,
+                 partial_window_s: float = 6.0,
+                 max_segment_s: float = 20.0,
+                 preroll_ms: float = 300.0,
+                 on_speech_start: Optional[Callable[[float], None]] = None,
+                 models_dir: Optional[str] = None,
+                 audio_source: Optional[AudioSource] = None,
+                 echo_suppressor: Optional[EchoSuppressor] = None,
+                 model: Optional[WhisperModel] = None):
+
+        self.callback = callback
+        self.vad = vad
+        self.beam_size = beam_size
+        self.language = language
+        self.sample_rate = sample_rate
+        self.channels = channels
+        self.blocksize = max(1, int(sample_rate * block_ms / 1000))
+        self.partial_interval = int(sample_rate * partial_interval_ms / 1000)
+        self.partial_window = int(sample_rate * partial_window_s)
+        self.on_speech_start = on_speech_start
+        self.echo_suppressor = echo_suppressor
+        self.is_recording = False
+        self.session_active = False
+        self.audio_source = audio_source or MicrophoneAudioSource(sample_rate= sample_rate,
+                                                                  channels= channels,
+                                                                  blocksize= self.blocksize)
+        self._thread: Optional[threading.Thread] = None
+
+        #una decodificacion final puede tardar segundos; el buffer debe cubrirla sin perder audio
+        ring_buffer_ms = max(ring_buffer_ms, 10000)
+        self.ring_buffer = PCMRingBuffer(capacity_samples= int(sample_rate * ring_buffer_ms / 1000) * channels,
+                                         overflow_policy= backpressure_policy)
+        self._read_buffer = np.zeros(self.ring_buffer.capacity, dtype= np.int16)
+        self._segment = np.zeros(int(sample_rate * max_segment_s), dtype= np.int16)
+        self._segment_length = 0
+        self._preroll_samples = int(sample_rate * preroll_ms / 1000)
+        self._last_partial_length = 0
+        self._data_ready = threading.Event()
+
+        #el modelo no guarda estado de la conversacion: con varias sesiones se comparte uno ya cargado
+        self.model = model or load_whisper_model(model_size= model_size,
+                                                 compute_type= compute_type,
+                                                 cpu_threads= cpu_threads,
+                                                 models_dir= models_dir,
+                                                 sample_rate= sample_rate)
+
+    def _audio_callback(self, indata, frames, time, status) -> None:
+        if not self.is_recording:
+            return
+        self.ring_buffer.write_float32(indata)
+        self._data_ready.set()
+
+    def capture_stats(self) -> RingBufferStats:
+        return self.ring_buffer.stats()
+
+    def vad_stats(self):
+        return None
+
+    def start_recording(self) -> None:
+        if self.is_recording:
+            return
+
+        try:
+            if not self.session_active:
+                self.session_active = True
+                self._thread = threading.Thread(target= self._run_worker, daemon= True)
+                self._thread.start()
+            if not self.audio_source.active:
+                self.audio_source.start(self._audio_callback)
+            self.is_recording = True
+            logger.info('Streaming de audio local iniciado')
+        except Exception as e:
+            logger.error(f'Error al Inicializar el Streaming local: {str(e)}')
+
+    def stop_recording(self) -> None:
+        if not self.session_active and not self.audio_source.active:
+            return
+
+        self.is_recording = False
+        self.session_active = False
+        self.audio_source.stop()
+
+        self._data_ready.set()
+        if self._thread:
+            self._thread.join(timeout= 5.0)
+            self._thread = None
+        logger.info('faster-whisper streaming detenido')
+
+    def stop_microphone(self):
+        if self.is_recording:
+            self.is_recording = False
+            logger.info('Se pauso el microfono')
+
+    def start_microphone(self):
+        if self.audio_source.active and not self.is_recording:
+            self.is_recording = True
+            logger.info('Se inicio el microfono')
+
+    def _decode(self, audio: np.ndarray, beam_size: int) -> str:
+        segments, _ = self.model.transcribe(audio,
+                                            language= self.language,
+                                            beam_size= beam_size,
+                                            condition_on_previous_text= False,
+                                            without_timestamps= True,
+                                            vad_filter= False)
+        return ''.join(segment.text for segment in segments).strip()
+
+    def _segment_audio(self, window: Optional[int] = None) -> np.ndarray:
+        start = max(0, self._segment_length - window) if window else 0
+        return self._segment[start:self._segment_length].astype(np.float32) / 32768
+
+    def _append(self, samples: np.ndarray) -> np.ndarray:
+        #devuelve lo que no cupo en el segmento para que abra el siguiente
+        count = min(len(samples), len(self._segment) - self._segment_length)
+        self._segment[self._segment_length:self._segment_length + count] = samples[:count]
+        self._segment_length += count
+        return samples[count:]
+
+    def _keep_preroll(self) -> None:
+        #fuera de la voz solo se conserva un pre-roll corto
+        if self._segment_length > self._preroll_samples:
+            self._segment[:self._preroll_samples] = self._segment[self._segment_length - self._preroll_samples:self._segment_length]
+            self._segment_length = self._preroll_samples
+
+    def _emit(self, is_final: bool) -> None:
+        try:
+            #el parcial es una vista previa: solo la ventana final, para que su coste no crezca con la frase
+            audio = self._segment_audio() if is_final else self._segment_audio(self.partial_window)
+            text = self._decode(audio, beam_size= self.beam_size if is_final else 1)
+            if text:
+                self.callback((is_final, text))
+        except Exception as e:
+            logger.error(f'Error en la decodificacion de faster-whisper: {str(e)}')
+
+    def _run_worker(self) -> None:
+        #la decodificacion ocurre en este hilo; el callback de audio nunca se bloquea
+        in_segment = False
+        while self.session_active:
+            if not self._data_ready.wait(timeout= 0.5):
+                continue
+            self._data_ready.clear()
+
+            samples = self.ring_buffer.read_into(self._read_buffer)
+            if not samples:
+                continue
+            chunk = self._read_buffer[:samples]
+            if self.echo_suppressor:
+                chunk = self.echo_suppressor.process(chunk, time.perf_counter())
+            was_in_speech = self.vad.in_speech
+            self.vad.process(chunk, time.perf_counter(), self.on_speech_start)
+            rest = self._append(chunk)
+
+            if self.vad.in_speech and not was_in_speech:
+                in_segment = True
+                self._last_partial_length = self._segment_length
+
+            if not in_segment:
+                self._keep_preroll()
+                continue
+
+            segment_full = self._segment_length >= len(self._segment)
+            if not self.vad.in_speech or segment_full:
+                self._emit(is_final= True)
+                #si el segmento se lleno con el usuario aun hablando, el resto de la frase abre otro segmento
+                in_segment = self.vad.in_speech
+                self._segment_length = 0
+                self._last_partial_length = 0
+                while len(rest):
+                    rest = self._append(rest)
+                    if len(rest):
+                        self._emit(is_final= True)
+                        self._segment_length = 0
+            elif self._segment_length - self._last_partial_length >= self.partial_interval:
+                self._emit(is_final= False)
+                self._last_partial_length = self._segment_length
@@ -1,12 +1,19 @@
-import websockets
-import pyaudio
-import json
 import asyncio
-import base64
-from typing import AsyncGenerator
+import binascii
+from dataclasses import dataclass, field
+from typing import AsyncGenerator, Dict, List, Optional
+from AgentProject.core.audio_orchestrator.audio_playback import AudioPlaybackThread, PlaybackStats, wait_interruptible
+from AgentProject.core.audio_orchestrator.tts_phrase_cache import TTSPhraseCache, TTSPhraseCacheStats
+from AgentProject.core.audio_orchestrator.tts_connection import ElevenLabsConnectionManager, TTSContext, ConnectionStats
+from AgentProject.core.audio_orchestrator.echo_suppression import EchoReference
+from AgentProject.core.audio_orchestrator.audio_sink import AudioSink, PyAudioSink
+from AgentProject.core.audio_orchestrator.tts_policy import AdaptiveChunkSchedule, select_output_format
+from AgentProject.core.telemetry import tracing
 from AgentProject.configuration.app_configuration.app_configuration import AppConfiguration
 import logging
 import threading
+import time
+import re
 
 logging.basicConfig(
     level= logging.INFO,
@@ -14,132 +21,413 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
+#primera frase completa: termina en puntuacion seguida de un espacio (el final del texto se trata aparte)
+LEADING_PHRASE = re.compile(r'\s*(.+?[.!?…,;:])(?=\s)', re.DOTALL)
+
+@dataclass
+class TTSTurnMetrics:
+    start_time: float
+    first_text_time: float = 0.0
+    text_done_time: float = 0.0
+    first_audio_time: float = 0.0
+    end_time: float = 0.0
+    interrupted: bool = False
+    cached_chars: int = 0
+    synthesized_chars: int = 0
+    connection_overhead_ms: float = 0.0
+
+    @property
+    def time_to_first_audio_ms(self) -> float:
+        return (self.first_audio_time - self.start_time) * 1000 if self.first_audio_time else 0.0
+
+    @property
+    def text_to_first_audio_ms(self) -> float:
+        if not self.first_audio_time or not self.first_text_time:
+            return 0.0
+        return (self.first_audio_time - self.first_text_time) * 1000
+
+    @property
+    def overlap_ms(self) -> float:
+        #tiempo en que ya sonaba audio mientras el LLM seguia enviando texto
+        if not self.first_audio_time:
+            return 0.0
+        text_done = self.text_done_time or self.end_time
+        return max(0.0, text_done - self.first_audio_time) * 1000
+
+@dataclass
+class BackchannelStats:
+    prepared: int = 0
+    played: int = 0
+    cancelled: int = 0
+
+@dataclass
+class BargeInStats:
+    #reaccion medida desde el inicio acustico de la voz del usuario
+    flush_ms: List[float] = field(default_factory= list)
+    cancel_ms: List[float] = field(default_factory= list)
+    over_bound: int = 0
+
+    @property
+    def mean_flush_ms(self) -> float:
+        return sum(self.flush_ms) / len(self.flush_ms) if self.flush_ms else 0.0
+
 class ElevenLabsWebSocketTTS:
     def __init__(self,
                  api_key: str,
                  voice_id: str,
                  model_id: str = 'eleven_multilingual_v2',
-                 sample_rate: int = 24000,
-                 output_format: str = 'pcm_24000'):
+                 output_format: str = 'auto',
+                 max_sample_rate: int = 24000,
+                 playback_period_ms: float = 20.0,
+                 playback_buffer_ms: float = 3000.0,
+                 playback_prebuffer_ms: float = 60.0,
+                 phrase_cache: Optional[TTSPhraseCache] = None,
+                 voice_settings: Optional[Dict] = None,
+                 keepalive_interval: float = 10.0,
+                 final_idle_timeout: float = 1.5,
+                 echo_reference: Optional[EchoReference] = None,
+                 barge_in_max_reaction_ms: float = 150.0,
+                 base_url: str = 'wss://api.elevenlabs.io',
+                 sink: Optional[AudioSink] = None,
+                 chunk_schedule: Optional[AdaptiveChunkSchedule] = None):
         
         self.api_key = api_key
         self.voice_id = voice_id
         self.model_id = model_id
-        self.sample_rate = sample_rate
-        self.output_format = output_format
-        self.uri = f'wss://api.elevenlabs.io/v1/text-to-speech/{self.voice_id}/stream-input?model_id={self.model_id}&output_format={self.output_format}&inactivity_timeout=180'
-
-        self.p = pyaudio.PyAudio()
-        self.stream = self.p.open(
-            format= pyaudio.paInt16,
-            channels= 1,
-            rate = self.sample_rate,
-            output= True,
-            frames_per_buffer= 1024,
-            stream_callback= None
-        )
-
-        self.websocket = None
-        self.is_connected = False
-        self._lock = asyncio.Lock()
+        sink = sink or PyAudioSink()
+        self.output_format, self.sample_rate = select_output_format(output_format, sink.preferred_sample_rate(), max_sample_rate)
+        sink.sample_rate = self.sample_rate
+        if echo_reference:
+            echo_reference.set_playback_rate(self.sample_rate)
+        logger.info(f'Formato de salida del TTS: {self.output_format}')
+        self.chunk_schedule = chunk_schedule or AdaptiveChunkSchedule()
+        self.phrase_cache = phrase_cache
+        self.voice_settings = voice_settings or {'stability': 0.5,
+                                                 'similarity_boost': 0.75,
+                                                 'use_speaker_boost': True}
+        self.connection = ElevenLabsConnectionManager(api_key= api_key,
+                                                      voice_id= voice_id,
+                                                      model_id= model_id,
+                                                      output_format= self.output_format,
+                                                      voice_settings= self.voice_settings,
+                                                      generation_config= self.chunk_schedule.generation_config(),
+                                                      base_url= base_url,
+                                                      keepalive_interval= keepalive_interval)
+        self.final_idle_timeout = final_idle_timeout
+
+        self.playback = AudioPlaybackThread(sample_rate= self.sample_rate,
+                                            period_ms= playback_period_ms,
+                                            buffer_ms= playback_buffer_ms,
+                                            prebuffer_ms= playback_prebuffer_ms,
+                                            reference= echo_reference,
+                                            sink= sink)
+
+        self.turn_metrics: List[TTSTurnMetrics] = []
+        self.barge_in_max_reaction_ms = barge_in_max_reaction_ms
+        self.barge_in_stats = BargeInStats()
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._active_context: Optional[TTSContext] = None
+        #PCM de los acuses ya sintetizados, en memoria para que empiecen a sonar sin ninguna espera
+        self.backchannels: Dict[str, bytes] = {}
+        self.backchannel_stats = BackchannelStats()
+        self._backchannel_task: Optional[asyncio.Task] = None
 
     async def init_websocket(self):
-        async with self._lock:
-            if self.is_connected and self.websocket:
-                try:
-                    pong_waiter = await self.websocket.ping()
-                    await asyncio.wait_for(pong_waiter, timeout=2.0)
-                    return True
-                except:
-                    self.is_connected = False
-                    await self._cleanup_websocket()
-            
-            if not self.is_connected:
-                await self._connect()
-
-    async def _connect(self):
-        try:
-            self.websocket = await websockets.connect(self.uri)
-            init_message = {
-                'text': ' ',
-                'voice_settings': {'stability': 0.5, 
-                                   'similarity_boost': 0.75,
-                                   'use_speaker_boost': True},
-                'generation_config': {
-                    'chunk_length_schedule': [50,90,120],
-                    'apply_text_normalization': 'auto'
-                },
-                'xi_api_key': self.api_key
-            }
-
-            await self.websocket.send(json.dumps(init_message))
-            self.is_connected = True
-            logger.info('Websocket elevenlabs inicilizado')
-        except Exception as e:
-            logger.error(f'Error en la conexion websocket: {str(e)}')
-            self.is_connected = False
-            raise
-    
-    async def _cleanup_websocket(self):
-        if self.websocket:
-            try:
-                await self.websocket.close()
-            except:
-                pass
-            self.websocket = None
-        self.is_connected = False
-        logger.info('Conexion websocket cerrada')
-
-    async def stream_tts(self, text_chunk: AsyncGenerator[str, None], interrupt_event: threading.Event) -> str:
-        
-        transcription = ''
-        await self.init_websocket()
-
-        try:   
-            async for chunk in text_chunk:
-                transcription += chunk
-                if chunk.strip():
-                    text_message = {'text': chunk, 'try_trigger_generation': True}
-                    await self.websocket.send(json.dumps(text_message))
-            
-            await self.websocket.send(json.dumps({'text': ''}))
+        #abre el socket y el primer contexto antes del primer turno
+        await self.connection.start()
+
+    def barge_in(self, speech_start_time: float) -> None:
+        #se llama desde el hilo de captura en cuanto el VAD detecta voz del usuario
+        loop = self._loop
+        if self._backchannel_task is not None and loop is not None and not loop.is_closed():
+            loop.call_soon_threadsafe(self.cancel_backchannel)
+        if not self.playback.active and self._active_context is None:
+            return
+        self.playback.flush()
+        flush_ms = (time.perf_counter() - speech_start_time) * 1000
+        self.barge_in_stats.flush_ms.append(flush_ms)
+        if flush_ms > self.barge_in_max_reaction_ms:
+            self.barge_in_stats.over_bound += 1
+            logger.warning(f'Reaccion a la interrupcion lenta: {flush_ms:.0f} ms (limite {self.barge_in_max_reaction_ms:.0f} ms)')
 
+        context, loop = self._active_context, self._loop
+        if context is not None and loop is not None and not loop.is_closed():
+            loop.call_soon_threadsafe(lambda: asyncio.ensure_future(self._cancel_context(context, speech_start_time)))
+
+    async def _cancel_context(self, context: TTSContext, speech_start_time: float) -> None:
+        await self.connection.close_context(context)
+        self.barge_in_stats.cancel_ms.append((time.perf_counter() - speech_start_time) * 1000)
+
+    async def synthesize(self, text: str) -> bytes:
+        #sintetiza sin reproducir; sirve para preparar audio por adelantado
+        context = await self.connection.acquire_context()
+        pcm = bytearray()
+        try:
+            await self.connection.send_text(context, text + ' ')
+            await self.connection.flush(context)
             while True:
-                if interrupt_event.is_set():
-                    logger.info('Interrupcion detectada en el motor de TTS')
-                    break
                 try:
-                    message_str = await asyncio.wait_for(self.websocket.recv(), timeout=0.1)
-                    if message_str:
-                        data = json.loads(message_str)
-                        if 'audio' in data and data['audio']:
-                            audio_chunk = base64.b64decode(data['audio'])
-                            if len(audio_chunk) > 0:
-                                self.stream.write(audio_chunk)
-                        if data.get('isFinal'):
-                            break
+                    data = await asyncio.wait_for(context.queue.get(), timeout= self.final_idle_timeout)
                 except asyncio.TimeoutError:
-                    continue
-                except websockets.exceptions.ConnectionClosed:
-                    logger.error(f'Error en la recepcion de audio del websocket: {str(e)}')
                     break
-        except websockets.exceptions.ConnectionClosed:
-            logger.info('conexion cerrada por el servidor')
-            await self._cleanup_websocket()
+                if data is None:
+                    raise ConnectionError('Se perdio la conexion con elevenlabs durante la sintesis')
+                if data.get('audio'):
+                    pcm += binascii.a2b_base64(data['audio'])
+                if data.get('isFinal'):
+                    break
+        finally:
+            await self.connection.close_context(context)
+        return bytes(pcm)
+
+    async def _prepare_backchannel(self, phrase: str) -> None:
+        if self.phrase_cache:
+            cached = await asyncio.to_thread(self.phrase_cache.open, self._cache_key(phrase))
+            if cached is not None:
+                with cached:
+                    self.backchannels[phrase] = bytes(cached)
+                return
+        pcm = await self.synthesize(phrase)
+        if not pcm:
+            return
+        self.backchannels[phrase] = pcm
+        if self.phrase_cache:
+            await asyncio.to_thread(self.phrase_cache.put, self._cache_key(phrase), phrase, pcm, self.sample_rate)
+
+    async def prepare_backchannels(self, phrases: List[str]) -> None:
+        #la cache de frases en disco evita volver a sintetizarlos en cada arranque
+        missing = [phrase for phrase in phrases if phrase not in self.backchannels]
+        results = await asyncio.gather(*[self._prepare_backchannel(phrase) for phrase in missing], return_exceptions= True)
+        for phrase, result in zip(missing, results):
+            if isinstance(result, Exception):
+                logger.error(f'Error al preparar el acuse {phrase!r}: {str(result)}')
+        self.backchannel_stats.prepared = len(self.backchannels)
+
+    def start_backchannel(self,
+                          phrase: str,
+                          delay_s: float,
+                          interrupt_event: threading.Event,
+                          interruption: Optional[asyncio.Event] = None) -> bool:
+        #suena solo si pasado delay_s todavia no ha llegado el primer audio de la respuesta
+        self.cancel_backchannel()
+        pcm = self.backchannels.get(phrase)
+        if pcm is None:
+            return False
+        self._loop = asyncio.get_running_loop()
+        self._backchannel_task = asyncio.create_task(self._play_backchannel(phrase, pcm, delay_s, interrupt_event, interruption))
+        return True
+
+    async def _play_backchannel(self,
+                                phrase: str,
+                                pcm: bytes,
+                                delay_s: float,
+                                interrupt_event: threading.Event,
+                                interruption: Optional[asyncio.Event]) -> None:
+        await asyncio.sleep(delay_s)
+        if interrupt_event.is_set():
+            return
+        tracing.mark('first_backchannel_audio')
+        self.backchannel_stats.played += 1
+        logger.info(f'Acuse mientras se prepara la respuesta: {phrase!r}')
+        #el acuse es corto y cabe entero en el buffer: el audio real queda detras sin cortes
+        await self.playback.write(pcm, interrupt_event, interruption)
+
+    def cancel_backchannel(self) -> None:
+        task, self._backchannel_task = self._backchannel_task, None
+        if task is not None and not task.done():
+            task.cancel()
+            self.backchannel_stats.cancelled += 1
+
+    def _cache_key(self, text: str) -> str:
+        return self.phrase_cache.make_key(text, self.voice_id, self.model_id, self.voice_settings, self.output_format)
+
+    async def _play_cached(self,
+                           phrase: str,
+                           interrupt_event: threading.Event,
+                           interruption: Optional[asyncio.Event],
+                           metrics: TTSTurnMetrics) -> bool:
+        if not phrase or len(phrase) > self.phrase_cache.max_phrase_chars:
+            return False
+        #la consulta toca sqlite y el disco: fuera del bucle de eventos
+        pcm = await asyncio.to_thread(self.phrase_cache.open, self._cache_key(phrase))
+        if pcm is None:
+            return False
+        with pcm:
+            if not metrics.first_audio_time:
+                metrics.first_audio_time = time.perf_counter()
+                self.cancel_backchannel()
+            await self.playback.write(pcm, interrupt_event, interruption)
+        metrics.cached_chars += len(phrase)
+        logger.info(f'Frase servida desde la cache de TTS: {phrase!r}')
+        return True
+
+    async def _send_chunk(self, context: TTSContext, chunk: str, metrics: TTSTurnMetrics) -> None:
+        if not chunk.strip():
+            return
+        await self.connection.send_text(context, chunk)
+        metrics.synthesized_chars += len(chunk)
+        if not metrics.first_text_time:
+            metrics.first_text_time = time.perf_counter()
+
+    async def _send_text(self,
+                         context: TTSContext,
+                         text_chunk: AsyncGenerator[str, None],
+                         parts: List[str],
+                         metrics: TTSTurnMetrics,
+                         interrupt_event: threading.Event,
+                         interruption: Optional[asyncio.Event],
+                         text_finished: asyncio.Event) -> None:
+        #el texto inicial se retiene hasta saber si la primera frase ya esta en la cache
+        pending = ''
+        deciding = self.phrase_cache is not None
+        async for chunk in text_chunk:
+            parts.append(chunk)
+            if deciding:
+                pending += chunk
+                match = LEADING_PHRASE.match(pending)
+                if match is None and len(pending) <= self.phrase_cache.max_phrase_chars:
+                    continue
+                deciding = False
+                if match and await self._play_cached(match.group(1), interrupt_event, interruption, metrics):
+                    pending = pending[match.end():]
+                chunk, pending = pending, ''
+            await self._send_chunk(context, chunk, metrics)
+
+        if deciding and not await self._play_cached(pending.strip(), interrupt_event, interruption, metrics):
+            await self._send_chunk(context, pending, metrics)
+
+        #despierta al receptor: sin caracteres sintetizados toda la respuesta salio de la cache
+        if metrics.synthesized_chars:
+            await self.connection.flush(context)
+            metrics.text_done_time = time.perf_counter()
+        text_finished.set()
+
+    async def _receive_audio(self,
+                             context: TTSContext,
+                             interrupt_event: threading.Event,
+                             interruption: Optional[asyncio.Event],
+                             metrics: TTSTurnMetrics,
+                             text_finished: asyncio.Event,
+                             recording: Optional[bytearray]) -> bool:
+        last_audio_time = 0.0
+        while True:
+            if interrupt_event.is_set():
+                logger.info('Interrupcion detectada en el motor de TTS')
+                return False
+            if text_finished.is_set() and not metrics.synthesized_chars:
+                return await self.playback.wait_until_drained(interrupt_event, interruption)
+            timeout = None
+            if metrics.text_done_time:
+                #tras el flush, si el servidor deja de enviar audio el contexto se da por terminado
+                timeout = self.final_idle_timeout - (time.perf_counter() - max(metrics.text_done_time, last_audio_time))
+                if timeout <= 0:
+                    return await self.playback.wait_until_drained(interrupt_event, interruption)
+            #despierta con el audio, la interrupcion o el fin del texto; nunca sondea
+            received = await wait_interruptible(context.queue.get(), interrupt_event, interruption,
+                                                timeout= timeout, wake= None if text_finished.is_set() else text_finished)
+            if received is None:
+                continue
+            data = received.result()
+
+            if data is None:
+                logger.error('Se perdio la conexion con elevenlabs durante el turno')
+                return False
+            audio = data.get('audio')
+            if audio:
+                if not metrics.first_audio_time:
+                    metrics.first_audio_time = time.perf_counter()
+                    self.cancel_backchannel()
+                #a2b_base64 acepta el str ASCII sin la copia intermedia de b64decode
+                pcm = binascii.a2b_base64(audio)
+                if recording is not None and self.phrase_cache and metrics.synthesized_chars <= self.phrase_cache.max_phrase_chars:
+                    recording += pcm
+                if not await self.playback.write(pcm, interrupt_event, interruption):
+                    logger.info('Interrupcion detectada en el motor de TTS')
+                    return False
+                last_audio_time = time.perf_counter()
+            if data.get('isFinal'):
+                return await self.playback.wait_until_drained(interrupt_event, interruption)
+
+    async def _store_phrase(self, text: str, recording: bytearray, metrics: TTSTurnMetrics) -> None:
+        #solo las respuestas cortas completas y sintetizadas de principio a fin
+        text = text.strip()
+        if (not text or metrics.cached_chars or not recording or
+                len(text) > self.phrase_cache.max_phrase_chars):
+            return
+        try:
+            await asyncio.to_thread(self.phrase_cache.put, self._cache_key(text), text, bytes(recording), self.sample_rate)
+        except Exception as e:
+            logger.error(f'Error al guardar la frase en la cache de TTS: {str(e)}')
+
+    async def stream_tts(self,
+                         text_chunk: AsyncGenerator[str, None],
+                         interrupt_event: threading.Event,
+                         interruption: Optional[asyncio.Event] = None) -> str:
+        #interruption es la contrapartida asincrona de interrupt_event; sin ella la bandera se sondea
+        parts: List[str] = []
+        metrics = TTSTurnMetrics(start_time= time.perf_counter())
+        text_finished = asyncio.Event()
+        recording = bytearray() if self.phrase_cache else None
+        context = await self.connection.acquire_context()
+        metrics.connection_overhead_ms = (time.perf_counter() - metrics.start_time) * 1000
+        self._loop = asyncio.get_running_loop()
+        self._active_context = context
+
+        #el texto se envia mientras el audio ya recibido se reproduce
+        sender = asyncio.create_task(self._send_text(context, text_chunk, parts, metrics, interrupt_event, interruption, text_finished))
+        receiver = asyncio.create_task(self._receive_audio(context, interrupt_event, interruption, metrics, text_finished, recording))
+        try:
+            done, _ = await asyncio.wait({sender, receiver}, return_when= asyncio.FIRST_EXCEPTION)
+            if sender in done and sender.exception():
+                raise sender.exception()
+            if await receiver and recording is not None:
+                await self._store_phrase(''.join(parts), recording, metrics)
         except Exception as e:
             logger.error(f'Error durante el TTS steaming: {str(e)}')
-            await self._cleanup_websocket()
             raise
         finally:
-            return transcription
+            pending = [task for task in (sender, receiver) if not task.done()]
+            for task in pending:
+                task.cancel()
+            await asyncio.gather(*pending, return_exceptions= True)
+            if interrupt_event.is_set():
+                #el audio pendiente no debe seguir sonando despues de una interrupcion
+                self.playback.flush()
+            #cerrar el contexto detiene la sintesis pendiente sin tocar el socket
+            self._active_context = None
+            await self.connection.close_context(context)
+
+            metrics.end_time = time.perf_counter()
+            metrics.interrupted = interrupt_event.is_set()
+            self.turn_metrics.append(metrics)
+            if metrics.first_audio_time:
+                tracing.mark('first_audio', metrics.first_audio_time)
+            if metrics.text_to_first_audio_ms and not metrics.cached_chars:
+                #el nuevo schedule se aplica a partir del siguiente contexto que se abra
+                if self.chunk_schedule.observe(metrics.text_to_first_audio_ms):
+                    self.connection.generation_config = self.chunk_schedule.generation_config()
+            logger.info(f'TTS: inicio de turno {metrics.connection_overhead_ms:.1f} ms, '
+                        f'primer audio en {metrics.time_to_first_audio_ms:.0f} ms, '
+                        f'solapamiento con el envio de texto {metrics.overlap_ms:.0f} ms')
+            return ''.join(parts)
+
+    def playback_stats(self) -> PlaybackStats:
+        return self.playback.stats()
+
+    def connection_stats(self) -> ConnectionStats:
+        return self.connection.stats
+
+    def phrase_cache_stats(self) -> Optional[TTSPhraseCacheStats]:
+        return self.phrase_cache.stats() if self.phrase_cache else None
 
     async def close(self):
-        if self.stream and self.stream.is_active():
-            self.stream.stop_stream()
-            logger.info('Se cerro conexion stream')
-        await self._cleanup_websocket()
-        if self.stream:
-            self.stream.close()
-        if self.p:
-            self.p.terminate()
+        self.cancel_backchannel()
+        if self.backchannel_stats.played:
+            logger.info(f'Acuses reproducidos: {self.backchannel_stats.played}, cancelados antes de sonar {self.backchannel_stats.cancelled}')
+        if self.barge_in_stats.flush_ms:
+            logger.info(f'Interrupciones: {len(self.barge_in_stats.flush_ms)}, vaciado medio {self.barge_in_stats.mean_flush_ms:.0f} ms, '
+                        f'{self.barge_in_stats.over_bound} por encima de {self.barge_in_max_reaction_ms:.0f} ms')
+        await self.connection.close()
+        self.playback.close()
+        #la cache de frases es compartida entre sesiones: la cierra quien la creo
         logger.info('Todos los objetos de TTS han sido cerrados')
\ No newline at end of file
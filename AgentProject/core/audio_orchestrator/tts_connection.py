@@ -0,0 +1,231 @@
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional
+import websockets
+import asyncio
+import logging
+import uuid
+import json
+import time
+
+logging.basicConfig(
+            level= logging.INFO,
+            format= '%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+        )
+
+logger = logging.getLogger(__name__)
+
+@dataclass
+class TTSContext:
+    context_id: str
+    queue: asyncio.Queue = field(default_factory= asyncio.Queue)
+    last_sent_time: float = field(default_factory= time.monotonic)
+    closed: bool = False
+
+@dataclass
+class ConnectionStats:
+    connects: int = 0
+    reconnects: int = 0
+    keepalives: int = 0
+    contexts_opened: int = 0
+    contexts_closed: int = 0
+    turn_start_overhead_ms: List[float] = field(default_factory= list)
+
+    @property
+    def mean_turn_start_overhead_ms(self) -> float:
+        if not self.turn_start_overhead_ms:
+            return 0.0
+        return sum(self.turn_start_overhead_ms) / len(self.turn_start_overhead_ms)
+
+class ElevenLabsConnectionManager:
+    #un socket multi-contexto siempre abierto: cada respuesta usa un contexto nuevo sin reconectar
+    def __init__(self,
+                 api_key: str,
+                 voice_id: str,
+                 model_id: str,
+                 output_format: str,
+                 voice_settings: Dict,
+                 generation_config: Dict,
+                 base_url: str = 'wss://api.elevenlabs.io',
+                 inactivity_timeout: int = 180,
+                 keepalive_interval: float = 10.0,
+                 reconnect_delay: float = 0.5,
+                 max_reconnect_delay: float = 8.0,
+                 connect_timeout: float = 10.0):
+
+        self.api_key = api_key
+        self.voice_settings = voice_settings
+        self.generation_config = generation_config
+        self.keepalive_interval = keepalive_interval
+        self.reconnect_delay = reconnect_delay
+        self.max_reconnect_delay = max_reconnect_delay
+        self.connect_timeout = connect_timeout
+        self.uri = (f'{base_url}/v1/text-to-speech/{voice_id}/multi-stream-input'
+                    f'?model_id={model_id}&output_format={output_format}&inactivity_timeout={inactivity_timeout}')
+
+        self.stats = ConnectionStats()
+        self.websocket = None
+        self._contexts: Dict[str, TTSContext] = {}
+        self._warm_context: Optional[TTSContext] = None
+        self._connected = asyncio.Event()
+        self._send_lock = asyncio.Lock()
+        self._supervisor: Optional[asyncio.Task] = None
+        self._keepalive: Optional[asyncio.Task] = None
+        self._warming: Optional[asyncio.Task] = None
+        self._running = False
+
+    @property
+    def is_connected(self) -> bool:
+        return self._connected.is_set()
+
+    async def start(self) -> None:
+        if self._running:
+            return
+        self._running = True
+        self._supervisor = asyncio.create_task(self._supervise())
+        self._keepalive = asyncio.create_task(self._keepalive_loop())
+        try:
+            await asyncio.wait_for(self._connected.wait(), timeout= self.connect_timeout)
+        except asyncio.TimeoutError:
+            #el supervisor sigue reintentando en segundo plano
+            logger.error('El websocket de elevenlabs no respondio a tiempo; se sigue reintentando')
+
+    async def _supervise(self) -> None:
+        #conecta, lee hasta que el socket cae y reconecta con espera exponencial
+        delay = self.reconnect_delay
+        while self._running:
+            try:
+                self.websocket = await websockets.connect(self.uri,
+                                                          additional_headers= {'xi-api-key': self.api_key},
+                                                          ping_interval= 20,
+                                                          ping_timeout= 20)
+                self.stats.connects += 1
+                if self.stats.connects > 1:
+                    self.stats.reconnects += 1
+                delay = self.reconnect_delay
+                self._connected.set()
+                await self._open_warm_context()
+                logger.info('Websocket multi-contexto de elevenlabs listo')
+                await self._read_messages()
+            except asyncio.CancelledError:
+                break
+            except Exception as e:
+                logger.error(f'Error en la conexion websocket: {str(e)}')
+            finally:
+                self._connected.clear()
+                self._drop_contexts()
+
+            if self._running:
+                await asyncio.sleep(delay)
+                delay = min(delay * 2, self.max_reconnect_delay)
+
+    async def _read_messages(self) -> None:
+        while True:
+            #decode=False evita decodificar el frame a str; json acepta los bytes directamente
+            data = json.loads(await self.websocket.recv(decode= False))
+            context = self._contexts.get(data.get('contextId'))
+            #el audio de contextos cerrados (p. ej. tras una interrupcion) se descarta aqui
+            if context is not None and not context.closed:
+                context.queue.put_nowait(data)
+
+    def _drop_contexts(self) -> None:
+        for context in self._contexts.values():
+            context.closed = True
+            #None avisa al consumidor de que la conexion se perdio
+            context.queue.put_nowait(None)
+        self._contexts = {}
+        self._warm_context = None
+
+    async def _send(self, message: Dict, context: Optional[TTSContext] = None) -> None:
+        async with self._send_lock:
+            await self.websocket.send(json.dumps(message))
+        if context:
+            context.last_sent_time = time.monotonic()
+
+    async def _open_warm_context(self) -> None:
+        context = TTSContext(context_id= uuid.uuid4().hex)
+        self._contexts[context.context_id] = context
+        await self._send({
+            'text': ' ',
+            'context_id': context.context_id,
+            'voice_settings': self.voice_settings,
+            'generation_config': self.generation_config
+        }, context)
+        self._warm_context = context
+        self.stats.contexts_opened += 1
+
+    async def _keepalive_loop(self) -> None:
+        while self._running:
+            await asyncio.sleep(self.keepalive_interval / 2)
+            if not self.is_connected:
+                continue
+            now = time.monotonic()
+            for context in list(self._contexts.values()):
+                if context.closed or now - context.last_sent_time < self.keepalive_interval:
+                    continue
+                try:
+                    await self._send({'text': '', 'context_id': context.context_id}, context)
+                    self.stats.keepalives += 1
+                except Exception as e:
+                    logger.error(f'Error en el keep-alive del websocket: {str(e)}')
+
+    async def acquire_context(self) -> TTSContext:
+        #en estado estable el contexto ya esta abierto y el coste de inicio de turno es nulo
+        started = time.perf_counter()
+        if not self._running:
+            await self.start()
+        async with asyncio.timeout(self.connect_timeout):
+            while self._warm_context is None:
+                await self._connected.wait()
+                if self._warm_context is None:
+                    await asyncio.sleep(0.01)
+
+        context = self._warm_context
+        self._warm_context = None
+        self.stats.turn_start_overhead_ms.append((time.perf_counter() - started) * 1000)
+        #el siguiente contexto se prepara en segundo plano, fuera del camino critico
+        self._warming = asyncio.create_task(self._prepare_next_context())
+        return context
+
+    async def _prepare_next_context(self) -> None:
+        try:
+            if self.is_connected and self._warm_context is None:
+                await self._open_warm_context()
+        except Exception as e:
+            logger.error(f'Error al preparar el siguiente contexto: {str(e)}')
+
+    async def send_text(self, context: TTSContext, text: str) -> None:
+        await self._send({'text': text, 'context_id': context.context_id}, context)
+
+    async def flush(self, context: TTSContext) -> None:
+        await self._send({'context_id': context.context_id, 'flush': True}, context)
+
+    async def close_context(self, context: TTSContext) -> None:
+        if context.closed:
+            return
+        context.closed = True
+        self._contexts.pop(context.context_id, None)
+        self.stats.contexts_closed += 1
+        if self.is_connected:
+            try:
+                await self._send({'context_id': context.context_id, 'close_context': True})
+            except Exception as e:
+                logger.error(f'Error al cerrar el contexto {context.context_id}: {str(e)}')
+
+    async def close(self) -> None:
+        self._running = False
+        if self.is_connected:
+            try:
+                await self._send({'close_socket': True})
+            except Exception:
+                pass
+        for task in (self._keepalive, self._supervisor):
+            if task:
+                task.cancel()
+        await asyncio.gather(*[task for task in (self._keepalive, self._supervisor) if task], return_exceptions= True)
+        if self.websocket:
+            try:
+                await self.websocket.close()
+            except Exception:
+                pass
+            self.websocket = None
+        logger.info(f'Conexion websocket cerrada (inicio de turno medio {self.stats.mean_turn_start_overhead_ms:.1f} ms)')
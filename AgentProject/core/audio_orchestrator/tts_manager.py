@@ -1,6 +1,10 @@
 from AgentProject.core.audio_orchestrator.tts import ElevenLabsWebSocketTTS
+from AgentProject.core.audio_orchestrator.tts_phrase_cache import TTSPhraseCache
+from AgentProject.core.audio_orchestrator.echo_suppression import EchoReference
+from AgentProject.core.audio_orchestrator.audio_sink import AudioSink
+from AgentProject.core.audio_orchestrator.tts_policy import AdaptiveChunkSchedule
 import logging
-from typing import Optional, AsyncGenerator
+from typing import List, Optional, AsyncGenerator
 import asyncio
 import threading
 logging.basicConfig(
@@ -13,11 +17,36 @@ logger = logging.getLogger(__name__)
 class TTSManager:
     def __init__(self,
                  api_key: str,
-                 voice_id: str):
+                 voice_id: str,
+                 playback_period_ms: float = 20.0,
+                 playback_buffer_ms: float = 3000.0,
+                 playback_prebuffer_ms: float = 60.0,
+                 phrase_cache: Optional[TTSPhraseCache] = None,
+                 keepalive_interval: float = 10.0,
+                 echo_reference: Optional[EchoReference] = None,
+                 barge_in_max_reaction_ms: float = 150.0,
+                 base_url: str = 'wss://api.elevenlabs.io',
+                 sink: Optional[AudioSink] = None,
+                 output_format: str = 'auto',
+                 max_sample_rate: int = 24000,
+                 chunk_schedule: Optional[AdaptiveChunkSchedule] = None):
         
         self._lock = asyncio.Lock()
         self.is_listening = False
-        self.tts_engine = ElevenLabsWebSocketTTS(api_key= api_key, voice_id= voice_id)
+        self.tts_engine = ElevenLabsWebSocketTTS(api_key= api_key,
+                                                 voice_id= voice_id,
+                                                 playback_period_ms= playback_period_ms,
+                                                 playback_buffer_ms= playback_buffer_ms,
+                                                 playback_prebuffer_ms= playback_prebuffer_ms,
+                                                 phrase_cache= phrase_cache,
+                                                 keepalive_interval= keepalive_interval,
+                                                 echo_reference= echo_reference,
+                                                 barge_in_max_reaction_ms= barge_in_max_reaction_ms,
+                                                 base_url= base_url,
+                                                 sink= sink,
+                                                 output_format= output_format,
+                                                 max_sample_rate= max_sample_rate,
+                                                 chunk_schedule= chunk_schedule)
 
     async def start_listening(self):
         async with self._lock:
@@ -31,10 +60,32 @@ class TTSManager:
                 await self.tts_engine.close()
                 self.is_listening = False
     
-    async def tts_processing(self, text_chunk: AsyncGenerator[str, None], interrupt_event: threading.Event):
+    async def tts_processing(self,
+                             text_chunk: AsyncGenerator[str, None],
+                             interrupt_event: threading.Event,
+                             interruption: Optional[asyncio.Event] = None):
         try:
-            tts_task = asyncio.create_task(self.tts_engine.stream_tts(text_chunk= text_chunk, interrupt_event= interrupt_event))
+            tts_task = asyncio.create_task(self.tts_engine.stream_tts(text_chunk= text_chunk,
+                                                                      interrupt_event= interrupt_event,
+                                                                      interruption= interruption))
             tts_transcription = await tts_task
             return tts_transcription
         except Exception as e:
-            logger.error(f'Error en la generacion de respuesta: {str(e)}')
\ No newline at end of file
+            logger.error(f'Error en la generacion de respuesta: {str(e)}')
+
+    async def prepare_backchannels(self, phrases: List[str]):
+        await self.start_listening()
+        await self.tts_engine.prepare_backchannels(phrases)
+
+    def start_backchannel(self,
+                          phrase: str,
+                          delay_s: float,
+                          interrupt_event: threading.Event,
+                          interruption: Optional[asyncio.Event] = None) -> bool:
+        return self.tts_engine.start_backchannel(phrase, delay_s, interrupt_event, interruption)
+
+    def cancel_backchannel(self):
+        self.tts_engine.cancel_backchannel()
+
+    def barge_in(self, speech_start_time: float):
+        self.tts_engine.barge_in(speech_start_time)
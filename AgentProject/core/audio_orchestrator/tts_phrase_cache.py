@@ -0,0 +1,168 @@
+from dataclasses import dataclass
+from typing import Dict, Optional, Tuple
+import unicodedata
+import threading
+import hashlib
+import logging
+import sqlite3
+import mmap
+import json
+import time
+import re
+import os
+
+logging.basicConfig(
+            level= logging.INFO,
+            format= '%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+        )
+
+logger = logging.getLogger(__name__)
+
+@dataclass
+class TTSPhraseCacheStats:
+    lookups: int
+    hits: int
+    evictions: int
+    seconds_served: float
+    entries: int
+    size_bytes: int
+    max_bytes: int
+
+    @property
+    def hit_rate(self) -> float:
+        return self.hits / self.lookups if self.lookups else 0.0
+
+class TTSPhraseCache:
+    #PCM de frases frecuentes en disco; el indice sqlite guarda el orden LRU y el tamaño total
+    def __init__(self,
+                 cache_dir: str,
+                 max_bytes: int = 50_000_000,
+                 max_phrase_chars: int = 60):
+
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self.max_phrase_chars = max_phrase_chars
+        os.makedirs(cache_dir, exist_ok= True)
+
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(os.path.join(cache_dir, 'index.sqlite'), check_same_thread= False)
+        self._db.execute('''
+            CREATE TABLE IF NOT EXISTS phrases (
+                key TEXT PRIMARY KEY,
+                text TEXT NOT NULL,
+                size_bytes INTEGER NOT NULL,
+                sample_rate INTEGER NOT NULL,
+                last_used REAL NOT NULL,
+                hits INTEGER NOT NULL DEFAULT 0
+            )
+        ''')
+        self._db.commit()
+        #uso de cada frase (last_used, aciertos) pendiente de escribir: una lectura nunca hace commit
+        self._pending_usage: Dict[str, Tuple[float, int]] = {}
+
+        self.lookups = 0
+        self.hits = 0
+        self.evictions = 0
+        self.seconds_served = 0.0
+
+    @staticmethod
+    def normalize_text(text: str) -> str:
+        #la puntuacion se conserva porque cambia la entonacion de la frase
+        text = unicodedata.normalize('NFC', text)
+        return re.sub(r'\s+', ' ', text.strip().lower())
+
+    def make_key(self,
+                 text: str,
+                 voice_id: str,
+                 model_id: str,
+                 voice_settings: Dict,
+                 output_format: str) -> str:
+        identity = json.dumps([self.normalize_text(text), voice_id, model_id, voice_settings, output_format],
+                              sort_keys= True, ensure_ascii= False)
+        return hashlib.sha256(identity.encode('utf-8')).hexdigest()
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.cache_dir, f'{key}.pcm')
+
+    def open(self, key: str) -> Optional[mmap.mmap]:
+        #el llamador cierra el mmap cuando termina de copiar el audio
+        with self._lock:
+            self.lookups += 1
+            row = self._db.execute('SELECT size_bytes, sample_rate FROM phrases WHERE key = ?', (key,)).fetchone()
+            if row is None:
+                return None
+            try:
+                with open(self._path(key), 'rb') as pcm_file:
+                    pcm = mmap.mmap(pcm_file.fileno(), 0, access= mmap.ACCESS_READ)
+            except (OSError, ValueError):
+                self._pending_usage.pop(key, None)
+                self._db.execute('DELETE FROM phrases WHERE key = ?', (key,))
+                self._db.commit()
+                return None
+
+            _, hits = self._pending_usage.get(key, (0.0, 0))
+            self._pending_usage[key] = (time.time(), hits + 1)
+            self.hits += 1
+            self.seconds_served += row[0] / (row[1] * 2)
+            return pcm
+
+    def put(self, key: str, text: str, pcm: bytes, sample_rate: int) -> None:
+        if not pcm or len(pcm) > self.max_bytes:
+            return
+        with self._lock:
+            path = self._path(key)
+            temporary_path = f'{path}.tmp'
+            with open(temporary_path, 'wb') as pcm_file:
+                pcm_file.write(pcm)
+            os.replace(temporary_path, path)
+
+            self._db.execute('INSERT OR REPLACE INTO phrases (key, text, size_bytes, sample_rate, last_used) VALUES (?, ?, ?, ?, ?)',
+                             (key, self.normalize_text(text), len(pcm), sample_rate, time.time()))
+            self._pending_usage.pop(key, None)
+            self._evict()
+            self._db.commit()
+
+    def _flush_usage(self) -> None:
+        #se escribe junto con la siguiente escritura, antes de decidir que se expulsa, y al cerrar
+        if not self._pending_usage:
+            return
+        self._db.executemany('UPDATE phrases SET last_used = ?, hits = hits + ? WHERE key = ?',
+                             [(last_used, hits, key) for key, (last_used, hits) in self._pending_usage.items()])
+        self._pending_usage.clear()
+
+    def _evict(self) -> None:
+        self._flush_usage()
+        total = self._db.execute('SELECT COALESCE(SUM(size_bytes), 0) FROM phrases').fetchone()[0]
+        if total <= self.max_bytes:
+            return
+        for key, size in self._db.execute('SELECT key, size_bytes FROM phrases ORDER BY last_used').fetchall():
+            if total <= self.max_bytes:
+                break
+            try:
+                os.remove(self._path(key))
+            except OSError:
+                pass
+            self._db.execute('DELETE FROM phrases WHERE key = ?', (key,))
+            total -= size
+            self.evictions += 1
+
+    def stats(self) -> TTSPhraseCacheStats:
+        with self._lock:
+            entries, size_bytes = self._db.execute('SELECT COUNT(*), COALESCE(SUM(size_bytes), 0) FROM phrases').fetchone()
+            return TTSPhraseCacheStats(
+                lookups= self.lookups,
+                hits= self.hits,
+                evictions= self.evictions,
+                seconds_served= self.seconds_served,
+                entries= entries,
+                size_bytes= size_bytes,
+                max_bytes= self.max_bytes
+            )
+
+    def close(self) -> None:
+        stats = self.stats()
+        logger.info(f'Cache de frases TTS: {stats.hit_rate:.0%} de aciertos, {stats.seconds_served:.1f}s de audio servido')
+        with self._lock:
+            self._flush_usage()
+            self._db.commit()
+            self._db.close()
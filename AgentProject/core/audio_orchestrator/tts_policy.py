@@ -0,0 +1,87 @@
+from typing import Dict, List, Optional, Sequence, Tuple
+import logging
+
+logging.basicConfig(
+            level= logging.INFO,
+            format= '%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+        )
+
+logger = logging.getLogger(__name__)
+
+PCM_SAMPLE_RATES = (16000, 22050, 24000, 44100)
+
+def parse_output_format(output_format: str) -> int:
+    return int(output_format.split('_')[1])
+
+def select_output_format(requested: str,
+                         preferred_sample_rate: Optional[int],
+                         max_sample_rate: int = 24000) -> Tuple[str, int]:
+    #con 'auto' se pide el PCM mas pequeño que cubre lo que el sumidero realmente reproduce
+    if requested != 'auto':
+        return requested, parse_output_format(requested)
+
+    allowed = [rate for rate in PCM_SAMPLE_RATES if rate <= max_sample_rate] or [PCM_SAMPLE_RATES[0]]
+    if preferred_sample_rate is None:
+        rate = allowed[0]
+    else:
+        rate = next((rate for rate in allowed if rate >= preferred_sample_rate), allowed[-1])
+    return f'pcm_{rate}', rate
+
+class AdaptiveChunkSchedule:
+    #primer bloque pequeño para reducir el primer audio y bloques mayores despues por eficiencia
+    MIN_CHARS = 50
+    MAX_CHARS = 500
+
+    def __init__(self,
+                 first_chunk_chars: int = 50,
+                 min_first_chunk_chars: int = 50,
+                 max_first_chunk_chars: int = 120,
+                 tail: Sequence[int] = (120, 160, 250),
+                 target_first_audio_ms: float = 350.0,
+                 ema_alpha: float = 0.3,
+                 step_chars: int = 10,
+                 adaptive: bool = True):
+
+        self.min_first_chunk_chars = max(self.MIN_CHARS, min_first_chunk_chars)
+        self.max_first_chunk_chars = min(self.MAX_CHARS, max(max_first_chunk_chars, self.min_first_chunk_chars))
+        self.first_chunk_chars = min(max(first_chunk_chars, self.min_first_chunk_chars), self.max_first_chunk_chars)
+        self.tail = [min(max(chars, self.MIN_CHARS), self.MAX_CHARS) for chars in tail]
+        self.target_first_audio_ms = target_first_audio_ms
+        self.ema_alpha = ema_alpha
+        self.step_chars = step_chars
+        self.adaptive = adaptive
+        self.first_audio_ema_ms: Optional[float] = None
+
+    def schedule(self) -> List[int]:
+        #el API exige valores crecientes entre 50 y 500
+        schedule = [self.first_chunk_chars]
+        for chars in self.tail:
+            schedule.append(max(chars, schedule[-1]))
+        return schedule
+
+    def generation_config(self) -> Dict:
+        return {
+            'chunk_length_schedule': self.schedule(),
+            'apply_text_normalization': 'auto'
+        }
+
+    def observe(self, first_audio_ms: float) -> bool:
+        #first_audio_ms se mide desde el primer texto enviado: es la parte que depende del schedule
+        if self.first_audio_ema_ms is None:
+            self.first_audio_ema_ms = first_audio_ms
+        else:
+            self.first_audio_ema_ms += self.ema_alpha * (first_audio_ms - self.first_audio_ema_ms)
+        if not self.adaptive:
+            return False
+
+        previous = self.first_chunk_chars
+        if self.first_audio_ema_ms > self.target_first_audio_ms:
+            self.first_chunk_chars = max(self.min_first_chunk_chars, self.first_chunk_chars - self.step_chars)
+        elif self.first_audio_ema_ms < 0.6 * self.target_first_audio_ms:
+            #con margen de sobra se agranda el primer bloque para mejorar la prosodia
+            self.first_chunk_chars = min(self.max_first_chunk_chars, self.first_chunk_chars + self.step_chars)
+
+        if self.first_chunk_chars != previous:
+            logger.info(f'Schedule de TTS ajustado a {self.schedule()} (primer audio medio {self.first_audio_ema_ms:.0f} ms)')
+            return True
+        return False
@@ -0,0 +1,134 @@
+from dataclasses import dataclass, field
+from typing import Callable, Dict, List, Optional
+import threading
+import logging
+import time
+
+logging.basicConfig(
+            level= logging.INFO,
+            format= '%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+        )
+
+logger = logging.getLogger(__name__)
+
+@dataclass
+class EndOfTurnPolicy:
+    use_speech_final: bool = True
+    use_utterance_end: bool = True
+    silence_timeout_ms: float = 1200.0
+    punctuation_grace_ms: float = 250.0
+    terminal_punctuation: str = '.?!…'
+
+@dataclass
+class TurnStats:
+    turns: int = 0
+    latencies_ms: List[float] = field(default_factory= list)
+    reasons: Dict[str, int] = field(default_factory= dict)
+
+    @property
+    def mean_latency_ms(self) -> float:
+        return sum(self.latencies_ms) / len(self.latencies_ms) if self.latencies_ms else 0.0
+
+class TurnDetector:
+    #acumula los segmentos finales y emite exactamente un turno completo por enunciado
+    def __init__(self,
+                 policy: EndOfTurnPolicy,
+                 on_turn: Callable[[str], None]):
+
+        self.policy = policy
+        self.on_turn = on_turn
+        self.stats = TurnStats()
+        self._segments: List[str] = []
+        self._speech_end_time: Optional[float] = None
+        self._last_final_time = 0.0
+        self.last_speech_end_time: Optional[float] = None
+        self._timer: Optional[threading.Timer] = None
+        self._timer_generation = 0
+        self._lock = threading.Lock()
+
+    def _ends_sentence(self) -> bool:
+        return bool(self._segments) and self._segments[-1].rstrip()[-1:] in self.policy.terminal_punctuation
+
+    def _cancel_timer(self) -> None:
+        self._timer_generation += 1
+        if self._timer:
+            self._timer.cancel()
+            self._timer = None
+
+    def _arm(self, delay: float, reason: str) -> None:
+        self._cancel_timer()
+        self._timer = threading.Timer(max(0.0, delay), self._on_timer, args= (reason, self._timer_generation))
+        self._timer.daemon = True
+        self._timer.start()
+
+    def _on_timer(self, reason: str, generation: int) -> None:
+        with self._lock:
+            #un temporizador ya reemplazado no puede cerrar el turno
+            if generation != self._timer_generation:
+                return
+            self._timer = None
+            self._emit(reason)
+
+    def _emit(self, reason: str) -> None:
+        if not self._segments:
+            return
+        self._cancel_timer()
+        text = ' '.join(segment.strip() for segment in self._segments).strip()
+        reference = self._speech_end_time or self._last_final_time
+        latency_ms = (time.perf_counter() - reference) * 1000
+
+        self._segments = []
+        self._speech_end_time = None
+        self.stats.turns += 1
+        self.stats.latencies_ms.append(latency_ms)
+        self.stats.reasons[reason] = self.stats.reasons.get(reason, 0) + 1
+        self.last_speech_end_time = reference
+        logger.info(f'Fin de turno por {reason} ({latency_ms:.0f} ms tras el fin de la voz)')
+        self.on_turn(text)
+
+    def on_segment(self, text: str, is_final: bool, speech_final: bool = False) -> None:
+        with self._lock:
+            if not is_final:
+                #el usuario sigue hablando: nada de lo pendiente puede cerrar el turno
+                self._cancel_timer()
+                return
+
+            if text.strip():
+                self._segments.append(text)
+            self._last_final_time = time.perf_counter()
+
+            if speech_final and self.policy.use_speech_final:
+                if self._ends_sentence():
+                    self._emit('speech_final')
+                else:
+                    self._arm(self.policy.punctuation_grace_ms / 1000, 'speech_final_grace')
+                return
+
+            self._arm(self.policy.silence_timeout_ms / 1000, 'silence')
+
+    def on_utterance_end(self) -> None:
+        with self._lock:
+            if self.policy.use_utterance_end:
+                self._emit('utterance_end')
+
+    def on_speech_start(self) -> None:
+        with self._lock:
+            self._speech_end_time = None
+            self._cancel_timer()
+
+    def on_speech_end(self, speech_end_time: float) -> None:
+        with self._lock:
+            self._speech_end_time = speech_end_time
+            if not self._segments:
+                return
+            elapsed = time.perf_counter() - speech_end_time
+            if self._ends_sentence():
+                self._arm(self.policy.punctuation_grace_ms / 1000 - elapsed, 'vad_punctuation')
+            else:
+                self._arm(self.policy.silence_timeout_ms / 1000 - elapsed, 'silence')
+
+    def reset(self) -> None:
+        with self._lock:
+            self._cancel_timer()
+            self._segments = []
+            self._speech_end_time = None
@@ -0,0 +1,188 @@
+from dataclasses import dataclass, field
+from typing import Callable, List, Optional, Tuple
+import numpy as np
+import time
+
+@dataclass
+class VADStats:
+    frames_processed: int = 0
+    speech_frames: int = 0
+    speech_starts: int = 0
+    bytes_in: int = 0
+    bytes_sent: int = 0
+    detection_latency_ms: List[float] = field(default_factory= list)
+
+    @property
+    def bytes_suppressed(self) -> int:
+        return self.bytes_in - self.bytes_sent
+
+    @property
+    def bandwidth_saved(self) -> float:
+        return self.bytes_suppressed / self.bytes_in if self.bytes_in else 0.0
+
+    @property
+    def mean_detection_latency_ms(self) -> float:
+        if not self.detection_latency_ms:
+            return 0.0
+        return sum(self.detection_latency_ms) / len(self.detection_latency_ms)
+
+class SpectralEnergyVAD:
+    def __init__(self,
+                 sample_rate: int = 16000,
+                 frame_ms: float = 20.0,
+                 energy_margin_db: float = 10.0,
+                 min_energy_db: float = -50.0,
+                 band_ratio_threshold: float = 0.5,
+                 flatness_threshold: float = 0.45,
+                 min_speech_ms: float = 60.0,
+                 hangover_ms: float = 300.0,
+                 noise_adapt_rate: float = 0.05,
+                 speech_band: tuple = (300, 3400)):
+
+        self.sample_rate = sample_rate
+        self.frame_length = int(sample_rate * frame_ms / 1000)
+        self.frame_seconds = self.frame_length / sample_rate
+        self.energy_margin_db = energy_margin_db
+        self.min_energy_db = min_energy_db
+        self.band_ratio_threshold = band_ratio_threshold
+        self.flatness_threshold = flatness_threshold
+        self.min_speech_frames = max(1, int(min_speech_ms / frame_ms))
+        self.hangover_frames = max(1, int(hangover_ms / frame_ms))
+        self.noise_adapt_rate = noise_adapt_rate
+
+        self._window = np.hanning(self.frame_length).astype(np.float32)
+        frequencies = np.fft.rfftfreq(self.frame_length, d= 1 / sample_rate)
+        self._band = (frequencies >= speech_band[0]) & (frequencies <= speech_band[1])
+        self._pending = np.zeros(self.frame_length, dtype= np.int16)
+        self._pending_count = 0
+
+        self.noise_floor_db: Optional[float] = None
+        self.in_speech = False
+        self.speech_start_time = 0.0
+        self.speech_end_time = 0.0
+        self._speech_run = 0
+        self._silence_run = 0
+
+    def _frame_features(self, frames: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        #todas las tramas del bloque se evaluan a la vez
+        energy_db = 10 * np.log10(np.mean(frames * frames, axis= 1) + 1e-10)
+        spectrum = np.abs(np.fft.rfft(frames * self._window, axis= 1)) ** 2 + 1e-12
+        band_ratio = spectrum[:, self._band].sum(axis= 1) / spectrum.sum(axis= 1)
+        flatness = np.exp(np.mean(np.log(spectrum), axis= 1)) / np.mean(spectrum, axis= 1)
+
+        if self.noise_floor_db is None:
+            self.noise_floor_db = float(min(energy_db.min(), self.min_energy_db))
+
+        return ((energy_db > max(self.noise_floor_db + self.energy_margin_db, self.min_energy_db)) &
+                (band_ratio > self.band_ratio_threshold) &
+                (flatness < self.flatness_threshold)), energy_db
+
+    def process(self,
+                samples: np.ndarray,
+                capture_end_time: float,
+                on_speech_start: Optional[Callable[[float], None]] = None,
+                on_speech_end: Optional[Callable[[float], None]] = None) -> bool:
+
+        if self._pending_count:
+            data = np.concatenate((self._pending[:self._pending_count], samples))
+        else:
+            data = samples
+
+        frame_count = len(data) // self.frame_length
+        used = frame_count * self.frame_length
+        self._pending_count = len(data) - used
+        self._pending[:self._pending_count] = data[used:]
+        if not frame_count:
+            return self.in_speech
+
+        frames = data[:used].reshape(frame_count, self.frame_length).astype(np.float32) / 32768
+        speech_flags, energy_db = self._frame_features(frames)
+        speech_seen = False
+
+        for i in range(frame_count):
+            frame_end_time = capture_end_time - (len(data) - (i + 1) * self.frame_length) / self.sample_rate
+            if speech_flags[i]:
+                speech_seen = True
+                self._speech_run += 1
+                self._silence_run = 0
+                if not self.in_speech and self._speech_run >= self.min_speech_frames:
+                    self.in_speech = True
+                    self.speech_start_time = frame_end_time - (self._speech_run - 1) * self.frame_seconds
+                    if on_speech_start:
+                        on_speech_start(self.speech_start_time)
+            else:
+                self._silence_run += 1
+                self._speech_run = 0
+                if self.in_speech and self._silence_run >= self.hangover_frames:
+                    self.in_speech = False
+                    self.speech_end_time = frame_end_time - (self._silence_run - 1) * self.frame_seconds
+                    if on_speech_end:
+                        on_speech_end(self.speech_end_time)
+                if not self.in_speech:
+                    self.noise_floor_db += self.noise_adapt_rate * (float(energy_db[i]) - self.noise_floor_db)
+
+        return self.in_speech or speech_seen
+
+class VoiceActivityGate:
+    #suprime los silencios largos del enlace de subida y conserva un pre-roll para el inicio de la voz
+    def __init__(self,
+                 vad: SpectralEnergyVAD,
+                 silence_suppress_ms: float = 1500.0,
+                 preroll_ms: float = 300.0,
+                 on_speech_start: Optional[Callable[[float], None]] = None,
+                 on_speech_end: Optional[Callable[[float], None]] = None):
+
+        self.vad = vad
+        self.silence_suppress = silence_suppress_ms / 1000
+        self.on_speech_start = on_speech_start
+        self.on_speech_end = on_speech_end
+        self.stats = VADStats()
+        self.suppressing = False
+
+        self._preroll = np.zeros(int(vad.sample_rate * preroll_ms / 1000), dtype= np.int16)
+        self._preroll_count = 0
+        self._last_voice_time = time.perf_counter()
+
+    def _speech_started(self, speech_start_time: float) -> None:
+        self.stats.speech_starts += 1
+        self.stats.detection_latency_ms.append((time.perf_counter() - speech_start_time) * 1000)
+        if self.on_speech_start:
+            self.on_speech_start(speech_start_time)
+
+    def _speech_ended(self, speech_end_time: float) -> None:
+        if self.on_speech_end:
+            self.on_speech_end(speech_end_time)
+
+    def _remember(self, samples: np.ndarray) -> None:
+        size = len(self._preroll)
+        if len(samples) >= size:
+            self._preroll[:] = samples[-size:]
+            self._preroll_count = size
+            return
+        keep = min(self._preroll_count, size - len(samples))
+        self._preroll[:keep] = self._preroll[self._preroll_count - keep:self._preroll_count]
+        self._preroll[keep:keep + len(samples)] = samples
+        self._preroll_count = keep + len(samples)
+
+    def process(self, samples: np.ndarray, capture_end_time: float) -> Optional[np.ndarray]:
+        self.stats.bytes_in += samples.nbytes
+        voiced = self.vad.process(samples, capture_end_time, self._speech_started, self._speech_ended)
+        self.stats.frames_processed += len(samples) // self.vad.frame_length
+        if voiced:
+            self.stats.speech_frames += len(samples) // self.vad.frame_length
+            self._last_voice_time = time.perf_counter()
+
+        if not voiced and time.perf_counter() - self._last_voice_time > self.silence_suppress:
+            self.suppressing = True
+            self._remember(samples)
+            return None
+
+        if self.suppressing:
+            #al reanudar se envia el audio previo para no cortar el inicio de la frase
+            output = np.concatenate((self._preroll[:self._preroll_count], samples))
+            self.suppressing = False
+            self._preroll_count = 0
+        else:
+            output = samples
+        self.stats.bytes_sent += output.nbytes
+        return output
@@ -37,9 +37,10 @@ class PersonalityBlend:
 
 class DinamicPersonalityManager:
     def __init__(self, gender: str , config_path: str = 'AgentProject/configuration/personalities_configuration/personalities.yml',
-                llm_inference = None):
+                llm_inference = None, config: Optional[Dict] = None):
 
-        self.config = self.load_config(config_path)
+        #con varias sesiones el yml se lee una vez y se comparte el diccionario
+        self.config = config if config is not None else self.load_config(config_path)
         self.llm_inference = llm_inference
         self.current_blend: Optional[PersonalityBlend] = None
         self.current_gender: Optional[str] = None
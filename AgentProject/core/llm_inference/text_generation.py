@@ -5,11 +5,7 @@ from langchain_core.output_parsers import StrOutputParser
 from langchain_core.runnables import RunnablePassthrough
 from typing import List, Dict, Optional, Generator, Union, AsyncGenerator
 import asyncio
-from AgentProject.configuration.app_configuration.app_configuration import AppConfiguration
-from dotenv import load_dotenv
-import os
-
-load_dotenv()
+from AgentProject.core.telemetry import tracing
 
 class TextGenerationInference:
     def __init__(self,
@@ -96,12 +92,12 @@ class TextGenerationInference:
             generation_params['tool_choice'] = 'auto'
 
         try:
-            response = await asyncio.to_thread(
-                self.chat_model.invoke,
-                messages_prompt,
-                generation_params
-            )
-            yield response.content
+            #los tokens llegan a medida que se generan para que el TTS empiece antes
+            async for chunk in self.chat_model.astream(messages_prompt, **generation_params):
+                if chunk.content:
+                    #solo hay traza activa en la generacion de la respuesta, no en la clasificacion
+                    tracing.mark('first_token')
+                    yield chunk.content
             
         except Exception as e:
              yield f"Error during async streaming: {str(e)}"
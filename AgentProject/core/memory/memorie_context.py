@@ -7,12 +7,14 @@ class ConversationMemory:
     def __init__(self,
                  db_path: str,
                  max_context_tokens: int,
-                 session_id: str = 'default'):
+                 session_id: str = 'default',
+                 tokenizer = None):
         
         self.db_path = db_path
         self.session_id = session_id
         self.max_context_tokens = max_context_tokens
-        self.tokenizer = tiktoken.get_encoding('cl100k_base') 
+        #el tokenizador no guarda estado y puede compartirse entre sesiones
+        self.tokenizer = tokenizer or tiktoken.get_encoding('cl100k_base') 
 
         self._init_session()
 
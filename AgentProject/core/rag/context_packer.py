@@ -0,0 +1,135 @@
+from dataclasses import dataclass
+from typing import List, Dict, Optional, Set
+import tiktoken
+import re
+
+@dataclass
+class PackedContext:
+    text: str
+    chunks_used: int
+    chunks_dropped: int
+    tokens_used: int
+    tokens_original: int
+
+    @property
+    def tokens_saved(self) -> int:
+        return max(0, self.tokens_original - self.tokens_used)
+
+class ContextPacker:
+    def __init__(self,
+                 token_budget: int = 1200,
+                 mmr_lambda: float = 0.7,
+                 duplicate_threshold: float = 0.8,
+                 min_chunk_tokens: int = 24,
+                 tokenizer: Optional[tiktoken.Encoding] = None):
+
+        self.token_budget = token_budget
+        self.mmr_lambda = mmr_lambda
+        self.duplicate_threshold = duplicate_threshold
+        self.min_chunk_tokens = min_chunk_tokens
+        self.tokenizer = tokenizer or tiktoken.get_encoding('cl100k_base')
+        self.header = 'Relevant information found: \n'
+
+    def count_tokens(self, text: str) -> int:
+        return len(self.tokenizer.encode(text))
+
+    @staticmethod
+    def _shingles(text: str, size: int = 3) -> Set[str]:
+        words = re.findall(r'\w+', text.lower())
+        if len(words) < size:
+            return {' '.join(words)} if words else set()
+        return {' '.join(words[i:i + size]) for i in range(len(words) - size + 1)}
+
+    @staticmethod
+    def _similarity(a: Set[str], b: Set[str]) -> float:
+        if not a or not b:
+            return 0.0
+        return len(a & b) / len(a | b)
+
+    @staticmethod
+    def _overlap(a: Set[str], b: Set[str]) -> float:
+        #un fragmento contenido en otro (solapamiento del splitter) cuenta como duplicado
+        if not a or not b:
+            return 0.0
+        return len(a & b) / min(len(a), len(b))
+
+    @staticmethod
+    def _title(metadata: Dict) -> str:
+        if not isinstance(metadata, dict):
+            return ''
+        return str(metadata.get('title') or metadata.get('source') or '')
+
+    def _fragment(self, index: int, chunk: Dict, content: str) -> str:
+        fragment = f'Fragment: {index} (score: {chunk['score']:.2f}): \n'
+        title = self._title(chunk.get('metadata'))
+        if title:
+            fragment += f'Title: {title}\n'
+        return fragment + f'Content: {content}\n\n'
+
+    def _trim_to_sentences(self, content: str, max_tokens: int) -> str:
+        trimmed = ''
+        for sentence in re.split(r'(?<=[.!?…])\s+', content.strip()):
+            candidate = f'{trimmed} {sentence}'.strip()
+            if self.count_tokens(candidate) > max_tokens:
+                break
+            trimmed = candidate
+        return trimmed
+
+    def _select(self, chunks: List[Dict]) -> List[Dict]:
+        ranked = sorted(chunks, key= lambda chunk: chunk['score'], reverse= True)
+        shingles = [self._shingles(chunk['content']) for chunk in ranked]
+
+        unique = []
+        for i, chunk in enumerate(ranked):
+            if all(self._overlap(shingles[i], shingles[j]) < self.duplicate_threshold for j in unique):
+                unique.append(i)
+
+        #MMR: relevancia penalizada por la similitud con lo ya seleccionado
+        selected: List[int] = []
+        candidates = list(unique)
+        while candidates:
+            best = max(candidates, key= lambda i: self.mmr_lambda * ranked[i]['score'] -
+                       (1 - self.mmr_lambda) * max((self._similarity(shingles[i], shingles[j]) for j in selected), default= 0.0))
+            selected.append(best)
+            candidates.remove(best)
+        return [ranked[i] for i in selected]
+
+    def pack(self, chunks: List[Dict]) -> PackedContext:
+        original = self.header + ''.join(
+            f'Fragment: {i} (score: {chunk['score']:.2f}): \nTitle: {chunk['metadata']}\nContent: {chunk['content']}\n\n'
+            for i, chunk in enumerate(chunks, 1))
+        tokens_original = self.count_tokens(original.strip())
+        if not chunks:
+            return PackedContext('', 0, 0, 0, tokens_original)
+
+        context = self.header
+        tokens_used = self.count_tokens(context)
+        chunks_used = 0
+
+        for chunk in self._select(chunks):
+            remaining = self.token_budget - tokens_used
+            fragment = self._fragment(chunks_used + 1, chunk, chunk['content'])
+            fragment_tokens = self.count_tokens(fragment)
+
+            if fragment_tokens > remaining:
+                overhead = self.count_tokens(self._fragment(chunks_used + 1, chunk, ''))
+                if remaining - overhead < self.min_chunk_tokens:
+                    break
+                content = self._trim_to_sentences(chunk['content'], remaining - overhead)
+                if not content:
+                    break
+                fragment = self._fragment(chunks_used + 1, chunk, content)
+                fragment_tokens = self.count_tokens(fragment)
+
+            context += fragment
+            tokens_used += fragment_tokens
+            chunks_used += 1
+
+        context = context.strip()
+        return PackedContext(
+            text= context,
+            chunks_used= chunks_used,
+            chunks_dropped= len(chunks) - chunks_used,
+            tokens_used= self.count_tokens(context),
+            tokens_original= tokens_original
+        )
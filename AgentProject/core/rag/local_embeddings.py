@@ -0,0 +1,214 @@
+from langchain_core.embeddings import Embeddings
+from huggingface_hub import hf_hub_download
+from tokenizers import Tokenizer
+from concurrent.futures import ThreadPoolExecutor, Future
+from typing import List, Optional, Tuple
+import onnxruntime as ort
+import numpy as np
+import threading
+import asyncio
+import logging
+import queue
+import time
+import os
+
+logging.basicConfig(
+            level= logging.INFO,
+            format= '%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+        )
+
+logger = logging.getLogger(__name__)
+
+class LocalCPUEmbeddings(Embeddings):
+    def __init__(self,
+                 name_model: str,
+                 models_dir: str = '.embedding_models',
+                 onnx_file: str = 'onnx/model.onnx',
+                 batch_size: int = 32,
+                 max_workers: int = 2,
+                 max_batch_wait_ms: float = 5.0,
+                 max_sequence_length: int = 512,
+                 quantize_int8: bool = True,
+                 pooling: str = 'cls',
+                 hf_token: Optional[str] = None):
+
+        self.name_model = name_model
+        self.models_dir = models_dir
+        self.batch_size = batch_size
+        self.max_workers = max_workers
+        self.max_batch_wait = max_batch_wait_ms / 1000
+        self.pooling = pooling
+
+        os.makedirs(self.models_dir, exist_ok= True)
+        model_path = hf_hub_download(repo_id= name_model, filename= onnx_file, token= hf_token)
+        if quantize_int8:
+            model_path = self._quantize_int8(model_path)
+
+        #reparte los nucleos entre los workers para no sobresuscribir la CPU
+        session_options = ort.SessionOptions()
+        session_options.intra_op_num_threads = max(1, (os.cpu_count() or 1) // max_workers)
+        session_options.inter_op_num_threads = 1
+        session_options.execution_mode = ort.ExecutionMode.ORT_SEQUENTIAL
+        session_options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        self.session = ort.InferenceSession(model_path,
+                                            sess_options= session_options,
+                                            providers= ['CPUExecutionProvider'])
+        self._input_names = {model_input.name for model_input in self.session.get_inputs()}
+
+        self.tokenizer = Tokenizer.from_pretrained(name_model, token= hf_token)
+        self.tokenizer.enable_truncation(max_length= max_sequence_length)
+        pad_id = self.tokenizer.token_to_id('[PAD]') or 0
+        self.tokenizer.enable_padding(pad_id= pad_id, pad_token= '[PAD]')
+
+        self._executor = ThreadPoolExecutor(max_workers= max_workers, thread_name_prefix= 'local-embeddings')
+        self._query_queue: queue.Queue = queue.Queue()
+        self._closed = False
+        self._batcher_thread = threading.Thread(target= self._run_query_batcher, daemon= True)
+        self._batcher_thread.start()
+        logger.info(f'Modelo de embeddings local cargado: {name_model} (int8: {quantize_int8})')
+
+    def _quantize_int8(self, model_path: str) -> str:
+        quantized_path = os.path.join(self.models_dir, f'{self.name_model.replace('/', '__')}_int8.onnx')
+        if not os.path.exists(quantized_path):
+            from onnxruntime.quantization import quantize_dynamic, QuantType
+            logger.info(f'Cuantizando el modelo de embeddings a int8: {quantized_path}')
+            quantize_dynamic(model_input= model_path,
+                             model_output= quantized_path,
+                             weight_type= QuantType.QInt8)
+        return quantized_path
+
+    def _encode_batch(self, texts: List[str]) -> np.ndarray:
+        encodings = self.tokenizer.encode_batch(texts)
+        input_ids = np.asarray([encoding.ids for encoding in encodings], dtype= np.int64)
+        attention_mask = np.asarray([encoding.attention_mask for encoding in encodings], dtype= np.int64)
+
+        feeds = {'input_ids': input_ids, 'attention_mask': attention_mask}
+        if 'token_type_ids' in self._input_names:
+            feeds['token_type_ids'] = np.zeros_like(input_ids)
+
+        hidden_state = self.session.run(None, feeds)[0]
+        if self.pooling == 'mean':
+            mask = attention_mask[..., None].astype(np.float32)
+            embeddings = (hidden_state * mask).sum(axis= 1) / np.clip(mask.sum(axis= 1), 1e-9, None)
+        else:
+            embeddings = hidden_state[:, 0]
+
+        norms = np.linalg.norm(embeddings, axis= 1, keepdims= True)
+        return embeddings / np.clip(norms, 1e-12, None)
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        if not texts:
+            return []
+
+        #ordenar por longitud reduce el padding dentro de cada lote
+        order = sorted(range(len(texts)), key= lambda i: len(texts[i]))
+        batches = [order[i:i + self.batch_size] for i in range(0, len(order), self.batch_size)]
+        results = self._executor.map(lambda batch: self._encode_batch([texts[i] for i in batch]), batches)
+
+        embeddings: List[Optional[List[float]]] = [None] * len(texts)
+        for batch, batch_embeddings in zip(batches, results):
+            for index, embedding in zip(batch, batch_embeddings):
+                embeddings[index] = embedding.tolist()
+        return embeddings
+
+    def embed_query(self, text: str) -> List[float]:
+        return self._submit_query(text).result()
+
+    async def aembed_query(self, text: str) -> List[float]:
+        return await asyncio.wrap_future(self._submit_query(text))
+
+    def _submit_query(self, text: str) -> Future:
+        if self._closed:
+            raise RuntimeError('LocalCPUEmbeddings ya fue cerrado')
+        future = Future()
+        self._query_queue.put((text, future))
+        return future
+
+    def _run_query_batcher(self) -> None:
+        #agrupa las consultas concurrentes en un solo lote (batching dinamico)
+        while True:
+            item = self._query_queue.get()
+            if item is None:
+                break
+
+            pending: List[Tuple[str, Future]] = [item]
+            deadline = time.perf_counter() + self.max_batch_wait
+            while len(pending) < self.batch_size:
+                remaining = deadline - time.perf_counter()
+                if remaining <= 0:
+                    break
+                try:
+                    next_item = self._query_queue.get(timeout= remaining)
+                except queue.Empty:
+                    break
+                if next_item is None:
+                    self._query_queue.put(None)
+                    break
+                pending.append(next_item)
+
+            self._executor.submit(self._resolve_queries, pending)
+
+    def _resolve_queries(self, pending: List[Tuple[str, Future]]) -> None:
+        try:
+            embeddings = self._encode_batch([text for text, _ in pending])
+            for (_, future), embedding in zip(pending, embeddings):
+                future.set_result(embedding.tolist())
+        except Exception as e:
+            logger.error(f'Error en la inferencia de embeddings locales: {str(e)}')
+            for _, future in pending:
+                if not future.done():
+                    future.set_exception(e)
+
+    def close(self) -> None:
+        if self._closed:
+            return
+        self._closed = True
+        self._query_queue.put(None)
+        self._batcher_thread.join(timeout= 2.0)
+        self._executor.shutdown(wait= True)
+
+
+if __name__ == '__main__':
+    from AgentProject.configuration.app_configuration.app_configuration import AppConfiguration
+    from langchain_huggingface import HuggingFaceEndpointEmbeddings
+
+    app_config = AppConfiguration()
+
+    def measure(embeddings: Embeddings, documents: List[str], queries: List[str]) -> Tuple[float, float, float]:
+        embeddings.embed_query(queries[0])
+
+        start = time.perf_counter()
+        embeddings.embed_documents(documents)
+        docs_per_second = len(documents) / (time.perf_counter() - start)
+
+        latencies = []
+        for query in queries:
+            start = time.perf_counter()
+            embeddings.embed_query(query)
+            latencies.append((time.perf_counter() - start) * 1000)
+        latencies.sort()
+        return docs_per_second, latencies[len(latencies) // 2], latencies[int(len(latencies) * 0.95) - 1]
+
+    def main():
+        documents = [f'Fragmento {i}: la historia de la ciudad numero {i} y sus habitantes a lo largo del siglo {i % 21}.'
+                     for i in range(256)]
+        queries = [f'¿Que paso en la ciudad {i}?' for i in range(40)]
+
+        remote = HuggingFaceEndpointEmbeddings(model= app_config.EMBEDDING_MODEL_NAME,
+                                               task= 'feature-extraction',
+                                               huggingfacehub_api_token= app_config.HF_TOKEN,
+                                               provider= 'hf-inference')
+        local = LocalCPUEmbeddings(name_model= app_config.EMBEDDING_MODEL_NAME,
+                                   models_dir= app_config.EMBEDDING_LOCAL_MODELS_DIR,
+                                   batch_size= app_config.EMBEDDING_LOCAL_BATCH_SIZE,
+                                   max_workers= app_config.EMBEDDING_LOCAL_MAX_WORKERS,
+                                   quantize_int8= app_config.EMBEDDING_LOCAL_QUANTIZE_INT8,
+                                   hf_token= app_config.HF_TOKEN)
+        try:
+            for name, embeddings in (('remote', remote), ('local', local)):
+                docs_per_second, p50, p95 = measure(embeddings, documents, queries)
+                print(f'{name:>6}: {docs_per_second:8.1f} embeddings/s | query p50 {p50:7.1f} ms | query p95 {p95:7.1f} ms')
+        finally:
+            local.close()
+
+    main()
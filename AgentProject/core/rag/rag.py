@@ -5,8 +5,44 @@ from langchain_community.storage.sql import SQLStore
 from langchain.retrievers import ContextualCompressionRetriever
 from langchain.retrievers.document_compressors import EmbeddingsFilter
 from langchain_core.documents import Document
-from typing import List, Dict
+from langchain_core.embeddings import Embeddings
+from AgentProject.core.rag.retrieval_cache import RetrievalCache, RetrievalCacheStats
+from AgentProject.core.rag.context_packer import ContextPacker, PackedContext
+from typing import List, Dict, Optional
 import hashlib
+import logging
+
+logging.basicConfig(
+            level= logging.INFO,
+            format= '%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+        )
+
+logger = logging.getLogger(__name__)
+
+def build_underlying_embeddings(provider: str,
+                                name_model: str,
+                                hf_token: str,
+                                local_models_dir: str = '.embedding_models',
+                                local_batch_size: int = 32,
+                                local_max_workers: int = 2,
+                                local_quantize_int8: bool = True) -> Embeddings:
+    if provider == 'local':
+        from AgentProject.core.rag.local_embeddings import LocalCPUEmbeddings
+        return LocalCPUEmbeddings(
+            name_model= name_model,
+            models_dir= local_models_dir,
+            batch_size= local_batch_size,
+            max_workers= local_max_workers,
+            quantize_int8= local_quantize_int8,
+            hf_token= hf_token
+        )
+
+    return HuggingFaceEndpointEmbeddings(
+        model= name_model,
+        task='feature-extraction',
+        huggingfacehub_api_token= hf_token,
+        provider= provider
+    )
 
 class RAGProcessor:
     def __init__(self,
@@ -16,19 +52,41 @@ class RAGProcessor:
                 hf_token: str,
                 provider: str,
                 db_path_cache: str,
-                name_model: str):
+                name_model: str,
+                local_models_dir: str = '.embedding_models',
+                local_batch_size: int = 32,
+                local_max_workers: int = 2,
+                local_quantize_int8: bool = True,
+                cache_max_entries: int = 256,
+                cache_max_bytes: int = 4_000_000,
+                context_token_budget: int = 1200,
+                mmr_lambda: float = 0.7,
+                duplicate_threshold: float = 0.8,
+                underlying_embeddings: Optional[Embeddings] = None):
     
         self.top_k = top_k
         self.score_threshold = score_threshold
-        underlying_embeddings = HuggingFaceEndpointEmbeddings(
-            model= name_model,
-            task='feature-extraction',
-            huggingfacehub_api_token= hf_token,
-            provider= provider
+        self.retrieval_cache = RetrievalCache(max_entries= cache_max_entries,
+                                              max_bytes= cache_max_bytes)
+        self.context_packer = ContextPacker(token_budget= context_token_budget,
+                                            mmr_lambda= mmr_lambda,
+                                            duplicate_threshold= duplicate_threshold)
+        self.last_packed_context: Optional[PackedContext] = None
+        underlying_embeddings = underlying_embeddings or build_underlying_embeddings(
+            provider= provider,
+            name_model= name_model,
+            hf_token= hf_token,
+            local_models_dir= local_models_dir,
+            local_batch_size= local_batch_size,
+            local_max_workers= local_max_workers,
+            local_quantize_int8= local_quantize_int8
         )
 
+        #los vectores locales no deben mezclarse en cache con los remotos ni entre int8 y fp32
+        cache_prefix = f"local-{'int8' if local_quantize_int8 else 'fp32'}:{name_model}:" if provider == 'local' else ''
+
         def sha256_encoder(key: str) -> str:
-            return hashlib.sha256(key.strip().lower().encode()).hexdigest()
+            return cache_prefix + hashlib.sha256(key.strip().lower().encode()).hexdigest()
         
         cache_sql_url = f'sqlite:///{db_path_cache}'
         store = SQLStore(namespace = 'embeddings_cache',
@@ -60,7 +118,24 @@ class RAGProcessor:
             base_retriever=base_retriever
         )
         
+    @property
+    def ingest_generation(self) -> int:
+        return self.retrieval_cache.generation
+
+    def add_documents(self, documents: List[Document]) -> List[str]:
+        ids = self.vectorstore.add_documents(documents)
+        self.retrieval_cache.advance_generation()
+        return ids
+
+    def cache_stats(self) -> RetrievalCacheStats:
+        return self.retrieval_cache.stats()
+
     def retrieve_relevant_chucks(self, query: str) -> List[Dict]:
+        generation = self.retrieval_cache.generation
+        cached_chunks = self.retrieval_cache.get(query, self.top_k, self.score_threshold)
+        if cached_chunks is not None:
+            return cached_chunks
+
         documents = self.retriever.invoke(query)
 
         relevant_chunks = []
@@ -73,15 +148,18 @@ class RAGProcessor:
             })
         
         relevant_chunks.sort(key=lambda x: x['score'], reverse=True)
+        self.retrieval_cache.put(query, self.top_k, self.score_threshold, relevant_chunks, generation)
         return relevant_chunks
     
     def calculate_score(self, doc: Document) -> float:
         return doc.metadata.get('score', 1.0)
     
+    def pack_context(self, chunks: List[Dict]) -> PackedContext:
+        packed = self.context_packer.pack(chunks)
+        self.last_packed_context = packed
+        logger.info(f'Contexto RAG: {packed.tokens_used} tokens, {packed.tokens_saved} ahorrados, '
+                    f'{packed.chunks_dropped} fragmentos descartados')
+        return packed
+
     def format_context(self, chunks: List[Dict]) -> str:
-        context = 'Relevant information found: \n'
-        for i, chunk in enumerate(chunks, 1):
-            context += f'Fragment: {i} (score: {chunk['score']:.2f}): \n'
-            context += f'Title: {chunk['metadata']}\n'
-            context += f'Content: {chunk['content']}\n\n'
-        return context.strip()
\ No newline at end of file
+        return self.pack_context(chunks).text
\ No newline at end of file
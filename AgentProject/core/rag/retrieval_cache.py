@@ -0,0 +1,110 @@
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import List, Dict, Optional, Tuple
+import threading
+import re
+
+@dataclass
+class RetrievalCacheStats:
+    hits: int
+    misses: int
+    evictions: int
+    invalidations: int
+    entries: int
+    size_bytes: int
+    max_entries: int
+    max_bytes: int
+    generation: int
+
+    @property
+    def hit_rate(self) -> float:
+        total = self.hits + self.misses
+        return self.hits / total if total else 0.0
+
+class RetrievalCache:
+    def __init__(self,
+                 max_entries: int = 256,
+                 max_bytes: int = 4_000_000):
+
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.generation = 0
+        self._entries: OrderedDict[Tuple, Tuple[List[Dict], int]] = OrderedDict()
+        self._size_bytes = 0
+        self._lock = threading.Lock()
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+    @staticmethod
+    def normalize_query(query: str) -> str:
+        query = re.sub(r'\s+', ' ', query.strip().lower())
+        return query.strip('¿?¡!.,;: ')
+
+    def _make_key(self, query: str, top_k: int, score_threshold: float, generation: int) -> Tuple:
+        return (self.normalize_query(query), top_k, round(score_threshold, 6), generation)
+
+    @staticmethod
+    def _estimate_size(chunks: List[Dict]) -> int:
+        size = 64
+        for chunk in chunks:
+            size += 96 + len(chunk.get('content', '')) + len(str(chunk.get('metadata', '')))
+        return size
+
+    def get(self, query: str, top_k: int, score_threshold: float) -> Optional[List[Dict]]:
+        with self._lock:
+            key = self._make_key(query, top_k, score_threshold, self.generation)
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return [dict(chunk) for chunk in entry[0]]
+
+    def put(self, query: str, top_k: int, score_threshold: float, chunks: List[Dict], generation: int) -> None:
+        #generation es la que habia al empezar la busqueda: si hubo una ingesta entre medias el resultado ya es viejo
+        size = self._estimate_size(chunks)
+        if size > self.max_bytes:
+            return
+
+        with self._lock:
+            if generation != self.generation:
+                return
+            key = self._make_key(query, top_k, score_threshold, generation)
+            previous = self._entries.pop(key, None)
+            if previous is not None:
+                self._size_bytes -= previous[1]
+
+            self._entries[key] = ([dict(chunk) for chunk in chunks], size)
+            self._size_bytes += size
+
+            while self._entries and (len(self._entries) > self.max_entries or self._size_bytes > self.max_bytes):
+                _, (_, evicted_size) = self._entries.popitem(last= False)
+                self._size_bytes -= evicted_size
+                self.evictions += 1
+
+    def advance_generation(self) -> int:
+        #cada ingesta invalida todos los resultados anteriores
+        with self._lock:
+            self.generation += 1
+            self._entries.clear()
+            self._size_bytes = 0
+            self.invalidations += 1
+            return self.generation
+
+    def stats(self) -> RetrievalCacheStats:
+        with self._lock:
+            return RetrievalCacheStats(
+                hits= self.hits,
+                misses= self.misses,
+                evictions= self.evictions,
+                invalidations= self.invalidations,
+                entries= len(self._entries),
+                size_bytes= self._size_bytes,
+                max_entries= self.max_entries,
+                max_bytes= self.max_bytes,
+                generation= self.generation
+            )
@@ -0,0 +1,153 @@
+from dataclasses import dataclass, field
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, List, Optional, Sequence
+import threading
+import bisect
+import logging
+import json
+import os
+
+logging.basicConfig(
+            level= logging.INFO,
+            format= '%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+        )
+
+logger = logging.getLogger(__name__)
+
+#en milisegundos: cubre desde la reaccion a una interrupcion hasta un turno largo
+DEFAULT_BUCKETS_MS = (25, 50, 100, 150, 250, 400, 600, 800, 1000, 1500, 2000, 3000, 5000, 8000, 13000)
+
+@dataclass
+class Histogram:
+    name: str
+    description: str
+    buckets: Sequence[float] = DEFAULT_BUCKETS_MS
+    counts: List[int] = field(default_factory= list)
+    total: float = 0.0
+    count: int = 0
+
+    def __post_init__(self):
+        #un contador por cubo mas el de +Inf
+        self.counts = [0] * (len(self.buckets) + 1)
+
+    def observe(self, value: float) -> None:
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.total += value
+        self.count += 1
+
+    def quantile(self, q: float) -> float:
+        #aproximado: limite superior del cubo que contiene el cuantil
+        if not self.count:
+            return 0.0
+        target = q * self.count
+        accumulated = 0
+        for index, bucket_count in enumerate(self.counts):
+            accumulated += bucket_count
+            if accumulated >= target:
+                return self.buckets[index] if index < len(self.buckets) else float('inf')
+        return float('inf')
+
+    @property
+    def mean(self) -> float:
+        return self.total / self.count if self.count else 0.0
+
+class MetricsRegistry:
+    #histogramas y contadores del proceso; se actualizan desde el bucle de eventos y desde hilos de audio
+    def __init__(self, namespace: str = 'agent', buckets: Sequence[float] = DEFAULT_BUCKETS_MS):
+        self.namespace = namespace
+        self.buckets = buckets
+        self._histograms: Dict[str, Histogram] = {}
+        self._counters: Dict[str, float] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, name: str, value_ms: float, description: str = '') -> None:
+        with self._lock:
+            histogram = self._histograms.get(name)
+            if histogram is None:
+                histogram = self._histograms[name] = Histogram(name= name, description= description, buckets= self.buckets)
+            histogram.observe(value_ms)
+
+    def increment(self, name: str, amount: float = 1.0) -> None:
+        with self._lock:
+            self._counters[name] = self._counters.get(name, 0.0) + amount
+
+    def summary(self) -> Dict[str, Dict[str, float]]:
+        with self._lock:
+            return {name: {'count': histogram.count,
+                           'mean': histogram.mean,
+                           'p50': histogram.quantile(0.50),
+                           'p95': histogram.quantile(0.95),
+                           'p99': histogram.quantile(0.99)}
+                    for name, histogram in self._histograms.items()}
+
+    def render_prometheus(self) -> str:
+        lines = []
+        with self._lock:
+            for name, value in sorted(self._counters.items()):
+                metric = f'{self.namespace}_{name}_total'
+                lines.append(f'# TYPE {metric} counter')
+                lines.append(f'{metric} {value:g}')
+            for name, histogram in sorted(self._histograms.items()):
+                metric = f'{self.namespace}_{name}_ms'
+                if histogram.description:
+                    lines.append(f'# HELP {metric} {histogram.description}')
+                lines.append(f'# TYPE {metric} histogram')
+                accumulated = 0
+                for bucket, bucket_count in zip(list(histogram.buckets) + ['+Inf'], histogram.counts):
+                    accumulated += bucket_count
+                    lines.append(f'{metric}_bucket{{le="{bucket}"}} {accumulated}')
+                lines.append(f'{metric}_sum {histogram.total:.3f}')
+                lines.append(f'{metric}_count {histogram.count}')
+        return '\n'.join(lines) + '\n'
+
+class JsonlTurnExporter:
+    #una linea JSON por turno; el archivo se abre en modo append para sobrevivir reinicios
+    def __init__(self, path: str):
+        self.path = path
+        os.makedirs(os.path.dirname(path) or '.', exist_ok= True)
+        self._file = open(path, 'a', encoding= 'utf-8')
+        self._lock = threading.Lock()
+
+    def export(self, record: Dict) -> None:
+        with self._lock:
+            self._file.write(json.dumps(record, ensure_ascii= False) + '\n')
+            self._file.flush()
+
+    def close(self) -> None:
+        with self._lock:
+            self._file.close()
+
+class MetricsHTTPServer:
+    #expone GET /metrics en formato de texto de Prometheus desde un hilo propio
+    def __init__(self, registry: MetricsRegistry, host: str = '127.0.0.1', port: int = 9464):
+        self.registry = registry
+        registry_ref = registry
+
+        class _Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path.split('?')[0] != '/metrics':
+                    self.send_error(404)
+                    return
+                body = registry_ref.render_prometheus().encode('utf-8')
+                self.send_response(200)
+                self.send_header('Content-Type', 'text/plain; version=0.0.4; charset=utf-8')
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass
+
+        self._server = ThreadingHTTPServer((host, port), _Handler)
+        self._server.daemon_threads = True
+        self.port = self._server.server_address[1]
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self) -> None:
+        self._thread = threading.Thread(target= self._server.serve_forever, daemon= True)
+        self._thread.start()
+        logger.info(f'Metricas disponibles en http://{self._server.server_address[0]}:{self.port}/metrics')
+
+    def close(self) -> None:
+        self._server.shutdown()
+        self._server.server_close()
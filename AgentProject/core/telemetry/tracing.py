@@ -0,0 +1,149 @@
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+from typing import Dict, Iterator, List, Optional
+from AgentProject.core.telemetry.metrics import MetricsRegistry, JsonlTurnExporter
+import logging
+import time
+
+logging.basicConfig(
+            level= logging.INFO,
+            format= '%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+        )
+
+logger = logging.getLogger(__name__)
+
+#el turno en curso para el codigo que no recibe la traza como parametro (LLM, TTS)
+_current_turn: ContextVar[Optional['TurnTrace']] = ContextVar('current_turn', default= None)
+
+SPAN_DESCRIPTIONS = {
+    'end_of_speech': 'Fin de la voz del usuario hasta la transcripcion final',
+    'classification': 'Analisis de emocion y topico',
+    'personality': 'Mezcla y prompt de personalidad',
+    'context_load': 'Carga de historial y prompts',
+    'time_to_first_token': 'Inicio de la generacion hasta el primer token',
+    'time_to_first_audio': 'Fin de la voz del usuario hasta el primer audio',
+    'perceived_first_audio': 'Fin de la voz del usuario hasta el primer audio, contando el acuse',
+    'interruption_reaction': 'Inicio de la voz del usuario hasta que el grafo corta la respuesta',
+    'total': 'Fin de la voz del usuario hasta el final de la respuesta'
+}
+
+@dataclass
+class TurnTrace:
+    #instantes en time.perf_counter(); las duraciones se derivan al cerrar el turno
+    session_id: str
+    turn: int
+    started_at: float = field(default_factory= time.perf_counter)
+    end_of_speech_time: Optional[float] = None
+    transcript_time: Optional[float] = None
+    marks: Dict[str, float] = field(default_factory= dict)
+    spans_ms: Dict[str, float] = field(default_factory= dict)
+    interrupted: bool = False
+    finished: bool = False
+
+    def set_end_of_speech(self, end_of_speech_time: Optional[float], transcript_time: Optional[float]) -> None:
+        self.transcript_time = transcript_time or time.perf_counter()
+        self.end_of_speech_time = end_of_speech_time or self.transcript_time
+
+    def mark(self, name: str, at: Optional[float] = None) -> None:
+        #solo cuenta la primera vez: 'first_token' no se mueve con los tokens siguientes
+        if name not in self.marks:
+            self.marks[name] = at or time.perf_counter()
+
+    @contextmanager
+    def span(self, name: str) -> Iterator[None]:
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.spans_ms[name] = self.spans_ms.get(name, 0.0) + (time.perf_counter() - started) * 1000
+
+    def _between(self, start: Optional[float], end: Optional[float]) -> Optional[float]:
+        if start is None or end is None:
+            return None
+        return (end - start) * 1000
+
+    def _first_heard(self) -> Optional[float]:
+        #lo primero que oye el usuario: el acuse si llego antes que la respuesta
+        heard = [self.marks[name] for name in ('first_backchannel_audio', 'first_audio') if name in self.marks]
+        return min(heard) if heard else None
+
+    def measurements(self) -> Dict[str, float]:
+        values = {
+            'end_of_speech': self._between(self.end_of_speech_time, self.transcript_time),
+            'time_to_first_token': self._between(self.marks.get('generation_start'), self.marks.get('first_token')),
+            'time_to_first_audio': self._between(self.end_of_speech_time, self.marks.get('first_audio')),
+            'perceived_first_audio': self._between(self.end_of_speech_time, self._first_heard()),
+            'interruption_reaction': self._between(self.marks.get('user_speech_start'), self.marks.get('interruption_handled')),
+            'total': self._between(self.end_of_speech_time, self.marks.get('turn_end'))
+        }
+        values.update(self.spans_ms)
+        return {name: value for name, value in values.items() if value is not None}
+
+    def record(self) -> Dict:
+        return {
+            'session_id': self.session_id,
+            'turn': self.turn,
+            'timestamp': time.time(),
+            'interrupted': self.interrupted,
+            'ms': {name: round(value, 3) for name, value in self.measurements().items()}
+        }
+
+class TurnTracer:
+    #cierra las trazas de turno, alimenta los histogramas y las pasa a los exportadores
+    def __init__(self,
+                 registry: Optional[MetricsRegistry] = None,
+                 exporters: Optional[List[JsonlTurnExporter]] = None):
+
+        self.registry = registry or MetricsRegistry()
+        self.exporters = exporters or []
+        self._turns: Dict[str, int] = {}
+
+    def start_turn(self, session_id: str) -> TurnTrace:
+        self._turns[session_id] = self._turns.get(session_id, 0) + 1
+        return TurnTrace(session_id= session_id, turn= self._turns[session_id])
+
+    def finish_turn(self, trace: TurnTrace, interrupted: bool = False) -> Dict:
+        if trace.finished:
+            return trace.record()
+        trace.finished = True
+        trace.interrupted = interrupted
+        trace.mark('turn_end')
+
+        record = trace.record()
+        for name, value in record['ms'].items():
+            self.registry.observe(name, value, SPAN_DESCRIPTIONS.get(name, ''))
+        self.registry.increment('turns')
+        if interrupted:
+            self.registry.increment('interrupted_turns')
+
+        for exporter in self.exporters:
+            try:
+                exporter.export(record)
+            except Exception as e:
+                logger.error(f'Error al exportar la traza del turno: {str(e)}')
+
+        timings = ', '.join(f'{name} {value:.0f} ms' for name, value in record['ms'].items())
+        logger.info(f'Turno {trace.turn} de {trace.session_id}{" (interrumpido)" if interrupted else ""}: {timings}')
+        return record
+
+    def close(self) -> None:
+        for exporter in self.exporters:
+            exporter.close()
+
+@contextmanager
+def use_turn(trace: Optional[TurnTrace]) -> Iterator[None]:
+    #las tareas creadas dentro del bloque heredan la traza a traves del contexto
+    token = _current_turn.set(trace)
+    try:
+        yield
+    finally:
+        _current_turn.reset(token)
+
+def current_turn() -> Optional[TurnTrace]:
+    return _current_turn.get()
+
+def mark(name: str, at: Optional[float] = None) -> None:
+    trace = _current_turn.get()
+    if trace is not None:
+        trace.mark(name, at)
@@ -1,16 +1,16 @@
-from typing import Optional, TypedDict, List, Dict
+from typing import Optional, TypedDict, Dict
 from langgraph.graph import StateGraph
-from AgentProject.core.audio_orchestrator.stt_manager import STTManager
-from AgentProject.core.humanizer.emotion_analisys import LLMEmotionAnalyzer, EmotionLabel
-from AgentProject.core.humanizer.personality_manager import DinamicPersonalityManager, ConversationTopic
-from AgentProject.core.llm_inference.text_generation import TextGenerationInference
+from langchain_core.runnables import RunnableConfig
+from AgentProject.core.humanizer.emotion_analisys import EmotionLabel
+from AgentProject.core.humanizer.personality_manager import ConversationTopic
 from AgentProject.core.llm_inference.message_prompt import message_chat
+from AgentProject.core.audio_orchestrator.backchannel import backchannel_phrases, select_backchannel
 from AgentProject.configuration.app_configuration.app_configuration import AppConfiguration
-from AgentProject.core.memory.memorie_context import ConversationMemory
-from AgentProject.core.audio_orchestrator.tts_manager import TTSManager
+from AgentProject.core.telemetry.tracing import use_turn
+from Agents.session_runtime import SharedResources, SessionRuntime
 import logging
 import asyncio
-import threading
+import time
 
 logging.basicConfig(
     level= logging.INFO,
@@ -19,172 +19,262 @@ logging.basicConfig(
 logger = logging.getLogger(__name__)
 
 app_config = AppConfiguration()
-stt_manager = STTManager(deepgram_api_key= app_config.DEEPGRAM_API_KEY)
-llm_inference = TextGenerationInference(repo_id=app_config.LLM_MODEL_NAME, 
-                                        hf_token= app_config.HF_TOKEN,
-                                        provider= app_config.LLM_PROVIDER,
-                                        default_max_tokens= app_config.LLM_MODEL_MAX_TOKENS,
-                                        default_temperature= app_config.LLM_MODEL_TEMPERATURE)
-emotion_enginer = LLMEmotionAnalyzer(llm_inference= llm_inference)
-personality_enginer = DinamicPersonalityManager(llm_inference= llm_inference,  gender=app_config.GENDER_PERSONALITY)
-conversation_memory = ConversationMemory(db_path=app_config.DB_PATH_CONTEXT_MEMORY, max_context_tokens=app_config.DEFAULT_MAX_TOKENS_MEMORIE_CONTEXT, session_id='mi_chat_1')
-tts_manager = TTSManager(api_key= app_config.ELEVELABS_TOKEN, voice_id= app_config.ELEVELABS_VOICE_ID)
+#cliente LLM, tokenizador y configuracion de personalidad se comparten; audio y memoria son por sesion
+_shared_resources: Optional[SharedResources] = None
+_session_runtime: Optional[SessionRuntime] = None
+_warm_up_task: Optional[asyncio.Task] = None
+
+def configure_runtime(shared_resources: SharedResources, session_runtime: SessionRuntime) -> None:
+    #permite ejecutar el grafo con otros recursos, p. ej. los sustitutos locales de benchmarks/
+    global _shared_resources, _session_runtime, _warm_up_task
+    _shared_resources = shared_resources
+    _session_runtime = session_runtime
+    _warm_up_task = None
+
+def get_shared_resources() -> SharedResources:
+    global _shared_resources
+    if _shared_resources is None:
+        _shared_resources = SharedResources(app_config= app_config)
+    return _shared_resources
+
+def get_session_runtime() -> SessionRuntime:
+    global _session_runtime
+    if _session_runtime is None:
+        shared_resources = get_shared_resources()
+        _session_runtime = SessionRuntime(audio_factory= shared_resources.build_audio,
+                                          memory_factory= shared_resources.build_memory,
+                                          personality_factory= shared_resources.build_personality,
+                                          max_sessions= app_config.SESSION_MAX_SESSIONS,
+                                          idle_timeout_s= app_config.SESSION_IDLE_TIMEOUT_S,
+                                          audio_pool_size= app_config.SESSION_AUDIO_POOL_SIZE,
+                                          default_session_id= app_config.SESSION_DEFAULT_ID)
+    return _session_runtime
+
+async def _run_warm_up() -> Dict[str, float]:
+    started = time.perf_counter()
+    shared_timings, audio_ms = await asyncio.gather(get_shared_resources().warm_up(),
+                                                    get_session_runtime().warm_up(app_config.SESSION_WARM_AUDIO))
+    timings = dict(shared_timings, audio= audio_ms, total= (time.perf_counter() - started) * 1000)
+    logger.info('Precarga completada: ' + ', '.join(f'{name} {value:.0f} ms' for name, value in timings.items()))
+    return timings
+
+async def warm_up() -> Dict[str, float]:
+    #cliente LLM, tokenizador, personalidad y audio en paralelo; solo la primera llamada hace el trabajo
+    global _warm_up_task
+    if _warm_up_task is None:
+        _warm_up_task = asyncio.create_task(_run_warm_up())
+    try:
+        return await asyncio.shield(_warm_up_task)
+    except Exception as e:
+        #lo que no se pudo precargar se vuelve a intentar al usarse por primera vez
+        logger.error(f'Error en la precarga: {str(e)}')
+        return {}
 
 class StateConversacionalAgent(TypedDict):
+    #solo lo que decide el flujo; prompts e historial viven en ConversationSession y no se copian en cada paso
     user_prompt: str = ''
     interim_user_prompt: str = ''
     state_transcription: bool = False
     emotion: Optional[EmotionLabel] = None
     topic: Optional[ConversationTopic] = None
-    personality_prompt: str = ''
-    system_prompt: str = ''
-    conversation_history: List[Dict] = [{}]
 
-def inicialize_stt(state: StateConversacionalAgent) -> StateConversacionalAgent:
-    stt_manager.start_listening()
+async def inicialize_stt(state: StateConversacionalAgent, config: RunnableConfig) -> Dict:
+    if app_config.WARM_UP_ON_START:
+        await warm_up()
+    session = await get_session_runtime().acquire(config)
+    session.stt_manager.start_listening()
     logger.info('Grafo iniciado y escucha activa')
-    return state
+    return {}
 
-async def inicialize_tts(state: StateConversacionalAgent) ->StateConversacionalAgent:
+async def inicialize_tts(state: StateConversacionalAgent, config: RunnableConfig) -> Dict:
+    tts_manager = get_session_runtime().get(config).tts_manager
     await tts_manager.start_listening()
+    if app_config.BACKCHANNEL_ENABLED:
+        #el audio reutilizado del pool ya los tiene; solo se sintetizan los que falten
+        await tts_manager.prepare_backchannels(backchannel_phrases())
     logger.info('TTS iniciado')
-    return state
+    return {}
 
-def finish_stt(state: StateConversacionalAgent) -> StateConversacionalAgent:
-    stt_manager.stop_listening()
+def finish_stt(state: StateConversacionalAgent, config: RunnableConfig) -> Dict:
+    get_session_runtime().get(config).stt_manager.stop_listening()
     logger.info('Escucha desactivada')
-    return state
+    return {}
 
-async def finish_tts(state:StateConversacionalAgent) -> StateConversacionalAgent:
-    await tts_manager.stop_listening()
+async def finish_tts(state:StateConversacionalAgent, config: RunnableConfig) -> Dict:
+    #el audio vuelve al pool con la conexion del TTS abierta
+    await get_session_runtime().release(config)
     logger.info('TTS cerrado')
-    return state
+    return {}
 
-def stt_streaming(state: StateConversacionalAgent) -> StateConversacionalAgent:
+async def stt_streaming(state: StateConversacionalAgent, config: RunnableConfig) -> Dict:
+    #cada turno vuelve a reservar la sesion: si expiro por inactividad se crea de nuevo
+    session = await get_session_runtime().acquire(config)
+    session.trace = get_shared_resources().tracer.start_turn(session.session_id)
+    session.tts_manager.cancel_backchannel()
+    stt_manager = session.stt_manager
+    update = {}
     try:
         stt_manager.start_listening()
-        while True:
-            try:
-                result = stt_manager.get_transcription()
-                if isinstance(result, tuple):
-                    state['state_transcription'], sentence = result
-                    if state['state_transcription']:
-                        state['user_prompt'] = sentence
+        with session.waiting():
+            while True:
+                try:
+                    #el nodo queda suspendido hasta que STTManager entrega una transcripcion
+                    update['state_transcription'], sentence = await stt_manager.next_transcription()
+                    if update['state_transcription']:
+                        update['user_prompt'] = sentence
+                        session.trace.set_end_of_speech(stt_manager.last_end_of_speech_time, stt_manager.last_turn_time)
                         break
                     else:
-                        state['interim_user_prompt'] = sentence
-                else:
-                    continue
-            except Exception as e:
-                logger.info(f'Error en la obtencion de la transcription en el agente: {str(e)}')
-        return state
+                        update['interim_user_prompt'] = sentence
+                except Exception as e:
+                    logger.info(f'Error en la obtencion de la transcription en el agente: {str(e)}')
+        return update
 
     except Exception as e:
         logger.error(f'Ocurrio un error en el nodo stt_streaming: {str(e)}')
-        state['user_prompt'] = ''
-        state['state_transcription'] = False
-        state['interim_user_prompt'] = ''
-        return state
+        return {'user_prompt': '', 'state_transcription': False, 'interim_user_prompt': ''}
     finally:
         stt_manager.clear_interruption()
-        stt_manager.stop_listening()
+        if not app_config.BARGE_IN_ENABLED:
+            stt_manager.stop_listening()
 
-def check_interruption(state: StateConversacionalAgent) -> str:
-    if stt_manager.check_interruption():
+def check_interruption(state: StateConversacionalAgent, config: RunnableConfig) -> str:
+    if get_session_runtime().get(config).stt_manager.check_interruption():
         return 'interruption_node'
     if state['user_prompt'].lower().replace('.', '').replace(',','').strip() == 'salir':
         return 'finish_node'
     return 'continue'
 
-async def emotion_and_topic(state: StateConversacionalAgent) -> StateConversacionalAgent:
+async def emotion_and_topic(state: StateConversacionalAgent, config: RunnableConfig) -> Dict:
     
+    update = {}
     try:
-        emotion_task = asyncio.create_task(emotion_enginer.analyze_emotion(state['user_prompt']))
-        topic_task  =asyncio.create_task(personality_enginer.analyze_conversation_topic(state['user_prompt']))
-        
-        state['emotion'] = await emotion_task
-        state['topic'] = await topic_task
-        return state
+        session = get_session_runtime().get(config)
+        with session.trace.span('classification'):
+            emotion_task = asyncio.create_task(get_shared_resources().emotion_analyzer.analyze_emotion(state['user_prompt']))
+            topic_task  =asyncio.create_task(session.personality.analyze_conversation_topic(state['user_prompt']))
+            
+            update['emotion'] = await emotion_task
+            update['topic'] = await topic_task
     except Exception as e:
         logger.error(f'Error en la obtencion de topico y emociones de la conversacion: {str(e)}')
-        state['emotion'] = None
-        state['topic'] = None
-        return state
+        update = {'emotion': None, 'topic': None}
+    if app_config.BACKCHANNEL_ENABLED:
+        start_backchannel(update['emotion'], update['topic'], config)
+    return update
+
+def start_backchannel(emotion: Optional[EmotionLabel], topic: Optional[ConversationTopic], config: RunnableConfig) -> None:
+    #se programa tras la clasificacion para elegir el acuse segun emocion y topico
+    session = get_session_runtime().get(config)
+    trace = session.trace
+    phrase = select_backchannel(emotion, topic, session.last_backchannel)
+    deadline = (trace.end_of_speech_time or time.perf_counter()) + app_config.BACKCHANNEL_DELAY_MS / 1000
+    #la tarea hereda la traza y marca cuando empieza a sonar el acuse
+    with use_turn(trace):
+        if session.tts_manager.start_backchannel(phrase, max(0.0, deadline - time.perf_counter()),
+                                                 session.stt_manager.interruption_flag,
+                                                 session.stt_manager.async_interruption()):
+            session.last_backchannel = phrase
 
-def current_personality_blend(state: StateConversacionalAgent) -> StateConversacionalAgent:
+def current_personality_blend(state: StateConversacionalAgent, config: RunnableConfig) -> Dict:
     try:
-        optimal_blend = personality_enginer.calculate_dynamic_blend(
-                                                        state['emotion'],
-                                                        state['topic']
-                                                                )
-        personality_enginer.set_personality_blend(
-            optimal_blend.primary,
-            optimal_blend.secondary,
-            optimal_blend.primary_weight,
-            optimal_blend.secondary_weight,
-            optimal_blend.reasoning
-        )
-        return state
+        session = get_session_runtime().get(config)
+        personality_enginer = session.personality
+        with session.trace.span('personality'):
+            optimal_blend = personality_enginer.calculate_dynamic_blend(
+                                                            state['emotion'],
+                                                            state['topic']
+                                                                    )
+            personality_enginer.set_personality_blend(
+                optimal_blend.primary,
+                optimal_blend.secondary,
+                optimal_blend.primary_weight,
+                optimal_blend.secondary_weight,
+                optimal_blend.reasoning
+            )
+        return {}
     except Exception as e:
         logger.error(f'Error en el establecimiento de la mezcla de personalidad: {str(e)}')
-        return state
+        return {}
         
-def personality_prompt(state: StateConversacionalAgent) -> StateConversacionalAgent:
+def personality_prompt(state: StateConversacionalAgent, config: RunnableConfig) -> Dict:
+    session = get_session_runtime().get(config)
     try:
-        personality_prompt_data = personality_enginer.get_personality_prompt_data()
-        state['personality_prompt'] = personality_enginer.personality_prompt_template.format(**personality_prompt_data)
-        return state    
+        personality_enginer = session.personality
+        with session.trace.span('personality'):
+            personality_prompt_data = personality_enginer.get_personality_prompt_data()
+            session.personality_prompt = personality_enginer.personality_prompt_template.format(**personality_prompt_data)
+        return {}
     except Exception as e:
         logger.error(f'Error en la obtencion del prompt de personalidad: {str(e)}')
-        state['personality_prompt'] = ''
-        return state
+        session.personality_prompt = ''
+        return {}
     
-def load_dependencies_generation(state: StateConversacionalAgent) -> StateConversacionalAgent:
+def load_dependencies_generation(state: StateConversacionalAgent, config: RunnableConfig) -> Dict:
+    session = get_session_runtime().get(config)
     try:
-        state['system_prompt'] = app_config.SYSTEM_PROMPT
-        state['conversation_history'] = conversation_memory.get_context()
-        return state
+        with session.trace.span('context_load'):
+            session.conversation_history = session.memory.get_context()
+        return {}
     except Exception as e:
         logger.error(f'En la obtencion de alguna dependencias contextual {str(e)}')
-        state['system_prompt'] = app_config.SYSTEM_PROMPT
-        state['conversation_history'] = None
-        return state
+        session.conversation_history = []
+        return {}
 
-async def generation_and_tts(state: StateConversacionalAgent) -> StateConversacionalAgent:
+async def generation_and_tts(state: StateConversacionalAgent, config: RunnableConfig) -> Dict:
+    session = get_session_runtime().get(config)
+    stt_manager = session.stt_manager
+    trace = session.trace
+    trace.mark('generation_start')
+    #el unico punto donde prompts e historial se convierten en mensajes
     messages = message_chat(
         user_prompt= state['user_prompt'],
-        system_prompt= state['system_prompt'],
-        personality_prompt= state['personality_prompt'],
-        conversation_history= state['conversation_history']
+        system_prompt= app_config.SYSTEM_PROMPT,
+        personality_prompt= session.personality_prompt,
+        conversation_history= session.conversation_history
     )
     try:
-        stt_manager.stop_listening()
-        tts_task = asyncio.create_task(tts_manager.tts_processing(
-            text_chunk=llm_inference.agenerate(messages_prompt= messages), 
-            interrupt_event= stt_manager.interruption_flag))
+        #con barge-in el microfono sigue abierto y la voz del usuario corta la respuesta
+        if not app_config.BARGE_IN_ENABLED:
+            stt_manager.stop_listening()
+        #el LLM y el TTS marcan el primer token y el primer audio en la traza heredada por la tarea
+        with use_turn(trace):
+            tts_task = asyncio.create_task(session.tts_manager.tts_processing(
+                text_chunk=get_shared_resources().llm_inference.agenerate(messages_prompt= messages), 
+                interrupt_event= stt_manager.interruption_flag,
+                interruption= stt_manager.async_interruption()))
+        
+        interruption_task = asyncio.create_task(stt_manager.wait_for_interruption())
         
-        pending = {tts_task}
-        while pending:
+        #se despierta al terminar la respuesta o en cuanto se levanta la bandera, lo que ocurra antes
+        with session.waiting():
             done, pending = await asyncio.wait(
-                pending,
-                timeout= 0.1,
+                {tts_task, interruption_task},
                 return_when= asyncio.FIRST_COMPLETED
             )
+        for task in pending:
+            task.cancel()
+        await asyncio.gather(*pending, return_exceptions=True)
+        session.tts_manager.cancel_backchannel()
 
-            if stt_manager.check_interruption():
-                logger.info('Interrupcion detectada en el nodo TTS')
-                for task in pending:
-                    task.cancel()
-                await asyncio.gather(*pending, return_exceptions=True)
-                return state
+        if stt_manager.check_interruption():
+            logger.info('Interrupcion detectada en el nodo TTS')
+            trace.mark('interruption_handled')
+            #sin VAD local el inicio de voz no se conoce y no se mide la reaccion
+            if stt_manager.last_speech_start_time >= trace.marks['generation_start']:
+                trace.mark('user_speech_start', stt_manager.last_speech_start_time)
+            get_shared_resources().tracer.finish_turn(trace, interrupted= True)
+            return {}
         
         transcription = tts_task.result()
-        await conversation_memory.add_menssage('user', state['user_prompt'])
-        await conversation_memory.add_menssage('assistant', transcription)
-        return state
+        get_shared_resources().tracer.finish_turn(trace)
+        session.turns += 1
+        await session.memory.add_menssage('user', state['user_prompt'])
+        await session.memory.add_menssage('assistant', transcription)
+        return {}
     except Exception as e:
         logger.error(f'Error nodo TTS: {str(e)}')
-        return state
+        return {}
     
 
 def builder():
@@ -0,0 +1,432 @@
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple
+from langchain_core.runnables import RunnableConfig
+from AgentProject.core.audio_orchestrator.stt_manager import STTManager
+from AgentProject.core.audio_orchestrator.audio_source import build_audio_source
+from AgentProject.core.audio_orchestrator.turn_detector import EndOfTurnPolicy
+from AgentProject.core.audio_orchestrator.echo_suppression import EchoReference
+from AgentProject.core.audio_orchestrator.audio_sink import build_audio_sink
+from AgentProject.core.audio_orchestrator.tts_manager import TTSManager
+from AgentProject.core.audio_orchestrator.tts_phrase_cache import TTSPhraseCache
+from AgentProject.core.audio_orchestrator.tts_policy import AdaptiveChunkSchedule
+from AgentProject.core.humanizer.emotion_analisys import LLMEmotionAnalyzer
+from AgentProject.core.humanizer.personality_manager import DinamicPersonalityManager
+from AgentProject.core.llm_inference.text_generation import TextGenerationInference
+from AgentProject.core.memory.memorie_context import ConversationMemory
+from AgentProject.core.telemetry.metrics import JsonlTurnExporter, MetricsHTTPServer
+from AgentProject.core.telemetry.tracing import TurnTrace, TurnTracer
+from AgentProject.configuration.app_configuration.app_configuration import AppConfiguration
+import threading
+import tiktoken
+import logging
+import asyncio
+import yaml
+import time
+
+logging.basicConfig(
+    level= logging.INFO,
+    format= '%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+)
+logger = logging.getLogger(__name__)
+
+PERSONALITY_CONFIG_PATH = 'AgentProject/configuration/personalities_configuration/personalities.yml'
+
+class SessionLimitError(RuntimeError):
+    pass
+
+@dataclass
+class SessionRuntimeStats:
+    active_sessions: int
+    peak_sessions: int
+    created: int
+    released: int
+    evicted: int
+    rejected: int
+    pooled_audio: int
+    audio_built: int
+    audio_reused: int
+
+@dataclass
+class AudioResources:
+    #STT y TTS comparten la referencia de eco, asi que se reservan y se reutilizan juntos
+    stt_manager: STTManager
+    tts_manager: TTSManager
+    echo_reference: Optional[EchoReference] = None
+
+    def park(self) -> None:
+        #el microfono se cierra pero la conexion del TTS sigue abierta y caliente para la siguiente sesion
+        self.stt_manager.stop_listening()
+        self.stt_manager.clear_interruption()
+        self.stt_manager.clear_transcriptions()
+
+    async def close(self) -> None:
+        self.stt_manager.shutdown()
+        await self.tts_manager.stop_listening()
+
+@dataclass
+class ConversationSession:
+    session_id: str
+    audio: AudioResources
+    memory: ConversationMemory
+    personality: DinamicPersonalityManager
+    created_at: float = field(default_factory= time.monotonic)
+    last_used: float = field(default_factory= time.monotonic)
+    turns: int = 0
+    trace: Optional[TurnTrace] = None
+    last_backchannel: Optional[str] = None
+    #lo que necesita el prompt se guarda aqui y no en el estado del grafo, que LangGraph copia en cada paso
+    personality_prompt: str = ''
+    conversation_history: List[Dict[str, str]] = field(default_factory= list)
+    active_waits: int = 0
+
+    @property
+    def stt_manager(self) -> STTManager:
+        return self.audio.stt_manager
+
+    @property
+    def tts_manager(self) -> TTSManager:
+        return self.audio.tts_manager
+
+    def touch(self) -> None:
+        self.last_used = time.monotonic()
+
+    @property
+    def busy(self) -> bool:
+        return self.active_waits > 0
+
+    @contextmanager
+    def waiting(self) -> Iterator[None]:
+        #un nodo esperando al usuario mantiene viva la sesion aunque pase el tiempo de inactividad
+        self.active_waits += 1
+        try:
+            yield
+        finally:
+            self.active_waits -= 1
+            self.touch()
+
+class SharedResources:
+    #partes sin estado de conversacion y caras de construir: una sola copia por proceso
+    def __init__(self,
+                 app_config: AppConfiguration,
+                 llm_inference: Optional[TextGenerationInference] = None,
+                 tokenizer: Any = None,
+                 personality_config: Optional[Dict] = None):
+
+        self.app_config = app_config
+        #cada recurso se construye la primera vez que se usa (o en warm_up); lo inyectado se usa tal cual
+        self._llm_inference = llm_inference
+        self._emotion_analyzer: Optional[LLMEmotionAnalyzer] = None
+        self._tokenizer = tokenizer
+        self._personality_config = personality_config
+        self._phrase_cache: Optional[TTSPhraseCache] = None
+        self._whisper_model: Any = None
+        self._locks = {name: threading.Lock() for name in ('_llm_inference', '_emotion_analyzer', '_tokenizer',
+                                                            '_personality_config', '_phrase_cache', '_whisper_model')}
+
+        exports = {export.strip() for export in app_config.TELEMETRY_EXPORT.split(',')}
+        self.tracer = TurnTracer(exporters= [JsonlTurnExporter(app_config.TELEMETRY_JSONL_PATH)] if 'jsonl' in exports else [])
+        self.metrics_server: Optional[MetricsHTTPServer] = None
+        if 'prometheus' in exports:
+            self.metrics_server = MetricsHTTPServer(self.tracer.registry,
+                                                    host= app_config.TELEMETRY_PROMETHEUS_HOST,
+                                                    port= app_config.TELEMETRY_PROMETHEUS_PORT)
+            self.metrics_server.start()
+
+    def _lazy(self, attribute: str, factory: Callable[[], Any]) -> Any:
+        value = getattr(self, attribute)
+        if value is None:
+            #un candado por recurso: la precarga en paralelo no serializa construcciones distintas
+            with self._locks[attribute]:
+                value = getattr(self, attribute)
+                if value is None:
+                    value = factory()
+                    setattr(self, attribute, value)
+        return value
+
+    @property
+    def llm_inference(self) -> TextGenerationInference:
+        app_config = self.app_config
+        return self._lazy('_llm_inference', lambda: TextGenerationInference(repo_id= app_config.LLM_MODEL_NAME,
+                                                                            hf_token= app_config.HF_TOKEN,
+                                                                            provider= app_config.LLM_PROVIDER,
+                                                                            default_max_tokens= app_config.LLM_MODEL_MAX_TOKENS,
+                                                                            default_temperature= app_config.LLM_MODEL_TEMPERATURE))
+
+    @property
+    def emotion_analyzer(self) -> LLMEmotionAnalyzer:
+        return self._lazy('_emotion_analyzer', lambda: LLMEmotionAnalyzer(llm_inference= self.llm_inference))
+
+    @property
+    def tokenizer(self) -> Any:
+        return self._lazy('_tokenizer', lambda: tiktoken.get_encoding('cl100k_base'))
+
+    @property
+    def personality_config(self) -> Dict:
+        def load() -> Dict:
+            with open(PERSONALITY_CONFIG_PATH, 'r', encoding='utf-8') as file:
+                return yaml.safe_load(file)
+        return self._lazy('_personality_config', load)
+
+    @property
+    def phrase_cache(self) -> Optional[TTSPhraseCache]:
+        app_config = self.app_config
+        if not app_config.TTS_PHRASE_CACHE_ENABLED:
+            return None
+        #el PCM cacheado depende solo de la voz y el formato, no de la conversacion
+        return self._lazy('_phrase_cache', lambda: TTSPhraseCache(cache_dir= app_config.TTS_PHRASE_CACHE_DIR,
+                                                                  max_bytes= app_config.TTS_PHRASE_CACHE_MAX_BYTES,
+                                                                  max_phrase_chars= app_config.TTS_PHRASE_CACHE_MAX_CHARS))
+
+    @property
+    def whisper_model(self) -> Any:
+        app_config = self.app_config
+        if app_config.STT_ENGINE != 'faster-whisper':
+            return None
+
+        def load() -> Any:
+            #import diferido: faster-whisper solo se carga si es el motor elegido
+            from AgentProject.core.audio_orchestrator.stt_whisper import load_whisper_model
+            return load_whisper_model(model_size= app_config.WHISPER_MODEL_SIZE,
+                                      compute_type= app_config.WHISPER_COMPUTE_TYPE,
+                                      cpu_threads= app_config.WHISPER_CPU_THREADS,
+                                      num_workers= app_config.WHISPER_NUM_WORKERS)
+        return self._lazy('_whisper_model', load)
+
+    async def warm_up(self) -> Dict[str, float]:
+        #cada recurso en su hilo; devuelve lo que tardo cada uno en ms
+        steps = {
+            'llm_client': lambda: self.emotion_analyzer,
+            'tokenizer': lambda: self.tokenizer,
+            'personality_config': lambda: self.personality_config,
+            'phrase_cache': lambda: self.phrase_cache,
+            'whisper_model': lambda: self.whisper_model
+        }
+
+        async def timed(name: str, step: Callable[[], Any]) -> Tuple[str, float]:
+            started = time.perf_counter()
+            await asyncio.to_thread(step)
+            return name, (time.perf_counter() - started) * 1000
+
+        return dict(await asyncio.gather(*[timed(name, step) for name, step in steps.items()]))
+
+    def build_audio(self) -> AudioResources:
+        app_config = self.app_config
+        #la referencia de lo reproducido conecta el TTS con el cancelador de eco del STT
+        echo_reference = EchoReference(output_latency_ms= app_config.ECHO_OUTPUT_LATENCY_MS) if app_config.BARGE_IN_ENABLED else None
+        stt_manager = STTManager(deepgram_api_key= app_config.DEEPGRAM_API_KEY,
+                                 engine= app_config.STT_ENGINE,
+                                 block_ms= app_config.STT_BLOCK_MS,
+                                 ring_buffer_ms= app_config.STT_RING_BUFFER_MS,
+                                 backpressure_policy= app_config.STT_BACKPRESSURE_POLICY,
+                                 vad_enabled= app_config.STT_VAD_ENABLED,
+                                 vad_energy_margin_db= app_config.STT_VAD_ENERGY_MARGIN_DB,
+                                 vad_min_speech_ms= app_config.STT_VAD_MIN_SPEECH_MS,
+                                 vad_hangover_ms= app_config.STT_VAD_HANGOVER_MS,
+                                 vad_silence_suppress_ms= app_config.STT_VAD_SILENCE_SUPPRESS_MS,
+                                 vad_preroll_ms= app_config.STT_VAD_PREROLL_MS,
+                                 whisper_model_size= app_config.WHISPER_MODEL_SIZE,
+                                 whisper_compute_type= app_config.WHISPER_COMPUTE_TYPE,
+                                 whisper_cpu_threads= app_config.WHISPER_CPU_THREADS,
+                                 whisper_beam_size= app_config.WHISPER_BEAM_SIZE,
+                                 whisper_partial_interval_ms= app_config.WHISPER_PARTIAL_INTERVAL_MS,
+                                 whisper_partial_window_s= app_config.WHISPER_PARTIAL_WINDOW_S,
+                                 whisper_model= self.whisper_model,
+                                 audio_source= build_audio_source(kind= app_config.STT_AUDIO_SOURCE,
+                                                                  block_ms= app_config.STT_BLOCK_MS,
+                                                                  replay_path= app_config.STT_REPLAY_PATH,
+                                                                  replay_speed= app_config.STT_REPLAY_SPEED),
+                                 turn_policy= EndOfTurnPolicy(use_speech_final= app_config.TURN_USE_SPEECH_FINAL,
+                                                              use_utterance_end= app_config.TURN_USE_UTTERANCE_END,
+                                                              silence_timeout_ms= app_config.TURN_SILENCE_TIMEOUT_MS,
+                                                              punctuation_grace_ms= app_config.TURN_PUNCTUATION_GRACE_MS),
+                                 endpointing_ms= app_config.STT_ENDPOINTING_MS,
+                                 utterance_end_ms= app_config.STT_UTTERANCE_END_MS,
+                                 echo_reference= echo_reference)
+        tts_manager = TTSManager(api_key= app_config.ELEVELABS_TOKEN,
+                                 voice_id= app_config.ELEVELABS_VOICE_ID,
+                                 playback_period_ms= app_config.TTS_PLAYBACK_PERIOD_MS,
+                                 playback_buffer_ms= app_config.TTS_PLAYBACK_BUFFER_MS,
+                                 playback_prebuffer_ms= app_config.TTS_PLAYBACK_PREBUFFER_MS,
+                                 phrase_cache= self.phrase_cache,
+                                 keepalive_interval= app_config.TTS_KEEPALIVE_INTERVAL_S,
+                                 echo_reference= echo_reference,
+                                 barge_in_max_reaction_ms= app_config.BARGE_IN_MAX_REACTION_MS,
+                                 base_url= app_config.TTS_BASE_URL,
+                                 sink= build_audio_sink(kind= app_config.TTS_AUDIO_SINK,
+                                                        path= app_config.TTS_AUDIO_SINK_PATH),
+                                 output_format= app_config.TTS_OUTPUT_FORMAT,
+                                 max_sample_rate= app_config.TTS_MAX_SAMPLE_RATE,
+                                 chunk_schedule= AdaptiveChunkSchedule(first_chunk_chars= app_config.TTS_FIRST_CHUNK_CHARS,
+                                                                       min_first_chunk_chars= app_config.TTS_FIRST_CHUNK_MIN_CHARS,
+                                                                       max_first_chunk_chars= app_config.TTS_FIRST_CHUNK_MAX_CHARS,
+                                                                       tail= app_config.TTS_CHUNK_SCHEDULE_TAIL,
+                                                                       target_first_audio_ms= app_config.TTS_TARGET_FIRST_AUDIO_MS,
+                                                                       ema_alpha= app_config.TTS_LATENCY_EMA_ALPHA,
+                                                                       adaptive= app_config.TTS_CHUNK_SCHEDULE_ADAPTIVE))
+        if app_config.BARGE_IN_ENABLED:
+            stt_manager.add_barge_in_listener(tts_manager.barge_in)
+        return AudioResources(stt_manager= stt_manager, tts_manager= tts_manager, echo_reference= echo_reference)
+
+    def build_memory(self, session_id: str) -> ConversationMemory:
+        return ConversationMemory(db_path= self.app_config.DB_PATH_CONTEXT_MEMORY,
+                                  max_context_tokens= self.app_config.DEFAULT_MAX_TOKENS_MEMORIE_CONTEXT,
+                                  session_id= session_id,
+                                  tokenizer= self.tokenizer)
+
+    def build_personality(self) -> DinamicPersonalityManager:
+        return DinamicPersonalityManager(llm_inference= self.llm_inference,
+                                         gender= self.app_config.GENDER_PERSONALITY,
+                                         config= self.personality_config)
+
+    def close(self) -> None:
+        if self._phrase_cache:
+            self._phrase_cache.close()
+        for name, summary in self.tracer.registry.summary().items():
+            logger.info(f'{name}: p50 {summary["p50"]:.0f} ms, p95 {summary["p95"]:.0f} ms ({summary["count"]} turnos)')
+        self.tracer.close()
+        if self.metrics_server:
+            self.metrics_server.close()
+
+class SessionRuntime:
+    #una conversacion por thread_id de LangGraph; el audio de las sesiones terminadas se reutiliza
+    def __init__(self,
+                 audio_factory: Callable[[], AudioResources],
+                 memory_factory: Callable[[str], ConversationMemory],
+                 personality_factory: Callable[[], DinamicPersonalityManager],
+                 max_sessions: int = 8,
+                 idle_timeout_s: float = 900.0,
+                 audio_pool_size: int = 2,
+                 default_session_id: str = 'default'):
+
+        self.audio_factory = audio_factory
+        self.memory_factory = memory_factory
+        self.personality_factory = personality_factory
+        self.max_sessions = max_sessions
+        self.idle_timeout = idle_timeout_s
+        self.audio_pool_size = audio_pool_size
+        self.default_session_id = default_session_id
+
+        self._sessions: Dict[str, ConversationSession] = {}
+        self._audio_pool: List[AudioResources] = []
+        self._lock = asyncio.Lock()
+        self.peak_sessions = 0
+        self.created = 0
+        self.released = 0
+        self.evicted = 0
+        self.rejected = 0
+        self.audio_built = 0
+        self.audio_reused = 0
+
+    async def warm_up(self, count: int = 1) -> float:
+        #deja en el pool audio ya construido y con el websocket del TTS abierto antes del primer turno
+        started = time.perf_counter()
+        missing = min(count, self.audio_pool_size) - len(self._audio_pool)
+        if missing > 0:
+            built = await asyncio.gather(*[asyncio.to_thread(self.audio_factory) for _ in range(missing)])
+            await asyncio.gather(*[audio.tts_manager.start_listening() for audio in built])
+            async with self._lock:
+                self.audio_built += len(built)
+                self._audio_pool.extend(built)
+        return (time.perf_counter() - started) * 1000
+
+    def session_id(self, config: Optional[RunnableConfig]) -> str:
+        return ((config or {}).get('configurable') or {}).get('thread_id') or self.default_session_id
+
+    async def acquire(self, config: Optional[RunnableConfig]) -> ConversationSession:
+        session_id = self.session_id(config)
+        async with self._lock:
+            session = self._sessions.get(session_id)
+            if session is None:
+                await self._evict_idle_locked()
+                if len(self._sessions) >= self.max_sessions:
+                    self.rejected += 1
+                    raise SessionLimitError(f'Limite de {self.max_sessions} sesiones alcanzado; se rechaza {session_id}')
+                session = await self._create(session_id)
+            session.touch()
+            return session
+
+    def get(self, config: Optional[RunnableConfig]) -> ConversationSession:
+        #para los nodos sincronos: la sesion ya se reservo al comienzo del turno
+        session_id = self.session_id(config)
+        session = self._sessions.get(session_id)
+        if session is None:
+            raise KeyError(f'La sesion {session_id} no esta activa')
+        session.touch()
+        return session
+
+    async def _create(self, session_id: str) -> ConversationSession:
+        if self._audio_pool:
+            audio = self._audio_pool.pop()
+            self.audio_reused += 1
+        else:
+            #abrir dispositivos y modelos bloquea; se hace fuera del bucle de eventos
+            audio = await asyncio.to_thread(self.audio_factory)
+            self.audio_built += 1
+        memory = await asyncio.to_thread(self.memory_factory, session_id)
+
+        session = ConversationSession(session_id= session_id,
+                                      audio= audio,
+                                      memory= memory,
+                                      personality= self.personality_factory())
+        self._sessions[session_id] = session
+        self.created += 1
+        self.peak_sessions = max(self.peak_sessions, len(self._sessions))
+        logger.info(f'Sesion {session_id} creada ({len(self._sessions)}/{self.max_sessions} activas)')
+        return session
+
+    async def _retire(self, session: ConversationSession, reuse_audio: bool) -> None:
+        session.memory.close()
+        if reuse_audio and len(self._audio_pool) < self.audio_pool_size:
+            session.audio.park()
+            self._audio_pool.append(session.audio)
+        else:
+            await session.audio.close()
+
+    async def release(self, config: Optional[RunnableConfig]) -> None:
+        async with self._lock:
+            session = self._sessions.pop(self.session_id(config), None)
+            if session:
+                self.released += 1
+                await self._retire(session, reuse_audio= True)
+                logger.info(f'Sesion {session.session_id} cerrada tras {session.turns} turnos')
+
+    async def _evict_idle_locked(self) -> int:
+        now = time.monotonic()
+        #una sesion con un nodo en espera sigue en uso; si el cliente abandona, la cancelacion del grafo la libera
+        idle = [session for session in self._sessions.values()
+                if not session.busy and now - session.last_used > self.idle_timeout]
+        for session in idle:
+            del self._sessions[session.session_id]
+            #una sesion expulsada pudo quedar a medias de un turno: su audio no se reutiliza
+            await self._retire(session, reuse_audio= False)
+            self.evicted += 1
+            logger.info(f'Sesion {session.session_id} expulsada por inactividad')
+        return len(idle)
+
+    async def evict_idle(self) -> int:
+        async with self._lock:
+            return await self._evict_idle_locked()
+
+    def stats(self) -> SessionRuntimeStats:
+        return SessionRuntimeStats(
+            active_sessions= len(self._sessions),
+            peak_sessions= self.peak_sessions,
+            created= self.created,
+            released= self.released,
+            evicted= self.evicted,
+            rejected= self.rejected,
+            pooled_audio= len(self._audio_pool),
+            audio_built= self.audio_built,
+            audio_reused= self.audio_reused
+        )
+
+    async def close(self) -> None:
+        async with self._lock:
+            for session in list(self._sessions.values()):
+                session.memory.close()
+                await session.audio.close()
+            self._sessions.clear()
+            for audio in self._audio_pool:
+                await audio.close()
+            self._audio_pool.clear()
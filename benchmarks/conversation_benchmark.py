@@ -0,0 +1,206 @@
+import os
+
+#AppConfiguration exige estas claves al importar el agente aunque aqui ningun servicio externo se use
+for _key in ('HF_TOKEN', 'ELEVELABS_TOKEN', 'DB_PATH_CONTEXT_MEMORY', 'DB_PATH_EMBEDDING_CACHE',
+             'DB_PATH_VECTO_RAG', 'DEEPGRAM_API_KEY', 'ASSEMBLYAI'):
+    os.environ.setdefault(_key, 'stand-in')
+
+from Agents import conversational_agent
+from Agents.session_runtime import SharedResources, SessionRuntime, AudioResources
+from AgentProject.configuration.app_configuration.app_configuration import AppConfiguration
+from AgentProject.core.audio_orchestrator.tts_manager import TTSManager
+from AgentProject.core.audio_orchestrator.audio_sink import NullSink
+from benchmarks.tts_stand_in_server import TTSStandInServer
+from benchmarks.stand_ins import StandInLLM, StandInSTTManager, ScriptedUtterance, WhitespaceTokenizer, create_memory_schema
+from benchmarks.tts_benchmark import REPLY
+from benchmarks.reporting import percentiles, cpu_seconds, current_rss_mb, peak_rss_mb, environment_metadata, write_report
+from collections import defaultdict
+from typing import Dict, List
+import argparse
+import tempfile
+import asyncio
+import time
+
+#latencias de cada sustituto; 'typical' se aproxima a Deepgram + LLM alojado + ElevenLabs
+PROFILES = {
+    'fast': {'speech_ms': 800, 'endpointing_ms': 200, 'classification_ms': 150, 'first_token_ms': 200,
+             'tokens_per_second': 80, 'first_audio_latency_ms': 150},
+    'typical': {'speech_ms': 1200, 'endpointing_ms': 400, 'classification_ms': 400, 'first_token_ms': 450,
+                'tokens_per_second': 40, 'first_audio_latency_ms': 250},
+    'slow': {'speech_ms': 1500, 'endpointing_ms': 600, 'classification_ms': 900, 'first_token_ms': 1200,
+             'tokens_per_second': 20, 'first_audio_latency_ms': 500}
+}
+
+USER_LINES = ['Hola, ¿como va el proyecto?',
+              'Me preocupa la entrega del viernes.',
+              '¿Puedes revisar el error del informe?',
+              'Vale, genial, gracias.']
+
+TRACE_FIELDS = ['end_of_speech', 'classification', 'personality', 'context_load',
+                'time_to_first_token', 'time_to_first_audio', 'perceived_first_audio', 'total']
+
+class TraceCollector:
+    #exportador en memoria para el TurnTracer
+    def __init__(self):
+        self.records: List[Dict] = []
+
+    def export(self, record: Dict) -> None:
+        self.records.append(record)
+
+    def close(self) -> None:
+        pass
+
+def build_script(profile: Dict, turns: int, interrupt_every: int) -> List[ScriptedUtterance]:
+    script = []
+    #el usuario corta la respuesta poco despues de que empiece a sonar
+    interrupt_after_ms = profile['classification_ms'] + profile['first_token_ms'] + profile['first_audio_latency_ms'] + 600
+    for turn in range(turns):
+        interrupting = interrupt_every and turn and turn % interrupt_every == 0
+        script.append(ScriptedUtterance(text= USER_LINES[turn % len(USER_LINES)],
+                                        speech_ms= profile['speech_ms'],
+                                        endpointing_ms= profile['endpointing_ms'],
+                                        interrupt_after_ms= interrupt_after_ms if interrupting else None))
+    script.append(ScriptedUtterance(text= 'Salir.', speech_ms= profile['speech_ms'], endpointing_ms= profile['endpointing_ms']))
+    return script
+
+async def _load_script(runtime: SessionRuntime, config: Dict, script: List[ScriptedUtterance]) -> None:
+    #la sesion la crea el primer nodo del grafo
+    while True:
+        try:
+            runtime.get(config).stt_manager.load_script(script)
+            return
+        except KeyError:
+            await asyncio.sleep(0.005)
+
+async def run_session(index: int, runtime: SessionRuntime, script: List[ScriptedUtterance]) -> Dict:
+    config = {'configurable': {'thread_id': f'bench-{index}'}, 'recursion_limit': 1000}
+    initial_state = {'user_prompt': '', 'interim_user_prompt': '', 'state_transcription': False, 'emotion': None, 'topic': None}
+    loader = asyncio.create_task(_load_script(runtime, config, script))
+    node_ms: Dict[str, List[float]] = defaultdict(list)
+    last = time.perf_counter()
+    #el grafo es secuencial: el tiempo entre actualizaciones es lo que tardo cada nodo
+    async for update in conversational_agent.graph.astream(initial_state, config, stream_mode= 'updates'):
+        now = time.perf_counter()
+        for node in update:
+            node_ms[node].append((now - last) * 1000)
+        last = now
+    await loader
+    return node_ms
+
+async def run_level(sessions: int, args: argparse.Namespace, profile: Dict, server: TTSStandInServer, workdir: str) -> Dict:
+    db_path = os.path.join(workdir, f'memory-{sessions}.sqlite')
+    create_memory_schema(db_path)
+    app_config = AppConfiguration(DB_PATH_CONTEXT_MEMORY= db_path,
+                                  TTS_PHRASE_CACHE_ENABLED= False,
+                                  TELEMETRY_EXPORT= 'none')
+    llm = StandInLLM(REPLY,
+                     first_token_ms= profile['first_token_ms'],
+                     tokens_per_second= profile['tokens_per_second'],
+                     classification_ms= profile['classification_ms'])
+    shared = SharedResources(app_config= app_config, llm_inference= llm, tokenizer= WhitespaceTokenizer())
+    collector = TraceCollector()
+    shared.tracer.exporters.append(collector)
+
+    tts_managers: List[TTSManager] = []
+
+    def audio_factory() -> AudioResources:
+        stt_manager = StandInSTTManager()
+        tts_manager = TTSManager(api_key= 'stand-in', voice_id= 'bench', base_url= server.base_url,
+                                 sink= NullSink(speed= args.sink_speed))
+        tts_managers.append(tts_manager)
+        stt_manager.add_barge_in_listener(tts_manager.barge_in)
+        return AudioResources(stt_manager= stt_manager, tts_manager= tts_manager)
+
+    runtime = SessionRuntime(audio_factory= audio_factory,
+                             memory_factory= shared.build_memory,
+                             personality_factory= shared.build_personality,
+                             max_sessions= sessions,
+                             audio_pool_size= sessions)
+    conversational_agent.configure_runtime(shared, runtime)
+    #el grafo lee la configuracion del modulo, no la de SharedResources
+    conversational_agent.app_config.BACKCHANNEL_ENABLED = args.backchannel
+    conversational_agent.app_config.BACKCHANNEL_DELAY_MS = args.backchannel_delay_ms
+
+    script = build_script(profile, args.turns, args.interrupt_every)
+    rss_start = current_rss_mb()
+    cpu_start = cpu_seconds()
+    started = time.perf_counter()
+    node_results = await asyncio.gather(*[run_session(index, runtime, script) for index in range(sessions)])
+    wall = time.perf_counter() - started
+    cpu = cpu_seconds() - cpu_start
+    rss_delta = current_rss_mb() - rss_start
+    backchannels = [tts_manager.tts_engine.backchannel_stats for tts_manager in tts_managers]
+    await runtime.close()
+    shared.close()
+
+    completed = [record for record in collector.records if not record['interrupted']]
+    interrupted = [record for record in collector.records if record['interrupted']]
+    nodes: Dict[str, List[float]] = defaultdict(list)
+    for node_ms in node_results:
+        for node, values in node_ms.items():
+            nodes[node] += values
+
+    return {
+        'sessions': sessions,
+        'turns': len(collector.records),
+        'interrupted_turns': len(interrupted),
+        'turn_latency_ms': {name: percentiles([record['ms'][name] for record in completed if name in record['ms']])
+                            for name in TRACE_FIELDS},
+        'backchannels': {
+            'played': sum(stats.played for stats in backchannels),
+            'cancelled': sum(stats.cancelled for stats in backchannels)
+        },
+        'interruption_reaction_ms': percentiles([record['ms']['interruption_reaction'] for record in interrupted
+                                                 if 'interruption_reaction' in record['ms']]),
+        #stt_node incluye el tiempo que el usuario habla
+        'nodes_ms': {node: percentiles(values) for node, values in sorted(nodes.items())},
+        'throughput': {
+            'wall_seconds': wall,
+            'turns_per_second': len(collector.records) / wall if wall else 0.0
+        },
+        'per_session': {
+            'cpu_seconds': cpu / sessions,
+            'rss_mb': rss_delta / sessions
+        }
+    }
+
+async def run_benchmark(args: argparse.Namespace) -> Dict:
+    profile = PROFILES[args.profile]
+    server = TTSStandInServer(first_audio_latency_ms= profile['first_audio_latency_ms'], audio_rate= args.audio_rate)
+    await server.start()
+    try:
+        with tempfile.TemporaryDirectory() as workdir:
+            levels = [await run_level(sessions, args, profile, server, workdir) for sessions in args.sessions]
+    finally:
+        await server.stop()
+
+    return {
+        'benchmark': 'conversation',
+        'meta': environment_metadata(profile= args.profile, latencies= profile, sessions= args.sessions,
+                                     turns= args.turns, interrupt_every= args.interrupt_every,
+                                     sink_speed= args.sink_speed, backchannel= args.backchannel,
+                                     backchannel_delay_ms= args.backchannel_delay_ms,
+                                     note= 'los sustitutos de STT, LLM y TTS corren en el mismo proceso'),
+        'results': {
+            'levels': levels,
+            'peak_rss_mb': peak_rss_mb()
+        }
+    }
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description= 'Benchmark de extremo a extremo del grafo conversacional con sustitutos locales')
+    parser.add_argument('--profile', choices= sorted(PROFILES), default= 'typical')
+    parser.add_argument('--sessions', type= int, nargs= '+', default= [1, 4, 16])
+    parser.add_argument('--turns', type= int, default= 6)
+    parser.add_argument('--interrupt-every', type= int, default= 3, help= 'El usuario interrumpe uno de cada N turnos (0 = nunca)')
+    parser.add_argument('--sink-speed', type= float, default= 1.0, help= '1.0 ritmo de dispositivo real, 0 sin espera')
+    parser.add_argument('--audio-rate', type= float, default= 4.0)
+    parser.add_argument('--backchannel', action= 'store_true', help= 'Acuse corto si la respuesta tarda en sonar')
+    parser.add_argument('--backchannel-delay-ms', type= float, default= 700.0)
+    parser.add_argument('--output', default= None)
+    return parser.parse_args()
+
+
+if __name__ == '__main__':
+    arguments = parse_args()
+    write_report(asyncio.run(run_benchmark(arguments)), arguments.output)
@@ -0,0 +1,175 @@
+from langgraph.graph import StateGraph, END
+from langgraph.checkpoint.memory import InMemorySaver
+from langgraph.checkpoint.serde.jsonplus import JsonPlusSerializer
+from AgentProject.core.humanizer.emotion_analisys import EmotionLabel
+from AgentProject.core.humanizer.personality_manager import ConversationTopic
+from benchmarks.reporting import percentiles, peak_rss_mb, environment_metadata, write_report
+from typing import Dict, List, Optional, TypedDict
+import argparse
+import asyncio
+import time
+
+#mismos nodos y aristas que el grafo conversacional, con nodos sin trabajo: solo queda el coste de LangGraph
+NODES = ['stt_node', 'emotion_and_topic_node', 'current_personality_blend_node', 'personality_prompt_node',
+         'load_dependencies_generation_node', 'generation_and_tts']
+
+USER_LINES = ['Hola, ¿como va el proyecto?', 'Me preocupa la entrega del viernes.',
+              '¿Puedes revisar el error del informe?', 'Vale, genial, gracias.']
+
+class FullState(TypedDict):
+    #estado anterior: prompts e historial completos en cada paso
+    user_prompt: str
+    interim_user_prompt: str
+    state_transcription: bool
+    emotion: Optional[EmotionLabel]
+    topic: Optional[ConversationTopic]
+    personality_prompt: str
+    system_prompt: str
+    conversation_history: List[Dict]
+
+class SlimState(TypedDict):
+    user_prompt: str
+    interim_user_prompt: str
+    state_transcription: bool
+    emotion: Optional[EmotionLabel]
+    topic: Optional[ConversationTopic]
+
+class SimulatedMemory:
+    #historial recortado por tokens como ConversationMemory.get_context, sin sqlite
+    def __init__(self, reply_words: int, max_context_tokens: int):
+        self.reply = ' '.join(['palabra'] * reply_words)
+        self.max_context_tokens = max_context_tokens
+        self.messages: List[Dict[str, str]] = []
+
+    def add_turn(self, user_prompt: str) -> None:
+        self.messages += [{'role': 'user', 'content': user_prompt}, {'role': 'assistant', 'content': self.reply}]
+
+    def get_context(self) -> List[Dict[str, str]]:
+        context, total = [], 0
+        for message in reversed(self.messages):
+            tokens = len(message['content'].split())
+            if total + tokens > self.max_context_tokens:
+                break
+            context.insert(0, message)
+            total += tokens
+        return context
+
+def build_graph(mode: str, turns: int, args: argparse.Namespace, checkpointer: Optional[InMemorySaver]):
+    memory = SimulatedMemory(args.reply_words, args.max_context_tokens)
+    personality_prompt = 'p' * args.personality_prompt_chars
+    system_prompt = 's' * args.system_prompt_chars
+    #con el estado reducido los prompts viven fuera del grafo, como en ConversationSession
+    store: Dict = {}
+    counter = {'turn': 0}
+
+    def stt(state):
+        counter['turn'] += 1
+        sentence = 'Salir.' if counter['turn'] > turns else USER_LINES[counter['turn'] % len(USER_LINES)]
+        if mode == 'full':
+            state['state_transcription'] = True
+            state['user_prompt'] = sentence
+            return state
+        return {'state_transcription': True, 'user_prompt': sentence}
+
+    def emotion_and_topic(state):
+        if mode == 'full':
+            state['emotion'], state['topic'] = EmotionLabel.NEUTRAL, ConversationTopic.PROFESSIONAL
+            return state
+        return {'emotion': EmotionLabel.NEUTRAL, 'topic': ConversationTopic.PROFESSIONAL}
+
+    def blend(state):
+        return state if mode == 'full' else {}
+
+    def prompt(state):
+        if mode == 'full':
+            state['personality_prompt'] = personality_prompt
+            return state
+        store['personality_prompt'] = personality_prompt
+        return {}
+
+    def load(state):
+        if mode == 'full':
+            state['system_prompt'] = system_prompt
+            state['conversation_history'] = memory.get_context()
+            return state
+        store['conversation_history'] = memory.get_context()
+        return {}
+
+    def generation(state):
+        memory.add_turn(state['user_prompt'])
+        return state if mode == 'full' else {}
+
+    def route(state) -> str:
+        return 'finish' if state['user_prompt'] == 'Salir.' else 'continue'
+
+    builder = StateGraph(FullState if mode == 'full' else SlimState)
+    for name, node in zip(NODES, [stt, emotion_and_topic, blend, prompt, load, generation]):
+        builder.add_node(name, node)
+    builder.set_entry_point('stt_node')
+    builder.add_conditional_edges('stt_node', route, {'finish': END, 'continue': 'emotion_and_topic_node'})
+    for current, following in zip(NODES[1:], NODES[2:] + ['stt_node']):
+        builder.add_edge(current, following)
+    return builder.compile(checkpointer= checkpointer)
+
+def initial_state(mode: str) -> Dict:
+    state = {'user_prompt': '', 'interim_user_prompt': '', 'state_transcription': False, 'emotion': None, 'topic': None}
+    if mode == 'full':
+        state.update({'personality_prompt': '', 'system_prompt': '', 'conversation_history': []})
+    return state
+
+async def run_once(mode: str, args: argparse.Namespace, checkpointed: bool) -> Dict:
+    checkpointer = InMemorySaver() if checkpointed else None
+    graph = build_graph(mode, args.turns, args, checkpointer)
+    config = {'configurable': {'thread_id': f'{mode}-bench'}, 'recursion_limit': 10 * len(NODES) * (args.turns + 1)}
+    steps = 0
+    started = time.perf_counter()
+    async for _ in graph.astream(initial_state(mode), config, stream_mode= 'updates'):
+        steps += 1
+    step_us = (time.perf_counter() - started) * 1e6 / steps
+
+    checkpoint_bytes: List[float] = []
+    if checkpointer is not None:
+        serde = JsonPlusSerializer()
+        for snapshot in checkpointer.list(config):
+            checkpoint_bytes.append(len(serde.dumps_typed(snapshot.checkpoint)[1]))
+    return {'steps': steps, 'step_us': step_us, 'checkpoint_bytes': checkpoint_bytes}
+
+async def run_mode(mode: str, args: argparse.Namespace) -> Dict:
+    plain = [await run_once(mode, args, checkpointed= False) for _ in range(args.runs)]
+    saved = [await run_once(mode, args, checkpointed= True) for _ in range(args.runs)]
+    return {
+        'steps_per_run': plain[0]['steps'],
+        'step_overhead_us': percentiles([run['step_us'] for run in plain]),
+        'step_overhead_checkpointed_us': percentiles([run['step_us'] for run in saved]),
+        #cada paso guarda un checkpoint: el ultimo refleja el historial acumulado
+        'checkpoint_bytes': percentiles([size for run in saved for size in run['checkpoint_bytes']]),
+        'checkpoint_bytes_total': sum(saved[0]['checkpoint_bytes'])
+    }
+
+async def run_benchmark(args: argparse.Namespace) -> Dict:
+    results = {mode: await run_mode(mode, args) for mode in ('full', 'slim')}
+    return {
+        'benchmark': 'graph_state',
+        'meta': environment_metadata(turns= args.turns, runs= args.runs, reply_words= args.reply_words,
+                                     max_context_tokens= args.max_context_tokens,
+                                     personality_prompt_chars= args.personality_prompt_chars,
+                                     system_prompt_chars= args.system_prompt_chars,
+                                     note= 'full es el estado anterior con prompts e historial; slim el actual'),
+        'results': dict(results, peak_rss_mb= peak_rss_mb())
+    }
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description= 'Coste por paso y tamaño de checkpoint del estado del grafo conversacional')
+    parser.add_argument('--turns', type= int, default= 30)
+    parser.add_argument('--runs', type= int, default= 5)
+    parser.add_argument('--reply-words', type= int, default= 60)
+    parser.add_argument('--max-context-tokens', type= int, default= 8000)
+    parser.add_argument('--personality-prompt-chars', type= int, default= 2500)
+    parser.add_argument('--system-prompt-chars', type= int, default= 600)
+    parser.add_argument('--output', default= None)
+    return parser.parse_args()
+
+
+if __name__ == '__main__':
+    arguments = parse_args()
+    write_report(asyncio.run(run_benchmark(arguments)), arguments.output)
@@ -0,0 +1,177 @@
+from AgentProject.core.rag.rag import RAGProcessor, build_underlying_embeddings
+from benchmarks.reporting import percentiles, current_rss_mb, peak_rss_mb, environment_metadata, write_report
+from benchmarks.stand_ins import HashingEmbeddings
+from langchain_core.documents import Document
+from langchain_core.embeddings import Embeddings
+from typing import List, Dict, Tuple
+import argparse
+import tempfile
+import random
+import time
+import os
+
+SYLLABLES = ['ka', 'lo', 'mi', 'ra', 'ten', 'vo', 'su', 'del', 'pa', 'ri', 'no', 'ze', 'qua', 'bi', 'lu', 'tor', 'an', 'es']
+
+def _make_word(rng: random.Random) -> str:
+    return ''.join(rng.choice(SYLLABLES) for _ in range(rng.randint(2, 4)))
+
+def build_synthetic_corpus(num_docs: int,
+                           num_queries: int,
+                           num_topics: int = 24,
+                           seed: int = 7) -> Tuple[List[Document], List[Tuple[str, str]]]:
+    rng = random.Random(seed)
+    topics = [[_make_word(rng) for _ in range(40)] for _ in range(num_topics)]
+    common = [_make_word(rng) for _ in range(200)]
+
+    documents = []
+    entities = []
+    for i in range(num_docs):
+        topic = rng.randrange(num_topics)
+        entity = f'{_make_word(rng)}{i}'
+        sentences = []
+        for _ in range(rng.randint(4, 8)):
+            words = rng.sample(topics[topic], 5) + rng.sample(common, 4)
+            rng.shuffle(words)
+            sentences.append(' '.join(words).capitalize() + '.')
+        for position in rng.sample(range(len(sentences)), 2):
+            sentences[position] = f'{entity.capitalize()} {sentences[position][0].lower()}{sentences[position][1:]}'
+
+        content = ' '.join(sentences)
+        documents.append(Document(page_content= content,
+                                  metadata= {'doc_id': f'doc-{i}', 'title': entity.capitalize(), 'topic': topic}))
+        entities.append((entity, topic))
+
+    queries = []
+    for _ in range(num_queries):
+        target = rng.randrange(num_docs)
+        entity, topic = entities[target]
+        query_words = [entity] + rng.sample(topics[topic], 3)
+        rng.shuffle(query_words)
+        queries.append((' '.join(query_words), f'doc-{target}'))
+    return documents, queries
+
+def _build_embeddings(backend: str, args: argparse.Namespace) -> Embeddings:
+    if backend == 'hashing':
+        return HashingEmbeddings(dimensions= args.dimensions, latency_ms= args.embedding_latency_ms)
+    return build_underlying_embeddings(provider= backend,
+                                       name_model= args.model,
+                                       hf_token= os.environ.get('HF_TOKEN', ''))
+
+def _processor(workdir: str, embeddings: Embeddings, top_k: int, score_threshold: float,
+               cache_max_entries: int) -> RAGProcessor:
+    return RAGProcessor(top_k= top_k,
+                        score_threshold= score_threshold,
+                        vector_db_path= os.path.join(workdir, 'chroma'),
+                        hf_token= '',
+                        provider= 'benchmark',
+                        db_path_cache= os.path.join(workdir, 'embedding_cache.db'),
+                        name_model= 'benchmark',
+                        cache_max_entries= cache_max_entries,
+                        underlying_embeddings= embeddings)
+
+def run_ingestion(processor: RAGProcessor, documents: List[Document], batch_size: int) -> Dict:
+    rss_before = current_rss_mb()
+    latencies = []
+    start = time.perf_counter()
+    for i in range(0, len(documents), batch_size):
+        batch_start = time.perf_counter()
+        processor.add_documents(documents[i:i + batch_size])
+        latencies.append((time.perf_counter() - batch_start) * 1000)
+    elapsed = time.perf_counter() - start
+
+    return {
+        'documents': len(documents),
+        'seconds': elapsed,
+        'docs_per_second': len(documents) / elapsed if elapsed else 0.0,
+        'batch_latency_ms': percentiles(latencies),
+        'rss_delta_mb': current_rss_mb() - rss_before
+    }
+
+def run_retrieval(processor: RAGProcessor, queries: List[Tuple[str, str]], top_k: int) -> Dict:
+    latencies = []
+    hits = 0
+    tokens_saved = []
+    start = time.perf_counter()
+    for query, expected_doc in queries:
+        query_start = time.perf_counter()
+        chunks = processor.retrieve_relevant_chucks(query)
+        latencies.append((time.perf_counter() - query_start) * 1000)
+
+        retrieved = [chunk['metadata'].get('doc_id') for chunk in chunks[:top_k]]
+        hits += expected_doc in retrieved
+        tokens_saved.append(processor.context_packer.pack(chunks).tokens_saved)
+    elapsed = time.perf_counter() - start
+
+    return {
+        'queries': len(queries),
+        'latency_ms': percentiles(latencies),
+        'queries_per_second': len(queries) / elapsed if elapsed else 0.0,
+        'recall_at_k': hits / len(queries) if queries else 0.0,
+        'context_tokens_saved_mean': sum(tokens_saved) / len(tokens_saved) if tokens_saved else 0.0
+    }
+
+def run_benchmark(args: argparse.Namespace) -> Dict:
+    documents, queries = build_synthetic_corpus(args.docs, args.queries, seed= args.seed)
+    results = []
+
+    for backend in args.backends:
+        with tempfile.TemporaryDirectory(prefix= 'rag_benchmark_') as workdir:
+            embeddings = _build_embeddings(backend, args)
+            ingest_processor = _processor(workdir, embeddings, max(args.top_k), 0.0, args.cache_max_entries)
+            ingestion = run_ingestion(ingest_processor, documents, args.ingest_batch_size)
+
+            for top_k in args.top_k:
+                for score_threshold in args.thresholds:
+                    processor = _processor(workdir, embeddings, top_k, score_threshold, args.cache_max_entries)
+                    cold = run_retrieval(processor, queries, top_k)
+                    warm = run_retrieval(processor, queries, top_k)
+                    cache_stats = processor.cache_stats()
+                    results.append({
+                        'backend': backend,
+                        'top_k': top_k,
+                        'score_threshold': score_threshold,
+                        'ingestion': ingestion,
+                        'retrieval': cold,
+                        'retrieval_cached': warm,
+                        'cache': {'hit_rate': cache_stats.hit_rate, 'entries': cache_stats.entries,
+                                  'size_bytes': cache_stats.size_bytes},
+                        'rss_mb': current_rss_mb()
+                    })
+
+            if hasattr(embeddings, 'close'):
+                embeddings.close()
+
+    return {
+        'benchmark': 'rag',
+        'meta': environment_metadata(seed= args.seed, docs= args.docs, queries= args.queries,
+                                     peak_rss_mb= peak_rss_mb()),
+        'results': results
+    }
+
+def parse_args() -> argparse.Namespace:
+    def int_list(value: str) -> List[int]:
+        return [int(item) for item in value.split(',')]
+
+    def float_list(value: str) -> List[float]:
+        return [float(item) for item in value.split(',')]
+
+    parser = argparse.ArgumentParser(description= 'Benchmark de ingesta y recuperacion del RAGProcessor')
+    parser.add_argument('--backends', type= lambda value: value.split(','), default= ['hashing'],
+                        help= 'hashing (sustituto local sin red), local (ONNX int8) o hf-inference')
+    parser.add_argument('--model', default= 'BAAI/bge-base-en-v1.5')
+    parser.add_argument('--docs', type= int, default= 2000)
+    parser.add_argument('--queries', type= int, default= 200)
+    parser.add_argument('--seed', type= int, default= 7)
+    parser.add_argument('--top-k', type= int_list, default= [3, 5, 10])
+    parser.add_argument('--thresholds', type= float_list, default= [0.0, 0.3, 0.5, 0.68])
+    parser.add_argument('--dimensions', type= int, default= 384)
+    parser.add_argument('--embedding-latency-ms', type= float, default= 0.0)
+    parser.add_argument('--ingest-batch-size', type= int, default= 64)
+    parser.add_argument('--cache-max-entries', type= int, default= 256)
+    parser.add_argument('--output', default= None, help= 'Ruta del JSON de salida (stdout si se omite)')
+    return parser.parse_args()
+
+
+if __name__ == '__main__':
+    arguments = parse_args()
+    write_report(run_benchmark(arguments), arguments.output)
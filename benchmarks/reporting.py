@@ -0,0 +1,73 @@
+from typing import List, Dict, Optional
+import subprocess
+import platform
+import resource
+import json
+import time
+import sys
+import os
+
+def percentiles(values: List[float]) -> Dict[str, float]:
+    if not values:
+        return {'count': 0, 'mean': 0.0, 'p50': 0.0, 'p95': 0.0, 'p99': 0.0, 'max': 0.0}
+
+    ordered = sorted(values)
+
+    def rank(q: float) -> float:
+        position = q * (len(ordered) - 1)
+        lower = int(position)
+        upper = min(lower + 1, len(ordered) - 1)
+        return ordered[lower] + (ordered[upper] - ordered[lower]) * (position - lower)
+
+    return {
+        'count': len(ordered),
+        'mean': sum(ordered) / len(ordered),
+        'p50': rank(0.50),
+        'p95': rank(0.95),
+        'p99': rank(0.99),
+        'max': ordered[-1]
+    }
+
+def peak_rss_mb() -> float:
+    #ru_maxrss viene en KB en Linux y en bytes en macOS
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / (1024 * 1024) if sys.platform == 'darwin' else peak / 1024
+
+def current_rss_mb() -> float:
+    try:
+        with open('/proc/self/statm') as file:
+            pages = int(file.read().split()[1])
+        return pages * os.sysconf('SC_PAGE_SIZE') / (1024 * 1024)
+    except (OSError, ValueError):
+        return peak_rss_mb()
+
+def cpu_seconds() -> float:
+    usage = resource.getrusage(resource.RUSAGE_SELF)
+    return usage.ru_utime + usage.ru_stime
+
+def git_commit() -> str:
+    try:
+        return subprocess.run(['git', 'rev-parse', 'HEAD'], capture_output= True, text= True,
+                              check= True).stdout.strip()
+    except Exception:
+        return 'unknown'
+
+def environment_metadata(**extra) -> Dict:
+    return {
+        'commit': git_commit(),
+        'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S%z'),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'cpu_count': os.cpu_count(),
+        **extra
+    }
+
+def write_report(report: Dict, output: Optional[str]) -> None:
+    content = json.dumps(report, indent= 2, ensure_ascii= False, default= str)
+    if not output:
+        print(content)
+        return
+    os.makedirs(os.path.dirname(output) or '.', exist_ok= True)
+    with open(output, 'w', encoding= 'utf-8') as file:
+        file.write(content)
+    print(f'Reporte escrito en {output}')
@@ -0,0 +1,141 @@
+from Agents.session_runtime import SessionRuntime, AudioResources, SessionLimitError, PERSONALITY_CONFIG_PATH
+from AgentProject.core.audio_orchestrator.tts_manager import TTSManager
+from AgentProject.core.audio_orchestrator.audio_sink import NullSink
+from AgentProject.core.humanizer.personality_manager import DinamicPersonalityManager
+from AgentProject.core.memory.memorie_context import ConversationMemory
+from benchmarks.tts_stand_in_server import TTSStandInServer
+from benchmarks.stand_ins import StandInLLM, StandInSTTManager, WhitespaceTokenizer, create_memory_schema
+from benchmarks.tts_benchmark import REPLY
+from benchmarks.reporting import percentiles, cpu_seconds, current_rss_mb, peak_rss_mb, environment_metadata, write_report
+from typing import Dict, List
+import argparse
+import tempfile
+import asyncio
+import yaml
+import time
+import os
+
+USER_TURNS = ['Hola, ¿como va el proyecto?', '¿Y la entrega del viernes?', 'Vale, gracias.']
+
+async def run_conversation(runtime: SessionRuntime, llm: StandInLLM, session_id: str, turns: int) -> Dict:
+    config = {'configurable': {'thread_id': session_id}}
+    started = time.perf_counter()
+    try:
+        session = await runtime.acquire(config)
+    except SessionLimitError:
+        return {'rejected': True}
+    acquire_ms = (time.perf_counter() - started) * 1000
+
+    turn_ms: List[float] = []
+    await session.tts_manager.start_listening()
+    for turn in range(turns):
+        stt_manager = session.stt_manager
+        stt_manager.say(USER_TURNS[turn % len(USER_TURNS)])
+        _, user_prompt = await stt_manager.next_transcription()
+        stt_manager.clear_interruption()
+
+        turn_start = time.perf_counter()
+        await asyncio.to_thread(session.memory.get_context)
+        reply = await session.tts_manager.tts_processing(llm.agenerate([]), stt_manager.interruption_flag,
+                                                         stt_manager.async_interruption())
+        await session.memory.add_menssage('user', user_prompt)
+        await session.memory.add_menssage('assistant', reply)
+        session.turns += 1
+        turn_ms.append((time.perf_counter() - turn_start) * 1000)
+
+    await runtime.release(config)
+    return {'rejected': False, 'acquire_ms': acquire_ms, 'turn_ms': turn_ms}
+
+async def run_level(sessions: int, args: argparse.Namespace, server: TTSStandInServer, workdir: str, personality_config: Dict) -> Dict:
+    db_path = os.path.join(workdir, f'memory-{sessions}.sqlite')
+    create_memory_schema(db_path)
+    tokenizer = WhitespaceTokenizer()
+
+    def audio_factory() -> AudioResources:
+        stt_manager = StandInSTTManager()
+        tts_manager = TTSManager(api_key= 'stand-in', voice_id= 'bench', base_url= server.base_url,
+                                 sink= NullSink(speed= args.sink_speed))
+        stt_manager.add_barge_in_listener(tts_manager.barge_in)
+        return AudioResources(stt_manager= stt_manager, tts_manager= tts_manager)
+
+    runtime = SessionRuntime(audio_factory= audio_factory,
+                             memory_factory= lambda session_id: ConversationMemory(db_path= db_path,
+                                                                                   max_context_tokens= 8000,
+                                                                                   session_id= session_id,
+                                                                                   tokenizer= tokenizer),
+                             personality_factory= lambda: DinamicPersonalityManager(gender= 'feminine', config= personality_config),
+                             max_sessions= args.max_sessions,
+                             idle_timeout_s= args.idle_timeout_s,
+                             audio_pool_size= args.audio_pool_size)
+    llm = StandInLLM(REPLY, first_token_ms= args.first_token_ms, tokens_per_second= args.tokens_per_second)
+
+    rss_start = current_rss_mb()
+    cpu_start = cpu_seconds()
+    started = time.perf_counter()
+    #a partir de la segunda ronda las sesiones reutilizan el audio que dejo la anterior en el pool
+    results = []
+    for _ in range(args.rounds):
+        results += await asyncio.gather(*[run_conversation(runtime, llm, f'bench-{sessions}-{index}', args.turns)
+                                          for index in range(sessions)])
+    wall = time.perf_counter() - started
+    cpu = cpu_seconds() - cpu_start
+    rss_delta = current_rss_mb() - rss_start
+    stats = runtime.stats()
+    await runtime.close()
+
+    accepted = [result for result in results if not result['rejected']]
+    turns = sum(len(result['turn_ms']) for result in accepted)
+    return {
+        'sessions': sessions,
+        'accepted': len(accepted),
+        'rejected': len(results) - len(accepted),
+        'acquire_ms': percentiles([result['acquire_ms'] for result in accepted]),
+        'turn_ms': percentiles([value for result in accepted for value in result['turn_ms']]),
+        'turns_per_second': turns / wall if wall else 0.0,
+        'cpu_seconds_per_session': cpu / max(1, len(accepted)),
+        'rss_mb_per_session': rss_delta / max(1, sessions),
+        'runtime': vars(stats)
+    }
+
+async def run_benchmark(args: argparse.Namespace) -> Dict:
+    with open(PERSONALITY_CONFIG_PATH, 'r', encoding='utf-8') as file:
+        personality_config = yaml.safe_load(file)
+    server = TTSStandInServer(first_audio_latency_ms= args.first_audio_latency_ms, audio_rate= args.audio_rate)
+    await server.start()
+    try:
+        with tempfile.TemporaryDirectory() as workdir:
+            levels = [await run_level(sessions, args, server, workdir, personality_config) for sessions in args.sessions]
+    finally:
+        await server.stop()
+
+    return {
+        'benchmark': 'sessions',
+        'meta': environment_metadata(sessions= args.sessions, turns= args.turns, rounds= args.rounds,
+                                     max_sessions= args.max_sessions, audio_pool_size= args.audio_pool_size,
+                                     sink_speed= args.sink_speed, first_token_ms= args.first_token_ms),
+        'results': {
+            'levels': levels,
+            'peak_rss_mb': peak_rss_mb()
+        }
+    }
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description= 'Escalado de SessionRuntime con STT, LLM y TTS locales')
+    parser.add_argument('--sessions', type= int, nargs= '+', default= [1, 4, 8, 16])
+    parser.add_argument('--turns', type= int, default= 3)
+    parser.add_argument('--rounds', type= int, default= 2)
+    parser.add_argument('--max-sessions', type= int, default= 8)
+    parser.add_argument('--idle-timeout-s', type= float, default= 900.0)
+    parser.add_argument('--audio-pool-size', type= int, default= 8)
+    parser.add_argument('--sink-speed', type= float, default= 0.0, help= '1.0 ritmo de dispositivo real, 0 sin espera')
+    parser.add_argument('--first-token-ms', type= float, default= 300.0)
+    parser.add_argument('--tokens-per-second', type= float, default= 40.0)
+    parser.add_argument('--first-audio-latency-ms', type= float, default= 250.0)
+    parser.add_argument('--audio-rate', type= float, default= 4.0)
+    parser.add_argument('--output', default= None)
+    return parser.parse_args()
+
+
+if __name__ == '__main__':
+    arguments = parse_args()
+    write_report(asyncio.run(run_benchmark(arguments)), arguments.output)
@@ -0,0 +1,212 @@
+from langchain_core.embeddings import Embeddings
+from dataclasses import dataclass
+from AgentProject.core.telemetry import tracing
+from typing import AsyncGenerator, Callable, Dict, List, Optional, Tuple
+import numpy as np
+import threading
+import asyncio
+import json
+import sqlite3
+import time
+import zlib
+import re
+
+class HashingEmbeddings(Embeddings):
+    def __init__(self, dimensions: int = 384, latency_ms: float = 0.0):
+        self.dimensions = dimensions
+        self.latency = latency_ms / 1000
+
+    def _embed(self, text: str) -> List[float]:
+        vector = np.zeros(self.dimensions, dtype= np.float32)
+        for token in re.findall(r'\w+', text.lower()):
+            digest = zlib.crc32(token.encode())
+            vector[digest % self.dimensions] += 1.0 if digest & 0x80000000 else -1.0
+        norm = np.linalg.norm(vector)
+        return (vector / norm if norm else vector).tolist()
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        if self.latency:
+            time.sleep(self.latency)
+        return [self._embed(text) for text in texts]
+
+    def embed_query(self, text: str) -> List[float]:
+        if self.latency:
+            time.sleep(self.latency)
+        return self._embed(text)
+
+class WhitespaceTokenizer:
+    #sustituye a tiktoken (que descarga su vocabulario) cuando solo importa el orden de magnitud
+    def encode(self, text: str) -> List[str]:
+        return text.split()
+
+def create_memory_schema(db_path: str) -> None:
+    conn = sqlite3.connect(db_path)
+    conn.executescript('''
+        CREATE TABLE IF NOT EXISTS sessions (
+            session_id TEXT PRIMARY KEY,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        );
+        CREATE TABLE IF NOT EXISTS messages (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            session_id TEXT NOT NULL,
+            role TEXT NOT NULL,
+            content TEXT NOT NULL,
+            tokens INTEGER,
+            message_timestamp TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        );
+    ''')
+    conn.commit()
+    conn.close()
+
+class StandInLLM:
+    #misma firma que TextGenerationInference.agenerate: una palabra por token tras la latencia inicial
+    EMOTION_WORDS = {'preocupa': 'anxious', 'genial': 'happy', 'harto': 'frustrated', 'triste': 'sad', 'no entiendo': 'confused'}
+    TOPIC_WORDS = {'proyecto': 'professional', 'entrega': 'professional', 'error': 'problem_solving',
+                   'familia': 'personal', 'solo': 'emotional_support'}
+
+    def __init__(self,
+                 reply: str,
+                 first_token_ms: float = 300.0,
+                 tokens_per_second: float = 40.0,
+                 classification_ms: float = 0.0):
+        self.reply = reply
+        self.first_token = first_token_ms / 1000
+        self.tokens_per_second = tokens_per_second
+        self.classification = classification_ms / 1000
+
+    @staticmethod
+    def _pick(text: str, words: Dict[str, str], default: str) -> str:
+        text = text.lower()
+        return next((label for word, label in words.items() if word in text), default)
+
+    def _classify(self, system_prompt: str, user_prompt: str) -> Optional[str]:
+        #responde con el JSON que esperan los parsers de emocion y topico
+        if 'primary_emotion' in system_prompt:
+            emotion = self._pick(user_prompt, self.EMOTION_WORDS, 'neutral')
+            return json.dumps({'primary_emotion': emotion, 'secondary_emotion': 'neutral', 'stacks': []})
+        if 'problem_solving' in system_prompt:
+            return json.dumps({'topic': self._pick(user_prompt, self.TOPIC_WORDS, 'casual')})
+        return None
+
+    async def agenerate(self, messages_prompt: List, tools: Optional[List[Dict]] = None) -> AsyncGenerator[str, None]:
+        if len(messages_prompt) == 2:
+            classification = self._classify(messages_prompt[0].content, messages_prompt[1].content)
+            if classification is not None:
+                await asyncio.sleep(self.classification)
+                yield classification
+                return
+
+        await asyncio.sleep(self.first_token)
+        for index, token in enumerate(re.findall(r'\S+\s*', self.reply)):
+            if index and self.tokens_per_second > 0:
+                await asyncio.sleep(1 / self.tokens_per_second)
+            tracing.mark('first_token')
+            yield token
+
+@dataclass
+class ScriptedUtterance:
+    text: str
+    speech_ms: float = 1200.0
+    endpointing_ms: float = 400.0
+    #si se indica, el usuario empieza a hablar ese tiempo despues de la transcripcion anterior aunque el agente siga hablando
+    interrupt_after_ms: Optional[float] = None
+
+class StandInSTTManager:
+    #interfaz de STTManager que usa el grafo; las transcripciones las inyecta el benchmark con say() o un guion
+    def __init__(self):
+        self.interruption_flag = threading.Event()
+        self.is_listening = False
+        self.barge_in_listeners: List[Callable[[float], None]] = []
+        self.last_speech_start_time = 0.0
+        self.last_end_of_speech_time: Optional[float] = None
+        self.last_turn_time: Optional[float] = None
+        self._transcripts: Optional[asyncio.Queue] = None
+        self._interruption: Optional[asyncio.Event] = None
+        self._script: List[ScriptedUtterance] = []
+        self._script_ready: Optional[asyncio.Event] = None
+        self._speaking: Optional[asyncio.Task] = None
+
+    def _bind(self) -> None:
+        if self._transcripts is None:
+            self._transcripts = asyncio.Queue()
+            self._interruption = asyncio.Event()
+            self._script_ready = asyncio.Event()
+
+    def load_script(self, utterances: List[ScriptedUtterance]) -> None:
+        self._bind()
+        self._script = list(utterances)
+        self._script_ready.set()
+
+    def say(self, text: str, is_final: bool = True, end_of_speech_time: Optional[float] = None) -> None:
+        #igual que STTManager: cualquier transcripcion levanta la bandera de interrupcion
+        self._bind()
+        if is_final:
+            self.last_turn_time = time.perf_counter()
+            self.last_end_of_speech_time = end_of_speech_time or self.last_turn_time
+        self._transcripts.put_nowait((is_final, text))
+        self.interruption_flag.set()
+        self._interruption.set()
+
+    def barge_in(self) -> None:
+        self._bind()
+        speech_start = time.perf_counter()
+        self.last_speech_start_time = speech_start
+        self.interruption_flag.set()
+        self._interruption.set()
+        for listener in self.barge_in_listeners:
+            listener(speech_start)
+
+    async def _speak(self, utterance: ScriptedUtterance, interrupting: bool = False) -> None:
+        if interrupting:
+            await asyncio.sleep(utterance.interrupt_after_ms / 1000)
+            self.barge_in()
+        await asyncio.sleep(utterance.speech_ms / 1000)
+        end_of_speech = time.perf_counter()
+        await asyncio.sleep(utterance.endpointing_ms / 1000)
+        self.say(utterance.text, end_of_speech_time= end_of_speech)
+
+    async def next_transcription(self) -> Tuple[bool, str]:
+        self._bind()
+        while self._transcripts.empty() and (self._speaking is None or self._speaking.done()):
+            #el siguiente enunciado del guion empieza cuando el grafo vuelve a escuchar
+            await self._script_ready.wait()
+            if not self._script:
+                self._script_ready.clear()
+                continue
+            await self._speak(self._script.pop(0))
+        item = await self._transcripts.get()
+        if self._script and self._script[0].interrupt_after_ms is not None:
+            self._speaking = asyncio.create_task(self._speak(self._script.pop(0), interrupting= True))
+        return item
+
+    def async_interruption(self) -> asyncio.Event:
+        self._bind()
+        return self._interruption
+
+    async def wait_for_interruption(self) -> None:
+        self._bind()
+        while not self.interruption_flag.is_set():
+            self._interruption.clear()
+            await self._interruption.wait()
+
+    def start_listening(self) -> None:
+        self.is_listening = True
+
+    def stop_listening(self) -> None:
+        self.is_listening = False
+
+    def shutdown(self) -> None:
+        self.is_listening = False
+
+    def add_barge_in_listener(self, listener: Callable[[float], None]) -> None:
+        self.barge_in_listeners.append(listener)
+
+    def check_interruption(self) -> bool:
+        return self.interruption_flag.is_set()
+
+    def clear_interruption(self) -> None:
+        self.interruption_flag.clear()
+
+    def clear_transcriptions(self) -> None:
+        while self._transcripts is not None and not self._transcripts.empty():
+            self._transcripts.get_nowait()
@@ -0,0 +1,153 @@
+from benchmarks.reporting import percentiles, peak_rss_mb, environment_metadata, write_report
+from collections import defaultdict
+from typing import Dict, List
+import subprocess
+import argparse
+import tempfile
+import asyncio
+import json
+import time
+import sys
+import os
+
+#AppConfiguration exige estas claves al importar el agente aunque aqui ningun servicio externo se use
+STAND_IN_ENV = {key: 'stand-in' for key in ('HF_TOKEN', 'ELEVELABS_TOKEN', 'DB_PATH_CONTEXT_MEMORY', 'DB_PATH_EMBEDDING_CACHE',
+                                            'DB_PATH_VECTO_RAG', 'DEEPGRAM_API_KEY', 'ASSEMBLYAI')}
+
+async def measure_child(args: argparse.Namespace) -> Dict:
+    #se ejecuta en un proceso nuevo: los modulos todavia no estan en sys.modules
+    started = time.perf_counter()
+    from Agents import conversational_agent
+    import_ms = (time.perf_counter() - started) * 1000
+
+    from Agents.session_runtime import SharedResources, SessionRuntime, AudioResources
+    from AgentProject.configuration.app_configuration.app_configuration import AppConfiguration
+    from AgentProject.core.audio_orchestrator.tts_manager import TTSManager
+    from AgentProject.core.audio_orchestrator.audio_sink import NullSink
+    from benchmarks.tts_stand_in_server import TTSStandInServer
+    from benchmarks.stand_ins import StandInLLM, StandInSTTManager, WhitespaceTokenizer
+    from benchmarks.tts_benchmark import REPLY
+
+    server = TTSStandInServer(first_audio_latency_ms= args.first_audio_latency_ms)
+    await server.start()
+    try:
+        with tempfile.TemporaryDirectory() as workdir:
+            app_config = AppConfiguration(DB_PATH_CONTEXT_MEMORY= os.path.join(workdir, 'memory.sqlite'),
+                                          TTS_PHRASE_CACHE_DIR= os.path.join(workdir, 'tts_cache'),
+                                          TELEMETRY_EXPORT= 'none')
+            shared = SharedResources(app_config= app_config,
+                                     llm_inference= StandInLLM(REPLY),
+                                     tokenizer= WhitespaceTokenizer() if args.tokenizer == 'stand-in' else None)
+
+            def audio_factory() -> AudioResources:
+                stt_manager = StandInSTTManager()
+                tts_manager = TTSManager(api_key= 'stand-in', voice_id= 'bench', base_url= server.base_url, sink= NullSink())
+                stt_manager.add_barge_in_listener(tts_manager.barge_in)
+                return AudioResources(stt_manager= stt_manager, tts_manager= tts_manager)
+
+            runtime = SessionRuntime(audio_factory= audio_factory,
+                                     memory_factory= shared.build_memory,
+                                     personality_factory= shared.build_personality,
+                                     audio_pool_size= max(1, args.warm_audio))
+            conversational_agent.configure_runtime(shared, runtime)
+            conversational_agent.app_config.SESSION_WARM_AUDIO = args.warm_audio
+
+            warm_up_started = time.perf_counter()
+            timings = await conversational_agent.warm_up() if args.warm_up else {}
+            warm_up_ms = (time.perf_counter() - warm_up_started) * 1000
+
+            #el primer turno paga lo que la precarga no dejo listo
+            acquire_started = time.perf_counter()
+            config = {'configurable': {'thread_id': 'startup'}}
+            await runtime.acquire(config)
+            await runtime.get(config).tts_manager.start_listening()
+            first_session_ms = (time.perf_counter() - acquire_started) * 1000
+
+            await runtime.close()
+            shared.close()
+    finally:
+        await server.stop()
+
+    return {
+        'import_ms': import_ms,
+        'warm_up_ms': warm_up_ms,
+        'warm_up_steps_ms': timings,
+        'first_session_ms': first_session_ms,
+        'time_to_ready_ms': import_ms + warm_up_ms + first_session_ms,
+        'peak_rss_mb': peak_rss_mb()
+    }
+
+def parse_import_times(stderr: str, top: int) -> List[Dict]:
+    #salida de -X importtime: "import time: self [us] | cumulative | imported package"
+    packages = []
+    for line in stderr.splitlines():
+        if not line.startswith('import time:') or 'self [us]' in line:
+            continue
+        _, cumulative, name = line[len('import time:'):].split('|')
+        if name.startswith('  '):
+            continue
+        packages.append({'package': name.strip(), 'cumulative_ms': int(cumulative) / 1000})
+    return sorted(packages, key= lambda package: package['cumulative_ms'], reverse= True)[:top]
+
+def run_child(args: argparse.Namespace, warm_up: bool) -> Dict:
+    command = [sys.executable, '-X', 'importtime', '-m', 'benchmarks.startup_benchmark', '--child',
+               '--tokenizer', args.tokenizer, '--warm-audio', str(args.warm_audio),
+               '--first-audio-latency-ms', str(args.first_audio_latency_ms)]
+    if not warm_up:
+        command.append('--no-warm-up')
+    started = time.perf_counter()
+    completed = subprocess.run(command, capture_output= True, text= True, env= {**STAND_IN_ENV, **os.environ}, check= True)
+    result = json.loads(completed.stdout.strip().splitlines()[-1])
+    #incluye el arranque del interprete, que el proceso hijo no puede medir
+    result['process_ms'] = (time.perf_counter() - started) * 1000
+    result['imports'] = parse_import_times(completed.stderr, args.top_imports)
+    return result
+
+def summarize(runs: List[Dict]) -> Dict:
+    steps: Dict[str, List[float]] = defaultdict(list)
+    for run in runs:
+        for name, value in run['warm_up_steps_ms'].items():
+            steps[name].append(value)
+    return {
+        'runs': len(runs),
+        'process_ms': percentiles([run['process_ms'] for run in runs]),
+        'import_ms': percentiles([run['import_ms'] for run in runs]),
+        'warm_up_ms': percentiles([run['warm_up_ms'] for run in runs]),
+        'warm_up_steps_ms': {name: percentiles(values) for name, values in sorted(steps.items())},
+        'first_session_ms': percentiles([run['first_session_ms'] for run in runs]),
+        'time_to_ready_ms': percentiles([run['time_to_ready_ms'] for run in runs]),
+        'peak_rss_mb': max(run['peak_rss_mb'] for run in runs),
+        #el primer proceso es el que tiene los tiempos de importacion menos afectados por la cache de disco
+        'top_imports': runs[0]['imports']
+    }
+
+def run_benchmark(args: argparse.Namespace) -> Dict:
+    modes = {'warm_up': True, 'lazy': False}
+    return {
+        'benchmark': 'startup',
+        'meta': environment_metadata(runs= args.runs, tokenizer= args.tokenizer, warm_audio= args.warm_audio,
+                                     first_audio_latency_ms= args.first_audio_latency_ms,
+                                     note= 'cada ejecucion es un proceso nuevo; LLM, STT y TTS son sustitutos locales'),
+        'results': {mode: summarize([run_child(args, warm_up) for _ in range(args.runs)]) for mode, warm_up in modes.items()}
+    }
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description= 'Tiempo de importacion y de arranque del agente conversacional')
+    parser.add_argument('--runs', type= int, default= 5)
+    parser.add_argument('--tokenizer', choices= ['stand-in', 'tiktoken'], default= 'stand-in',
+                        help= 'tiktoken descarga la codificacion la primera vez')
+    parser.add_argument('--warm-audio', type= int, default= 1)
+    parser.add_argument('--first-audio-latency-ms', type= float, default= 250.0)
+    parser.add_argument('--top-imports', type= int, default= 15)
+    parser.add_argument('--no-warm-up', dest= 'warm_up', action= 'store_false')
+    parser.add_argument('--child', action= 'store_true', help= argparse.SUPPRESS)
+    parser.add_argument('--output', default= None)
+    return parser.parse_args()
+
+
+if __name__ == '__main__':
+    arguments = parse_args()
+    if arguments.child:
+        print(json.dumps(asyncio.run(measure_child(arguments))))
+    else:
+        write_report(run_benchmark(arguments), arguments.output)
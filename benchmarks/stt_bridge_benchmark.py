@@ -0,0 +1,124 @@
+from AgentProject.core.audio_orchestrator.audio_ring_buffer import PCMRingBuffer
+from AgentProject.core.audio_orchestrator.audio_bridge import AsyncAudioBridge
+from benchmarks.reporting import percentiles, cpu_seconds, environment_metadata, write_report
+from typing import Dict, List
+import numpy as np
+import threading
+import argparse
+import asyncio
+import queue
+import time
+
+def _producer(frames: int, block: np.ndarray, block_seconds: float, paced: bool,
+              push, push_costs: List[float], finish) -> threading.Thread:
+    def run():
+        deadline = time.perf_counter()
+        for _ in range(frames):
+            if paced:
+                deadline += block_seconds
+                remaining = deadline - time.perf_counter()
+                if remaining > 0:
+                    time.sleep(remaining)
+            start = time.perf_counter()
+            push(start)
+            push_costs.append((time.perf_counter() - start) * 1e6)
+        finish()
+
+    thread = threading.Thread(target= run, daemon= True)
+    thread.start()
+    return thread
+
+async def _send(payload: bytes, send_ms: float) -> None:
+    await asyncio.sleep(send_ms / 1000)
+
+async def run_executor_polling(frames: int, block: np.ndarray, block_seconds: float, paced: bool,
+                               send_ms: float) -> Dict:
+    #ruta anterior: queue.Queue + run_in_executor(get, True, 0.1) por bloque
+    audio_queue = queue.Queue()
+    loop = asyncio.get_running_loop()
+    push_costs, latencies = [], []
+    sends = 0
+
+    def push(captured: float):
+        audio_queue.put((captured, (block * 32767).astype(np.int16).tobytes()))
+
+    cpu_start = cpu_seconds()
+    thread = _producer(frames, block, block_seconds, paced, push, push_costs, lambda: audio_queue.put(None))
+    while True:
+        try:
+            item = await loop.run_in_executor(None, audio_queue.get, True, 0.1)
+        except queue.Empty:
+            continue
+        if item is None:
+            break
+        captured, payload = item
+        await _send(payload, send_ms)
+        latencies.append((time.perf_counter() - captured) * 1000)
+        sends += 1
+    thread.join()
+
+    return _summary(frames, sends, push_costs, latencies, cpu_seconds() - cpu_start)
+
+async def run_async_bridge(frames: int, block: np.ndarray, block_seconds: float, paced: bool,
+                           send_ms: float) -> Dict:
+    bridge = AsyncAudioBridge(PCMRingBuffer(capacity_samples= block.size * 100))
+    bridge.bind(asyncio.get_running_loop())
+    push_costs, latencies = [], []
+    sends = 0
+
+    cpu_start = cpu_seconds()
+    thread = _producer(frames, block, block_seconds, paced, lambda _: bridge.push(block), push_costs, bridge.close)
+    closed = False
+    while not closed:
+        samples, closed = await bridge.drain(timeout= 1.0)
+        if samples:
+            await _send(bridge.out[:samples].tobytes(), send_ms)
+            latencies.append((time.perf_counter() - bridge.oldest_capture_time) * 1000)
+            sends += 1
+    thread.join()
+
+    return _summary(frames, sends, push_costs, latencies, cpu_seconds() - cpu_start)
+
+def _summary(frames: int, sends: int, push_costs: List[float], latencies: List[float], cpu: float) -> Dict:
+    return {
+        'frames': frames,
+        'sends': sends,
+        'frames_per_send': frames / sends if sends else 0.0,
+        'push_cost_us': percentiles(push_costs),
+        'capture_to_send_ms': percentiles(latencies),
+        'cpu_us_per_frame': cpu / frames * 1e6 if frames else 0.0
+    }
+
+async def run_benchmark(args: argparse.Namespace) -> Dict:
+    block_samples = int(args.sample_rate * args.block_ms / 1000)
+    block = (np.random.default_rng(0).standard_normal((block_samples, 1)) * 0.1).astype(np.float32)
+    block_seconds = args.block_ms / 1000
+    frames = int(args.seconds / block_seconds)
+
+    results = {}
+    for mode, paced in (('realtime', True), ('burst', False)):
+        results[mode] = {
+            'executor_polling': await run_executor_polling(frames, block, block_seconds, paced, args.send_ms),
+            'async_bridge': await run_async_bridge(frames, block, block_seconds, paced, args.send_ms)
+        }
+
+    return {
+        'benchmark': 'stt_bridge',
+        'meta': environment_metadata(block_ms= args.block_ms, sample_rate= args.sample_rate,
+                                     seconds= args.seconds, send_ms= args.send_ms),
+        'results': results
+    }
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description= 'Micro-benchmark del puente de audio captura -> envio')
+    parser.add_argument('--block-ms', type= float, default= 20.0)
+    parser.add_argument('--sample-rate', type= int, default= 16000)
+    parser.add_argument('--seconds', type= float, default= 10.0)
+    parser.add_argument('--send-ms', type= float, default= 0.0, help= 'Tiempo simulado de cada envio al websocket')
+    parser.add_argument('--output', default= None)
+    return parser.parse_args()
+
+
+if __name__ == '__main__':
+    arguments = parse_args()
+    write_report(asyncio.run(run_benchmark(arguments)), arguments.output)
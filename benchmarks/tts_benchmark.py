@@ -0,0 +1,147 @@
+from AgentProject.core.audio_orchestrator.tts_manager import TTSManager
+from AgentProject.core.audio_orchestrator.audio_sink import NullSink
+from benchmarks.tts_stand_in_server import TTSStandInServer
+from benchmarks.reporting import percentiles, cpu_seconds, peak_rss_mb, environment_metadata, write_report
+from typing import AsyncGenerator, Dict, List
+import threading
+import argparse
+import asyncio
+import time
+import re
+
+REPLY = ('Claro, te cuento. El proyecto avanza bien y la entrega sigue prevista para el viernes. '
+         'Si quieres, reviso contigo los pendientes antes de la reunion. ¿Te sirve así?')
+
+async def _token_stream(text: str, tokens_per_second: float) -> AsyncGenerator[str, None]:
+    #imita el streaming del LLM: una palabra por token
+    for token in re.findall(r'\S+\s*', text):
+        if tokens_per_second > 0:
+            await asyncio.sleep(1 / tokens_per_second)
+        yield token
+
+async def _wait_for_audio(sink: NullSink, since: float, timeout: float = 10.0) -> bool:
+    deadline = time.perf_counter() + timeout
+    while time.perf_counter() < deadline:
+        if sink.first_write_after(since) is not None:
+            return True
+        await asyncio.sleep(0.005)
+    return False
+
+async def run_session(index: int, args: argparse.Namespace, server: TTSStandInServer) -> Dict:
+    sink = NullSink(speed= args.sink_speed)
+    manager = TTSManager(api_key= 'stand-in', voice_id= f'bench-{index}', base_url= server.base_url, sink= sink)
+    await manager.start_listening()
+    engine = manager.tts_engine
+    interrupt_event = threading.Event()
+    interruption = asyncio.Event()
+    interruptions: List[Dict] = []
+
+    for turn in range(args.turns):
+        interrupt_event.clear()
+        turn_start = time.perf_counter()
+        task = asyncio.create_task(manager.tts_processing(_token_stream(REPLY, args.tokens_per_second), interrupt_event, interruption))
+
+        if args.interrupt_every and (turn + 1) % args.interrupt_every == 0:
+            if await _wait_for_audio(sink, turn_start):
+                await asyncio.sleep(args.interrupt_after_ms / 1000)
+                #mismo orden que STTManager: primero la bandera y despues el oyente de barge-in
+                speech_start = time.perf_counter()
+                interrupt_event.set()
+                interruption.set()
+                manager.barge_in(speech_start)
+                await task
+                await asyncio.sleep(0.2)
+                writes_after = [write_time for write_time, _ in sink.writes if write_time > speech_start]
+                interruptions.append({
+                    'audio_stop_ms': (writes_after[-1] - speech_start) * 1000 if writes_after else 0.0,
+                    'bytes_after_interrupt': sink.bytes_after(speech_start)
+                })
+        await task
+
+    await manager.stop_listening()
+    metrics = [m for m in engine.turn_metrics if not m.interrupted]
+    return {
+        'ttfa_ms': [m.time_to_first_audio_ms for m in metrics if m.first_audio_time],
+        'overlap_ms': [m.overlap_ms for m in metrics],
+        'turn_ms': [(m.end_time - m.start_time) * 1000 for m in metrics],
+        'turn_start_overhead_ms': list(engine.connection_stats().turn_start_overhead_ms),
+        'flush_ms': list(engine.barge_in_stats.flush_ms),
+        'cancel_ms': list(engine.barge_in_stats.cancel_ms),
+        'interruptions': interruptions,
+        'audio_seconds': sink.bytes_written / (2 * sink.sample_rate),
+        'underruns': engine.playback_stats().underruns,
+        'output_format': engine.output_format,
+        'chunk_schedule': engine.chunk_schedule.schedule()
+    }
+
+async def run_benchmark(args: argparse.Namespace) -> Dict:
+    server = TTSStandInServer(first_audio_latency_ms= args.first_audio_latency_ms,
+                              chunk_latency_ms= args.chunk_latency_ms,
+                              audio_rate= args.audio_rate,
+                              seconds_per_char= args.seconds_per_char)
+    await server.start()
+    cpu_start = cpu_seconds()
+    started = time.perf_counter()
+    try:
+        sessions = await asyncio.gather(*[run_session(index, args, server) for index in range(args.sessions)])
+    finally:
+        await server.stop()
+    wall = time.perf_counter() - started
+
+    def merged(key: str) -> List:
+        return [value for session in sessions for value in session[key]]
+
+    interruptions = merged('interruptions')
+    audio_seconds = sum(session['audio_seconds'] for session in sessions)
+    return {
+        'benchmark': 'tts',
+        'meta': environment_metadata(sessions= args.sessions, turns= args.turns, sink_speed= args.sink_speed,
+                                     tokens_per_second= args.tokens_per_second,
+                                     first_audio_latency_ms= args.first_audio_latency_ms,
+                                     audio_rate= args.audio_rate),
+        'results': {
+            'time_to_first_audio_ms': percentiles(merged('ttfa_ms')),
+            'overlap_ms': percentiles(merged('overlap_ms')),
+            'turn_ms': percentiles(merged('turn_ms')),
+            'turn_start_overhead_ms': percentiles(merged('turn_start_overhead_ms')),
+            'throughput': {
+                'wall_seconds': wall,
+                'turns_per_second': args.sessions * args.turns / wall,
+                'audio_seconds': audio_seconds,
+                'audio_seconds_per_second': audio_seconds / wall,
+                'cpu_seconds': cpu_seconds() - cpu_start,
+                'peak_rss_mb': peak_rss_mb()
+            },
+            'interruption': {
+                'count': len(interruptions),
+                'flush_ms': percentiles(merged('flush_ms')),
+                'cancel_ms': percentiles(merged('cancel_ms')),
+                'audio_stop_ms': percentiles([item['audio_stop_ms'] for item in interruptions]),
+                'bytes_after_interrupt': percentiles([item['bytes_after_interrupt'] for item in interruptions])
+            },
+            'underruns': sum(session['underruns'] for session in sessions),
+            'output_format': sessions[0]['output_format'],
+            'chunk_schedules': [session['chunk_schedule'] for session in sessions],
+            'server': vars(server.stats)
+        }
+    }
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description= 'Benchmark del TTS contra el servidor local sin red')
+    parser.add_argument('--sessions', type= int, default= 1)
+    parser.add_argument('--turns', type= int, default= 10)
+    parser.add_argument('--tokens-per-second', type= float, default= 40.0)
+    parser.add_argument('--sink-speed', type= float, default= 1.0, help= '1.0 ritmo de dispositivo real, 0 sin espera')
+    parser.add_argument('--interrupt-every', type= int, default= 3, help= 'Interrumpe uno de cada N turnos (0 = nunca)')
+    parser.add_argument('--interrupt-after-ms', type= float, default= 300.0)
+    parser.add_argument('--first-audio-latency-ms', type= float, default= 250.0)
+    parser.add_argument('--chunk-latency-ms', type= float, default= 40.0)
+    parser.add_argument('--audio-rate', type= float, default= 4.0)
+    parser.add_argument('--seconds-per-char', type= float, default= 0.06)
+    parser.add_argument('--output', default= None)
+    return parser.parse_args()
+
+
+if __name__ == '__main__':
+    arguments = parse_args()
+    write_report(asyncio.run(run_benchmark(arguments)), arguments.output)
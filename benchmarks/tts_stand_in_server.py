@@ -0,0 +1,200 @@
+from websockets.asyncio.server import serve, ServerConnection
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional
+from urllib.parse import urlparse, parse_qs
+import numpy as np
+import argparse
+import asyncio
+import base64
+import json
+
+DEFAULT_SCHEDULE = [120, 160, 250, 290]
+FINAL = object()
+
+@dataclass
+class StandInStats:
+    connections: int = 0
+    contexts_opened: int = 0
+    contexts_closed_early: int = 0
+    segments: int = 0
+    audio_seconds: float = 0.0
+
+@dataclass
+class _Context:
+    context_id: Optional[str]
+    schedule: List[int]
+    segments: asyncio.Queue = field(default_factory= asyncio.Queue)
+    pending_text: str = ''
+    schedule_index: int = 0
+    finished: bool = False
+    worker: Optional[asyncio.Task] = None
+
+class TTSStandInServer:
+    #servidor local con el protocolo stream-input / multi-stream-input de elevenlabs y audio sintetico
+    def __init__(self,
+                 host: str = '127.0.0.1',
+                 port: int = 0,
+                 first_audio_latency_ms: float = 250.0,
+                 chunk_latency_ms: float = 40.0,
+                 audio_rate: float = 4.0,
+                 seconds_per_char: float = 0.06,
+                 message_ms: float = 100.0):
+
+        self.host = host
+        self.port = port
+        self.first_audio_latency = first_audio_latency_ms / 1000
+        self.chunk_latency = chunk_latency_ms / 1000
+        self.audio_rate = audio_rate
+        self.seconds_per_char = seconds_per_char
+        self.message_seconds = message_ms / 1000
+        self.stats = StandInStats()
+        self._server = None
+        self._tones: Dict[int, bytes] = {}
+
+    @property
+    def base_url(self) -> str:
+        return f'ws://{self.host}:{self.port}'
+
+    def _tone(self, sample_rate: int) -> bytes:
+        #un segundo de tono modulado; se recorre de forma circular
+        if sample_rate not in self._tones:
+            t = np.arange(sample_rate) / sample_rate
+            signal = 0.2 * np.sin(2 * np.pi * 220 * t) * (0.6 + 0.4 * np.sin(2 * np.pi * 3 * t))
+            self._tones[sample_rate] = (signal * 32767).astype('<i2').tobytes()
+        return self._tones[sample_rate]
+
+    async def start(self) -> None:
+        self._server = await serve(self._handle, self.host, self.port)
+        self.port = self._server.sockets[0].getsockname()[1]
+
+    async def stop(self) -> None:
+        if self._server:
+            self._server.close()
+            await self._server.wait_closed()
+            self._server = None
+
+    async def _send(self, connection: ServerConnection, context: _Context, message: Dict) -> None:
+        if context.context_id is not None:
+            message['contextId'] = context.context_id
+        await connection.send(json.dumps(message))
+
+    async def _synthesize(self, connection: ServerConnection, context: _Context, sample_rate: int) -> None:
+        tone = self._tone(sample_rate)
+        message_bytes = int(sample_rate * self.message_seconds) * 2
+        first = True
+        while True:
+            segment = await context.segments.get()
+            if segment is FINAL:
+                await self._send(connection, context, {'isFinal': True})
+                context.finished = True
+                return
+
+            await asyncio.sleep(self.first_audio_latency if first else self.chunk_latency)
+            first = False
+            self.stats.segments += 1
+            total_bytes = int(len(segment) * self.seconds_per_char * sample_rate) * 2
+            offset = 0
+            while offset < total_bytes:
+                size = min(message_bytes, total_bytes - offset)
+                start = offset % len(tone)
+                chunk = (tone[start:start + size] if start + size <= len(tone)
+                         else tone[start:] + tone[:start + size - len(tone)])
+                await self._send(connection, context, {'audio': base64.b64encode(chunk).decode('ascii'), 'isFinal': None})
+                offset += size
+                self.stats.audio_seconds += size / (2 * sample_rate)
+                #audio_rate = segundos de audio generados por segundo real
+                await asyncio.sleep(size / (2 * sample_rate) / self.audio_rate)
+
+    def _enqueue_text(self, context: _Context, text: str) -> None:
+        context.pending_text += text
+        threshold = context.schedule[min(context.schedule_index, len(context.schedule) - 1)]
+        if len(context.pending_text) >= threshold:
+            context.segments.put_nowait(context.pending_text)
+            context.pending_text = ''
+            context.schedule_index += 1
+
+    def _flush(self, context: _Context, final: bool) -> None:
+        if context.pending_text.strip():
+            context.segments.put_nowait(context.pending_text)
+        context.pending_text = ''
+        if final:
+            context.segments.put_nowait(FINAL)
+
+    async def _handle(self, connection: ServerConnection) -> None:
+        self.stats.connections += 1
+        url = urlparse(connection.request.path)
+        query = parse_qs(url.query)
+        output_format = query.get('output_format', ['pcm_24000'])[0]
+        sample_rate = int(output_format.split('_')[1]) if output_format.startswith('pcm_') else 24000
+        multi_context = url.path.endswith('multi-stream-input')
+        contexts: Dict[Optional[str], _Context] = {}
+
+        def open_context(context_id: Optional[str], data: Dict) -> _Context:
+            schedule = data.get('generation_config', {}).get('chunk_length_schedule') or DEFAULT_SCHEDULE
+            context = _Context(context_id= context_id, schedule= schedule)
+            context.worker = asyncio.create_task(self._synthesize(connection, context, sample_rate))
+            contexts[context_id] = context
+            self.stats.contexts_opened += 1
+            return context
+
+        try:
+            async for message in connection:
+                data = json.loads(message)
+                if data.get('close_socket'):
+                    break
+                context_id = data.get('context_id') if multi_context else None
+                context = contexts.get(context_id)
+
+                if data.get('close_context'):
+                    if context:
+                        if not context.finished:
+                            self.stats.contexts_closed_early += 1
+                        context.worker.cancel()
+                        contexts.pop(context_id, None)
+                    continue
+                if context is None:
+                    context = open_context(context_id, data)
+
+                text = data.get('text')
+                if data.get('flush'):
+                    if text:
+                        context.pending_text += text
+                    self._flush(context, final= multi_context)
+                elif text == '' and not multi_context:
+                    #en stream-input el texto vacio cierra la generacion
+                    self._flush(context, final= True)
+                elif text and text.strip():
+                    self._enqueue_text(context, text)
+        finally:
+            for context in contexts.values():
+                context.worker.cancel()
+
+async def _serve_forever(args: argparse.Namespace) -> None:
+    server = TTSStandInServer(host= args.host, port= args.port,
+                              first_audio_latency_ms= args.first_audio_latency_ms,
+                              chunk_latency_ms= args.chunk_latency_ms,
+                              audio_rate= args.audio_rate,
+                              seconds_per_char= args.seconds_per_char)
+    await server.start()
+    print(f'Servidor TTS local en {server.base_url}')
+    try:
+        await asyncio.Future()
+    finally:
+        await server.stop()
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description= 'Sustituto local del websocket de TTS de elevenlabs')
+    parser.add_argument('--host', default= '127.0.0.1')
+    parser.add_argument('--port', type= int, default= 8765)
+    parser.add_argument('--first-audio-latency-ms', type= float, default= 250.0)
+    parser.add_argument('--chunk-latency-ms', type= float, default= 40.0)
+    parser.add_argument('--audio-rate', type= float, default= 4.0, help= 'Segundos de audio generados por segundo real')
+    parser.add_argument('--seconds-per-char', type= float, default= 0.06)
+    return parser.parse_args()
+
+
+if __name__ == '__main__':
+    try:
+        asyncio.run(_serve_forever(parse_args()))
+    except KeyboardInterrupt:
+        pass
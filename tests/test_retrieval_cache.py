@@ -0,0 +1,26 @@
+from AgentProject.core.rag.retrieval_cache import RetrievalCache
+import unittest
+
+CHUNKS = [{'content': 'El informe se entrega el viernes.', 'metadata': {'source': 'plan.md'}}]
+
+class RetrievalCacheTest(unittest.TestCase):
+    def test_put_from_before_an_ingest_is_not_cached(self):
+        cache = RetrievalCache()
+        #la busqueda empieza, entra una ingesta y despues llega su resultado
+        generation = cache.generation
+        cache.advance_generation()
+        cache.put('¿Cuando se entrega?', 5, 0.3, CHUNKS, generation)
+
+        self.assertIsNone(cache.get('¿Cuando se entrega?', 5, 0.3))
+        self.assertEqual(cache.stats().entries, 0)
+
+    def test_put_with_current_generation_is_cached(self):
+        cache = RetrievalCache()
+        cache.advance_generation()
+        cache.put('¿Cuando se entrega?', 5, 0.3, CHUNKS, cache.generation)
+
+        self.assertEqual(cache.get('cuando se entrega', 5, 0.3), CHUNKS)
+
+
+if __name__ == '__main__':
+    unittest.main()
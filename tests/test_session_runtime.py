@@ -0,0 +1,62 @@
+from Agents.session_runtime import SessionRuntime
+import unittest
+import asyncio
+
+class FakeAudio:
+    def __init__(self):
+        self.closed = False
+        self.parked = False
+
+    def park(self) -> None:
+        self.parked = True
+
+    async def close(self) -> None:
+        self.closed = True
+
+class FakeMemory:
+    def close(self) -> None:
+        pass
+
+class SessionEvictionTest(unittest.IsolatedAsyncioTestCase):
+    def build_runtime(self) -> SessionRuntime:
+        return SessionRuntime(audio_factory= FakeAudio,
+                              memory_factory= lambda session_id: FakeMemory(),
+                              personality_factory= lambda: None,
+                              idle_timeout_s= 0.05)
+
+    async def test_waiting_session_is_not_evicted(self):
+        runtime = self.build_runtime()
+        config = {'configurable': {'thread_id': 'quiet-user'}}
+        session = await runtime.acquire(config)
+        transcript = asyncio.Event()
+
+        async def stt_node():
+            #como stt_streaming: el nodo espera al usuario dentro de session.waiting()
+            with session.waiting():
+                await transcript.wait()
+
+        node = asyncio.create_task(stt_node())
+        await asyncio.sleep(0.1)
+        self.assertEqual(await runtime.evict_idle(), 0)
+        self.assertFalse(session.audio.closed)
+
+        transcript.set()
+        await node
+        self.assertIs(runtime.get(config), session)
+
+    async def test_idle_session_is_evicted_after_the_wait_ends(self):
+        runtime = self.build_runtime()
+        config = {'configurable': {'thread_id': 'gone-user'}}
+        session = await runtime.acquire(config)
+        with session.waiting():
+            await asyncio.sleep(0.01)
+
+        await asyncio.sleep(0.1)
+        self.assertEqual(await runtime.evict_idle(), 1)
+        self.assertTrue(session.audio.closed)
+        with self.assertRaises(KeyError):
+            runtime.get(config)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,36 @@
+from AgentProject.core.audio_orchestrator.stt_manager import STTManager, MAX_PENDING_TRANSCRIPTS
+import unittest
+import asyncio
+import queue
+
+def drain(transcription_queue) -> list:
+    items = []
+    while not transcription_queue.empty():
+        items.append(transcription_queue.get_nowait())
+    return items
+
+class TranscriptQueueTest(unittest.IsolatedAsyncioTestCase):
+    def fill(self, transcription_queue) -> None:
+        #un turno final enterrado entre parciales de un consumidor que va atrasado
+        transcription_queue.put_nowait((False, 'hola'))
+        transcription_queue.put_nowait((True, 'hola que tal'))
+        for index in range(MAX_PENDING_TRANSCRIPTS):
+            transcription_queue.put_nowait((False, f'parcial {index}'))
+
+    def assert_finals_kept(self, transcription_queue) -> None:
+        self.fill(transcription_queue)
+        STTManager._put_nowait(transcription_queue, (False, 'parcial nuevo'))
+        STTManager._put_nowait(transcription_queue, (True, 'segundo turno'))
+        #los parciales viejos se colapsan; los finales llegan todos y en orden
+        self.assertEqual(drain(transcription_queue),
+                         [(True, 'hola que tal'), (False, 'parcial nuevo'), (True, 'segundo turno')])
+
+    def test_thread_queue_keeps_finals(self):
+        self.assert_finals_kept(queue.Queue())
+
+    async def test_asyncio_queue_keeps_finals(self):
+        self.assert_finals_kept(asyncio.Queue())
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,33 @@
+from AgentProject.core.audio_orchestrator.turn_detector import TurnDetector, EndOfTurnPolicy
+import unittest
+
+class TurnDetectorTest(unittest.TestCase):
+    def setUp(self):
+        self.turns = []
+        #temporizadores largos: los turnos solo se cierran por speech_final o UtteranceEnd
+        self.detector = TurnDetector(policy= EndOfTurnPolicy(silence_timeout_ms= 60_000, punctuation_grace_ms= 60_000),
+                                     on_turn= self.turns.append)
+
+    def tearDown(self):
+        self.detector.reset()
+
+    def test_final_after_end_of_turn_opens_the_next_turn(self):
+        self.detector.on_segment('Hola, que tal.', is_final= True, speech_final= True)
+        self.assertEqual(self.turns, ['Hola, que tal.'])
+
+        #un final que llega tras cerrar el turno no se pierde: empieza el siguiente
+        self.detector.on_segment('Y otra cosa', is_final= True)
+        self.assertEqual(self.detector._segments, ['Y otra cosa'])
+
+        self.detector.on_utterance_end()
+        self.assertEqual(self.turns, ['Hola, que tal.', 'Y otra cosa'])
+
+    def test_interim_does_not_drop_pending_finals(self):
+        self.detector.on_segment('Quiero saber', is_final= True)
+        self.detector.on_segment('si manana', is_final= False)
+        self.detector.on_segment('si manana llueve.', is_final= True, speech_final= True)
+        self.assertEqual(self.turns, ['Quiero saber si manana llueve.'])
+
+
+if __name__ == '__main__':
+    unittest.main()